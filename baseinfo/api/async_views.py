@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg
+from baseinfo.api.views import BaseInfoViews
+from baseinfo.stats import CACHE_KEY
+from coderr import metrics
+from coderr.async_views import AsyncReadAPIView
+from reviews.models import Review
+from coderr_auth.models import Profile
+from offers.models import Offer
+
+
+class BaseInfoAsyncView(AsyncReadAPIView):
+    sync_view_class = BaseInfoViews
+
+    async def get_data(self, request):
+        """
+        Async variant of `BaseInfoViews.get`, served from the same cache.
+        """
+        if settings.BASEINFO_CACHE_TTL:
+            data = await cache.aget(CACHE_KEY)
+            metrics.record_cache('baseinfo', data is not None)
+            if data is not None:
+                return data
+        review_count = await Review.objects.acount()
+        average_rating = (await Review.objects.aaggregate(average_rating=Avg('rating')))['average_rating']
+        average_rating = round(average_rating, 1) if average_rating is not None else 0
+        business_profile_count = await Profile.objects.filter(type='business').acount()
+        offer_count = await Offer.objects.acount()
+        data = {
+            "review_count": review_count,
+            "average_rating": average_rating,
+            "business_profile_count": business_profile_count,
+            "offer_count": offer_count,
+        }
+        if settings.BASEINFO_CACHE_TTL:
+            await cache.aset(CACHE_KEY, data, settings.BASEINFO_CACHE_TTL)
+        return data
@@ -1,6 +1,7 @@
 from django.urls import path
-from . import views
+from coderr.async_views import read_split
+from . import views, async_views
 
 urlpatterns = [
-  path('base-info/', views.BaseInfoViews.as_view()),
+  path('base-info/', read_split(views.BaseInfoViews.as_view(), async_views.BaseInfoAsyncView.as_view())),
 ]
@@ -1,9 +1,6 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from reviews.models import Review
-from coderr_auth.models import Profile
-from offers.models import Offer 
-from django.db.models import Avg
+from baseinfo.stats import get_base_info
 
 class BaseInfoViews(APIView):
     def get(self, request, *args, **kwargs):
@@ -17,18 +14,8 @@ class BaseInfoViews(APIView):
         - business_profile_count: The number of registered business profiles.
         - offer_count: The total number of offers.
 
+        The values are cached for BASEINFO_CACHE_TTL seconds if it is set.
+
         :return: A Response object containing the basic platform information.
         """
-        review_count = Review.objects.count()
-        average_rating = Review.objects.aggregate(average_rating=Avg('rating'))['average_rating']
-        average_rating = round(average_rating, 1) if average_rating is not None else 0
-        business_profile_count = Profile.objects.filter(type='business').count()
-        offer_count = Offer.objects.count()
-
-        data = {
-            "review_count": review_count,
-            "average_rating": average_rating,
-            "business_profile_count": business_profile_count,
-            "offer_count": offer_count,
-        }
-        return Response(data)
\ No newline at end of file
+        return Response(get_base_info())
\ No newline at end of file
@@ -0,0 +1,15 @@
+from django.conf import settings
+
+from baseinfo.stats import refresh_base_info
+from events.dispatcher import handles
+
+
+@handles('offer.created', 'offer.deleted', 'review.*', 'profile.created', 'profile.updated')
+def refresh_cached_base_info(events):
+    """
+    Recomputes the cached platform numbers once for a batch of events. The
+    numbers are counted again from the tables, so handling an event twice
+    gives the same result.
+    """
+    if settings.BASEINFO_CACHE_TTL:
+        refresh_base_info()
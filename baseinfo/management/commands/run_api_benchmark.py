@@ -0,0 +1,157 @@
+import http.client
+import json
+import platform
+import time
+from urllib.parse import urlsplit
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils.timezone import now
+from rest_framework.authtoken.models import Token
+
+from benchmarks.load import summarize
+from coderr_auth.models import Profile
+from offers.models import Offer, OfferDetail
+from orders.models import Order
+from reviews.models import Review
+
+
+SKIPPED_PREFIXES = ('coderr/admin/', 'coderr/media/', 'coderr/internal/')
+
+
+def iter_routes(patterns, prefix=''):
+    """
+    Yields the full route string of every URL pattern, following includes.
+    """
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from iter_routes(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern):
+            yield route
+
+
+class Command(BaseCommand):
+    help = "Benchmarks every GET route of the API and prints throughput, latency percentiles and query counts as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Requests per route.")
+        parser.add_argument('--base-url', help="Benchmark a running server instead of the Django test client.")
+        parser.add_argument('--output', help="Write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        """
+        Resolves sample ids from the database, requests every route and reports the results.
+
+        The routes are read from the URL configuration, so new endpoints are
+        benchmarked automatically. Routes with unknown parameters or without a
+        GET handler are listed under "skipped".
+        """
+        samples = self.sample_ids()
+        token = self.benchmark_token()
+        send = self.server_sender(options['base_url'], token) if options['base_url'] else self.client_sender(token)
+        report = {'meta': self.meta(options), 'routes': {}, 'skipped': []}
+        for route in iter_routes(get_resolver().url_patterns):
+            if route.startswith(SKIPPED_PREFIXES):
+                continue
+            path = self.fill_route(route, samples)
+            status, _ = send(path) if path else (405, 0)
+            if path is None or status == 405:
+                report['skipped'].append(route)
+                continue
+            report['routes'][route] = self.measure(send, path, options['requests'])
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        self.stdout.write(output)
+
+    def sample_ids(self):
+        """
+        Picks existing objects for the route parameters.
+
+        :return: A dictionary mapping route patterns to primary keys.
+        :raises CommandError: If the database holds no benchmark data.
+        """
+        offer = Offer.objects.order_by('id').first()
+        order = Order.objects.order_by('id').first()
+        review = Review.objects.order_by('id').first()
+        profile = Profile.objects.filter(type='business').order_by('id').first()
+        if not (offer and order and review and profile):
+            raise CommandError("No data found. Run `manage.py seed_benchmark_data` first.")
+        return {
+            'offers/<int:pk>/': offer.id,
+            'offerdetails/<int:pk>/': OfferDetail.objects.filter(offer=offer).values_list('id', flat=True).first(),
+            'orders/<int:pk>/': order.id,
+            'order-count/<int:pk>/': profile.user_id,
+            'completed-order-count/<int:pk>/': profile.user_id,
+            'reviews/<int:pk>/': review.id,
+            'profile/<int:pk>/': profile.id,
+        }
+
+    def benchmark_token(self):
+        user = User.objects.filter(profile__type='business').order_by('id').first()
+        return Token.objects.get_or_create(user=user)[0].key
+
+    def fill_route(self, route, samples):
+        relative = route.removeprefix('coderr/api/')
+        if '<' not in relative:
+            return '/' + route
+        if relative not in samples:
+            return None
+        return '/' + route.replace('<int:pk>', str(samples[relative]))
+
+    def client_sender(self, token):
+        client = Client(HTTP_HOST='127.0.0.1', HTTP_AUTHORIZATION=f'Token {token}')
+
+        def send(path):
+            response = client.get(path)
+            return response.status_code, response.wsgi_request.timings.queries
+
+        return send
+
+    def server_sender(self, base_url, token):
+        parts = urlsplit(base_url)
+        connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+
+        def send(path):
+            connection.request('GET', path, headers={'Authorization': f'Token {token}'})
+            response = connection.getresponse()
+            response.read()
+            timing = response.getheader('Server-Timing', '')
+            queries = timing.split('desc="', 1)[1].split(' ', 1)[0] if 'desc="' in timing else '0'
+            return response.status, int(queries)
+
+        return send
+
+    def measure(self, send, path, count):
+        """
+        Requests one path `count` times after a warm-up request.
+
+        :return: The latency summary plus status code and queries per request.
+        """
+        send(path)
+        latencies, statuses, queries = [], set(), 0
+        started = time.perf_counter()
+        for _ in range(count):
+            request_started = time.perf_counter()
+            status, queries = send(path)
+            latencies.append(time.perf_counter() - request_started)
+            statuses.add(status)
+        result = summarize(latencies, 0, time.perf_counter() - started)
+        return {'path': path, 'status': sorted(statuses), 'queries_per_request': queries, **result}
+
+    def meta(self, options):
+        return {
+            'created_at': now().isoformat(),
+            'mode': 'server' if options['base_url'] else 'test_client',
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'users': User.objects.count(),
+            'offers': Offer.objects.count(),
+            'orders': Order.objects.count(),
+            'reviews': Review.objects.count(),
+        }
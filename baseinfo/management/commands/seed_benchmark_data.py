@@ -0,0 +1,176 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.timezone import now
+
+from coderr_auth.models import Profile
+from offers.models import Offer, OfferDetail
+from orders.models import Order, OrderStatusChange
+from reviews.models import Review
+
+
+USERNAME_PREFIX = 'bench_'
+OFFER_TYPES = [('basic', 1), ('standard', 2), ('premium', 4)]
+ORDER_STATUSES = (['completed'] * 6) + (['in_progress'] * 3) + ['cancelled']
+RATING_WEIGHTS = [5, 5, 10, 30, 50]
+WORDS = ['Logo', 'Website', 'Design', 'App', 'Branding', 'SEO', 'Flyer', 'Shop', 'Video', 'Text',
+         'Angular', 'Django', 'Marketing', 'Audit', 'Hosting', 'Foto', 'Podcast', 'Newsletter']
+
+
+class Command(BaseCommand):
+    help = "Bulk-generates users, profiles, offers, orders and reviews for benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--business-share', type=float, default=0.2)
+        parser.add_argument('--offers-per-business', type=int, default=5, help="Mean number of offers per business user.")
+        parser.add_argument('--orders', type=int, default=10000)
+        parser.add_argument('--reviews', type=int, default=3000)
+        parser.add_argument('--days', type=int, default=365,
+                            help="Spread the orders and their status changes over this many past days.")
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--clear', action='store_true', help="Delete previously seeded data first.")
+
+    def handle(self, *args, **options):
+        """
+        Generates the data set in one transaction using bulk inserts.
+
+        All seeded users share one password hash ("benchmark") and are prefixed
+        with `bench_`, so `--clear` removes exactly the seeded data.
+        """
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = now()
+        self.window = timedelta(days=options['days'])
+        with transaction.atomic():
+            if options['clear']:
+                User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+            business, customers = self.create_users(options['users'], options['business_share'])
+            details = self.create_offers(business, options['offers_per_business'])
+            orders = self.create_orders(customers, details, options['orders'])
+            reviews = self.create_reviews(customers, business, options['reviews'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(business)} business users, {len(customers)} customers, "
+            f"{len(details) // len(OFFER_TYPES)} offers, {orders} orders and {reviews} reviews."
+        ))
+
+    def create_users(self, count, business_share):
+        """
+        Creates the users and their profiles.
+
+        :return: A tuple of the business users and the customer users.
+        """
+        start = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+        password = make_password('benchmark')
+        users = User.objects.bulk_create([
+            User(username=f'{USERNAME_PREFIX}{start + index}', email=f'{USERNAME_PREFIX}{start + index}@example.com',
+                 first_name=self.random.choice(['Anna', 'Ben', 'Clara', 'David', 'Eva', 'Felix']),
+                 last_name=self.random.choice(['Müller', 'Schmidt', 'Schneider', 'Fischer', 'Weber']),
+                 password=password)
+            for index in range(count)
+        ], batch_size=self.batch_size)
+        business_count = max(1, int(count * business_share))
+        Profile.objects.bulk_create([
+            Profile(user=user, email=user.email, username=user.username,
+                    type='business' if index < business_count else 'customer',
+                    first_name=user.first_name, last_name=user.last_name,
+                    description=' '.join(self.random.choices(WORDS, k=self.random.randint(20, 120))))
+            for index, user in enumerate(users)
+        ], batch_size=self.batch_size)
+        return users[:business_count], users[business_count:]
+
+    def create_offers(self, business, mean_offers):
+        """
+        Creates offers with a basic, standard and premium detail each. The
+        number of offers per business user is skewed: a few sellers have many.
+
+        :return: The created offer details.
+        """
+        offers = []
+        for user in business:
+            for _ in range(min(50, int(self.random.expovariate(1 / mean_offers)) + 1)):
+                offers.append(Offer(user=user, title=' '.join(self.random.sample(WORDS, 3)),
+                                    description=' '.join(self.random.choices(WORDS, k=self.random.randint(30, 300)))))
+        offers = Offer.objects.bulk_create(offers, batch_size=self.batch_size)
+        details = []
+        for offer in offers:
+            base_price = Decimal(self.random.randint(20, 500))
+            base_days = self.random.randint(1, 14)
+            for offer_type, factor in OFFER_TYPES:
+                details.append(OfferDetail(
+                    offer=offer, title=f'{offer.title} {offer_type}', revisions=self.random.choice([-1, 1, 2, 3, 5]),
+                    delivery_time_in_days=base_days * factor, price=base_price * factor,
+                    features=self.random.sample(WORDS, self.random.randint(1, 5)), offer_type=offer_type,
+                ))
+        return OfferDetail.objects.bulk_create(details, batch_size=self.batch_size)
+
+    def create_orders(self, customers, details, count):
+        """
+        Creates orders with the snapshot fields `Order.save` would copy from the detail
+        and their status history. Popular offer details receive more orders than the rest.
+        The orders are created at random times within the last `--days` days.
+
+        :return: The number of created orders.
+        """
+        if not customers or not details:
+            return 0
+        weights = [1 / (rank + 1) for rank in range(len(details))]
+        chosen = self.random.choices(details, weights=weights, k=count)
+        orders = [
+            Order(offer_detail_id=detail, customer_user=self.random.choice(customers).id,
+                  business_user_id=detail.offer.user_id, status=self.random.choice(ORDER_STATUSES),
+                  title=detail.title, revisions=detail.revisions, delivery_time_in_days=detail.delivery_time_in_days,
+                  price=detail.price, features=detail.features, offer_type=detail.offer_type)
+            for detail in chosen
+        ]
+        Order.objects.bulk_create(orders, batch_size=self.batch_size)
+        for order in orders:
+            order.created_at = self.now - self.window * self.random.random()
+        self.create_status_history(orders)
+        # `auto_now_add` sets the insert time, the spread times are written afterwards.
+        Order.objects.bulk_update(orders, ['created_at', 'updated_at'], batch_size=self.batch_size)
+        return len(orders)
+
+    def create_status_history(self, orders):
+        """
+        Creates the status history `Order.save` would write: the creation and,
+        for finished orders, a change within the delivery time, but not after
+        now. `updated_at` of the orders is set to their last change.
+        """
+        changes = []
+        for order in orders:
+            common = {'order': order, 'business_user_id': order.business_user_id, 'customer_user': order.customer_user}
+            changes.append(OrderStatusChange(from_status='', to_status='in_progress', changed_at=order.created_at, **common))
+            order.updated_at = order.created_at
+            if order.status != 'in_progress':
+                hours = self.random.randint(1, order.delivery_time_in_days * 24)
+                order.updated_at = min(order.created_at + timedelta(hours=hours), self.now)
+                changes.append(OrderStatusChange(from_status='in_progress', to_status=order.status,
+                                                 changed_at=order.updated_at, **common))
+        OrderStatusChange.objects.bulk_create(changes, batch_size=self.batch_size)
+
+    def create_reviews(self, customers, business, count):
+        """
+        Creates at most one review per customer and business user.
+
+        :return: The number of created reviews.
+        """
+        pairs = set()
+        attempts = 0
+        while len(pairs) < count and attempts < count * 5 and customers and business:
+            pairs.add((self.random.choice(customers).id, self.random.choice(business).id))
+            attempts += 1
+        reviews = [
+            Review(reviewer_id=reviewer_id, business_user_id=business_user_id,
+                   rating=self.random.choices(range(1, 6), weights=RATING_WEIGHTS)[0],
+                   description=' '.join(self.random.choices(WORDS, k=self.random.randint(5, 40))))
+            for reviewer_id, business_user_id in pairs
+        ]
+        Review.objects.bulk_create(reviews, batch_size=self.batch_size)
+        return len(reviews)
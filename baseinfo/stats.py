@@ -0,0 +1,56 @@
+"""
+The platform numbers of /base-info/.
+
+With BASEINFO_CACHE_TTL set they are served from the cache. The handler in
+baseinfo/handlers.py recomputes them after new offers, reviews and profiles,
+so the counting queries run in the outbox dispatcher instead of the requests.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg
+
+from coderr import metrics
+from coderr_auth.models import Profile
+from offers.models import Offer
+from reviews.models import Review
+
+
+CACHE_KEY = 'baseinfo:stats'
+
+
+def compute_base_info():
+    """
+    Counts the reviews, business profiles and offers and averages the ratings.
+
+    :return: The dictionary returned by /base-info/.
+    """
+    average_rating = Review.objects.aggregate(average_rating=Avg('rating'))['average_rating']
+    return {
+        "review_count": Review.objects.count(),
+        "average_rating": round(average_rating, 1) if average_rating is not None else 0,
+        "business_profile_count": Profile.objects.filter(type='business').count(),
+        "offer_count": Offer.objects.count(),
+    }
+
+
+def refresh_base_info():
+    """
+    Recomputes the platform numbers and stores them in the cache.
+
+    :return: The computed numbers.
+    """
+    data = compute_base_info()
+    cache.set(CACHE_KEY, data, settings.BASEINFO_CACHE_TTL)
+    return data
+
+
+def get_base_info():
+    """
+    Returns the cached platform numbers, computing and caching them on a miss.
+    Without BASEINFO_CACHE_TTL they are computed every time.
+    """
+    if not settings.BASEINFO_CACHE_TTL:
+        return compute_base_info()
+    data = cache.get(CACHE_KEY)
+    metrics.record_cache('baseinfo', data is not None)
+    return data if data is not None else refresh_base_info()
@@ -1,3 +1,35 @@
+import io
+import json
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db.models import F, Max, Min
 from django.test import TestCase
+from django.utils.timezone import now
+
+from orders.models import Order, OrderStatusChange
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_seeds_a_spread_data_set_and_benchmarks_it(self):
+        output = io.StringIO()
+        call_command('seed_benchmark_data', users=12, orders=40, reviews=5, days=30, stdout=output)
+        self.assertIn('40 orders', output.getvalue())
+        started = now()
+        created = Order.objects.aggregate(first=Min('created_at'), last=Max('created_at'))
+        self.assertGreater(created['first'], started - timedelta(days=30))
+        self.assertLess(created['first'], created['last'] - timedelta(days=1))
+        self.assertLess(created['last'], started)
+        changes = OrderStatusChange.objects.select_related('order')
+        self.assertEqual(changes.filter(from_status='').count(), 40)
+        self.assertFalse(changes.filter(changed_at__lt=F('order__created_at')).exists())
+        self.assertFalse(changes.filter(changed_at__gt=started).exists())
+        self.assertFalse(Order.objects.exclude(status='in_progress').exclude(status_changes__changed_at=F('updated_at')).exists())
 
-# Create your tests here.
+        output = io.StringIO()
+        call_command('run_api_benchmark', requests=1, stdout=output)
+        report = json.loads(output.getvalue())
+        self.assertEqual(report['meta']['orders'], 40)
+        self.assertEqual(report['routes']['coderr/api/offers/']['status'], [200])
+        self.assertEqual(report['routes']['coderr/api/orders/<int:pk>/']['status'], [200])
+        self.assertIn('coderr/api/login/', report['skipped'])
@@ -0,0 +1,73 @@
+"""
+Compares the read-only endpoints served by gunicorn sync workers (WSGI) with
+the async views served by uvicorn (ASGI).
+
+Run from the project root against a populated database:
+
+    python -m benchmarks.asgi_vs_wsgi --workers 4 --concurrency 200 --duration 20
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+
+from benchmarks.load import run_load, wait_for_server
+
+
+DEFAULT_PATHS = [
+    "/coderr/api/base-info/",
+    "/coderr/api/offers/",
+    "/coderr/api/offerdetails/1/",
+    "/coderr/api/order-count/1/",
+]
+
+SERVERS = {
+    "wsgi": lambda workers, port: [
+        sys.executable, "-m", "gunicorn", "coderr.wsgi:application",
+        "--workers", str(workers), "--bind", f"127.0.0.1:{port}", "--log-level", "warning",
+    ],
+    "asgi": lambda workers, port: [
+        sys.executable, "-m", "uvicorn", "coderr.asgi:application",
+        "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port),
+        "--log-level", "warning", "--no-access-log",
+    ],
+}
+
+
+def benchmark_server(mode, args):
+    """
+    Starts one server, runs the load against every path and stops it again.
+
+    :param mode: "wsgi" or "asgi".
+    :param args: The parsed command line arguments.
+    :return: A dictionary mapping each path to its load summary.
+    """
+    process = subprocess.Popen(SERVERS[mode](args.workers, args.port), env=os.environ.copy())
+    try:
+        wait_for_server("127.0.0.1", args.port)
+        return {
+            path: run_load(f"http://127.0.0.1:{args.port}{path}", args.concurrency, args.duration)
+            for path in args.paths
+        }
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS)
+    parser.add_argument("--modes", nargs="+", choices=sorted(SERVERS), default=["wsgi", "asgi"])
+    args = parser.parse_args()
+    results = {mode: benchmark_server(mode, args) for mode in args.modes}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Measures CompressionMiddleware on offer listings of different sizes: bytes on
+the wire per encoding and CPU time per request with a cold compression cache
+(every response compressed) and a warm one (identical response served again).
+
+    python -m benchmarks.compression --iterations 500 --offers 6 100
+"""
+import argparse
+import json
+import os
+import time
+
+import django
+
+
+def cpu_per_request(middleware, request, iterations, clear_cache):
+    """
+    Runs the middleware on a request and returns the mean CPU time per request.
+
+    :param middleware: The CompressionMiddleware instance.
+    :param request: The request, carrying the Accept-Encoding header.
+    :param iterations: The number of requests.
+    :param clear_cache: Empty the compression cache before every request.
+    :return: The CPU time per request in microseconds.
+    """
+    started = time.process_time()
+    for _ in range(iterations):
+        if clear_cache:
+            middleware.cache.clear()
+        middleware(request)
+    return (time.process_time() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--offers", type=int, nargs="+", default=[6, 100])
+    args = parser.parse_args()
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "coderr.settings")
+    django.setup()
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from benchmarks.json_renderer import offer_listing
+    from coderr.middleware import CompressionMiddleware
+    from coderr.renderers import FastJSONRenderer
+
+    report = {}
+    for count in args.offers:
+        body = FastJSONRenderer().render(offer_listing(count))
+        middleware = CompressionMiddleware(lambda request: HttpResponse(body, content_type="application/json"))
+        results = {"identity": {"bytes": len(body)}}
+        for encoding in middleware.encodings:
+            request = RequestFactory().get("/coderr/api/offers/", HTTP_ACCEPT_ENCODING=encoding)
+            response = middleware(request)
+            results[encoding] = {
+                "bytes": len(response.content),
+                "ratio": round(len(response.content) / len(body), 3),
+                "cpu_us_cold_cache": round(cpu_per_request(middleware, request, args.iterations, True), 1),
+                "cpu_us_warm_cache": round(cpu_per_request(middleware, request, args.iterations, False), 1),
+            }
+        report[f"{count}_offers"] = results
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Measures the peak Python memory and the time of the streaming order export
+for businesses with a growing number of orders. The peak should stay flat
+while the row count grows.
+
+The orders are created in a throwaway test database.
+
+    python -m benchmarks.exports --orders 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+from decimal import Decimal
+
+import django
+
+
+def seed(count):
+    """
+    Creates a business user with `count` orders.
+
+    :return: The business user.
+    """
+    from django.contrib.auth.models import User
+    from coderr_auth.models import Profile
+    from offers.models import Offer, OfferDetail
+    from orders.models import Order
+
+    business = User.objects.create_user(username=f"export_{count}", password="benchmark")
+    Profile.objects.create(user=business, email=f"export_{count}@example.com", type="business")
+    offer = Offer.objects.create(user=business, title="Logo", description="Logo Design")
+    detail = OfferDetail.objects.create(offer=offer, title="Basic", revisions=2, delivery_time_in_days=5,
+                                        price=Decimal("149.90"), features=["Logo", "Visitenkarte"], offer_type="basic")
+    Order.objects.bulk_create(
+        (Order(offer_detail_id=detail, business_user=business, customer_user=index, title="Basic", revisions=2,
+               delivery_time_in_days=5, price=Decimal("149.90"), features=["Logo"], offer_type="basic")
+         for index in range(count)),
+        batch_size=5000,
+    )
+    return business
+
+
+def stream(business, export_format):
+    """
+    Streams the export of a business and returns its size in bytes.
+    """
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(business)
+    response = client.get(f"/coderr/api/orders/export.{export_format}")
+    return sum(len(block) for block in response.streaming_content)
+
+
+def measure(business, export_format):
+    """
+    Streams the export of a business twice, once timed and once with
+    tracemalloc, which slows it down, and returns its size, time and peak memory.
+    """
+    started = time.perf_counter()
+    size = stream(business, export_format)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    stream(business, export_format)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"bytes": size, "seconds": round(elapsed, 3), "peak_kib": round(peak / 1024)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, nargs="+", default=[1000, 10000, 100000])
+    args = parser.parse_args()
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "coderr.settings")
+    django.setup()
+    from django.test.utils import setup_test_environment, get_runner
+    from django.conf import settings
+
+    setup_test_environment()
+    runner = get_runner(settings)(verbosity=0)
+    old_config = runner.setup_databases()
+    try:
+        report = {}
+        for count in args.orders:
+            business = seed(count)
+            report[f"{count}_orders"] = {export_format: measure(business, export_format) for export_format in ("csv", "jsonl")}
+        print(json.dumps(report, indent=2))
+    finally:
+        runner.teardown_databases(old_config)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Measures the resident memory per worker and the throughput of every preset
+in gunicorn.conf.py.
+
+Run from the project root against a populated database:
+
+    python -m benchmarks.gunicorn_presets --concurrency 100 --duration 15
+"""
+import argparse
+import json
+import os
+import runpy
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.load import run_load, wait_for_server
+
+
+CONFIG = Path(__file__).resolve().parent.parent / "gunicorn.conf.py"
+
+
+def child_pids(parent_pid):
+    """
+    Returns the pids of the direct children of a process, read from /proc.
+    """
+    children = []
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        if int(stat.rsplit(")", 1)[1].split()[1]) == parent_pid:
+            children.append(int(entry.name))
+    return children
+
+
+def memory_kb(pid):
+    """
+    Reads the resident (RSS) and proportional (PSS) set size of a process.
+    PSS splits shared pages between the processes sharing them, which shows
+    the effect of preloading.
+
+    :return: A dictionary with rss_kb and pss_kb.
+    """
+    values = {}
+    for name, key in (("status", "VmRSS:"), ("smaps_rollup", "Pss:")):
+        try:
+            for line in Path(f"/proc/{pid}/{name}").read_text().splitlines():
+                if line.startswith(key):
+                    values[key] = int(line.split()[1])
+                    break
+        except OSError:
+            pass
+    return {"rss_kb": values.get("VmRSS:"), "pss_kb": values.get("Pss:")}
+
+
+def benchmark_preset(preset, preload, args):
+    """
+    Starts gunicorn with one preset, measures memory before and after the load
+    run and stops it again.
+    """
+    env = dict(os.environ, GUNICORN_PRESET=preset, GUNICORN_PRELOAD="1" if preload else "0",
+               GUNICORN_BIND=f"127.0.0.1:{args.port}", GUNICORN_LOGLEVEL="warning")
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", str(CONFIG)], env=env)
+    try:
+        wait_for_server("127.0.0.1", args.port)
+        time.sleep(1)
+        idle = [memory_kb(pid) for pid in child_pids(process.pid)]
+        load = run_load(f"http://127.0.0.1:{args.port}{args.path}", args.concurrency, args.duration)
+        busy = [memory_kb(pid) for pid in child_pids(process.pid)]
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+    return {
+        "workers": len(busy),
+        "idle_workers": idle,
+        "busy_workers": busy,
+        "total_pss_kb": sum(worker["pss_kb"] or 0 for worker in busy),
+        "load": load,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--presets", nargs="+", default=sorted(runpy.run_path(str(CONFIG))["PRESETS"]))
+    parser.add_argument("--path", default="/coderr/api/offers/")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--no-preload-comparison", action="store_true")
+    args = parser.parse_args()
+    results = {}
+    for preset in args.presets:
+        results[preset] = benchmark_preset(preset, True, args)
+        if not args.no_preload_comparison:
+            results[f"{preset}-no-preload"] = benchmark_preset(preset, False, args)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compares DRF's JSONRenderer with FastJSONRenderer on a 100-offer listing
+payload and checks that both produce the same bytes.
+
+    python -m benchmarks.json_renderer --iterations 2000
+"""
+import argparse
+import datetime
+import json
+import os
+import timeit
+from decimal import Decimal
+
+import django
+
+
+def offer_listing(count=100):
+    """
+    Builds a paginated offer listing shaped like the output of OfferSerializer,
+    including the raw Decimal prices and datetimes method fields can return.
+    """
+    created = datetime.datetime(2025, 1, 1, 12, 30, tzinfo=datetime.timezone.utc)
+    results = []
+    for index in range(1, count + 1):
+        results.append({
+            "id": index,
+            "user": index % 17 + 1,
+            "title": f"Webseite & Logo Paket Nr. {index} – schnell und günstig",
+            "image": f"http://127.0.0.1:8000/coderr/media/uploads/offer_{index}.png",
+            "description": "Professionelles Design für Ihr Unternehmen. " * 20,
+            "created_at": created + datetime.timedelta(hours=index),
+            "updated_at": (created + datetime.timedelta(days=index, microseconds=index)).isoformat(),
+            "details": [{"id": index * 3 + offset, "url": f"/coderr/api/offerdetails/{index * 3 + offset}/"} for offset in range(3)],
+            "min_price": Decimal(f"{index * 7}.50"),
+            "min_delivery_time": index % 14 + 1,
+            "user_details": {"first_name": "Jürgen", "last_name": "Müller", "username": f"seller_{index}"},
+            "features": ["Logo Design", "Visitenkarte", "Briefpapier"][: index % 3 + 1],
+        })
+    return {"count": count * 10, "next": "http://127.0.0.1:8000/coderr/api/offers/?page=2", "previous": None, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--offers", type=int, default=100)
+    args = parser.parse_args()
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "coderr.settings")
+    django.setup()
+    from rest_framework.renderers import JSONRenderer
+    from coderr import renderers
+
+    payload = offer_listing(args.offers)
+    drf, fast = JSONRenderer(), renderers.FastJSONRenderer()
+    orjson_module = renderers.orjson
+    renderers.orjson = None
+    stdlib_output = fast.render(payload)
+    stdlib_seconds = timeit.timeit(lambda: fast.render(payload), number=args.iterations)
+    renderers.orjson = orjson_module
+    results = {
+        "payload_bytes": len(drf.render(payload)),
+        "orjson_installed": orjson_module is not None,
+        "identical_output": drf.render(payload) == fast.render(payload) == stdlib_output,
+        "drf_json_renderer_us": timeit.timeit(lambda: drf.render(payload), number=args.iterations) / args.iterations * 1e6,
+        "fast_renderer_stdlib_us": stdlib_seconds / args.iterations * 1e6,
+        "fast_renderer_us": timeit.timeit(lambda: fast.render(payload), number=args.iterations) / args.iterations * 1e6,
+    }
+    print(json.dumps({key: round(value, 1) if isinstance(value, float) else value for key, value in results.items()}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
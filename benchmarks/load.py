@@ -0,0 +1,103 @@
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(samples, fraction):
+    """
+    Returns the value below which the given fraction of the sorted samples falls.
+
+    :param samples: A sorted list of numbers.
+    :param fraction: The percentile as a fraction, e.g. 0.99.
+    :return: The percentile value, or None for an empty list.
+    """
+    if not samples:
+        return None
+    index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+    return samples[index]
+
+
+def summarize(latencies, errors, elapsed):
+    """
+    Builds the throughput and latency summary of a load run.
+
+    :param latencies: The request latencies in seconds.
+    :param errors: The number of failed requests.
+    :param elapsed: The wall clock duration of the run in seconds.
+    :return: A dictionary with requests per second and latency percentiles in ms.
+    """
+    latencies = sorted(latencies)
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0,
+        "mean_ms": to_ms(statistics.fmean(latencies)) if latencies else None,
+        "p50_ms": to_ms(percentile(latencies, 0.50)),
+        "p95_ms": to_ms(percentile(latencies, 0.95)),
+        "p99_ms": to_ms(percentile(latencies, 0.99)),
+    }
+
+
+def run_load(url, concurrency=50, duration=10.0, headers=None):
+    """
+    Sends GET requests to a running server from `concurrency` threads for
+    `duration` seconds. Every request opens a new connection, which matches
+    how clients reach the gunicorn sync workers.
+
+    :param url: The absolute URL to request.
+    :param concurrency: The number of parallel clients.
+    :param duration: The length of the run in seconds.
+    :param headers: Optional request headers.
+    :return: The summary produced by `summarize`.
+    """
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        own = []
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+                connection.request("GET", path, headers=headers or {})
+                response = connection.getresponse()
+                response.read()
+                connection.close()
+                if response.status >= 500:
+                    raise http.client.HTTPException(response.status)
+                own.append(time.perf_counter() - started)
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(own)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+
+def wait_for_server(host, port, timeout=30.0):
+    """
+    Blocks until a TCP connection to the server succeeds.
+
+    :raises TimeoutError: If the server does not come up in time.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            http.client.HTTPConnection(host, port, timeout=1).connect()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Server on {host}:{port} did not start.")
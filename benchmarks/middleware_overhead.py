@@ -0,0 +1,105 @@
+"""
+Measures the per-request overhead of the development and the production
+settings profile (CODERR_ENV=production) through the full WSGI handler.
+
+Each profile runs in its own process, since the middleware chain and DEBUG
+are fixed when Django starts. `ping` is a view that does no work, so its time
+is the cost of the middleware chain itself; the other paths are real
+endpoints and need a migrated database.
+
+    python -m benchmarks.middleware_overhead --iterations 2000 --repeat 5
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import timeit
+
+import django
+from django.http import HttpResponse
+
+
+PING_PATH = "/coderr/api/ping/"
+DEFAULT_PATHS = [PING_PATH, "/coderr/api/base-info/"]
+
+
+def ping(request):
+    return HttpResponse(b'{}', content_type="application/json")
+
+
+class PingURLConf:
+    """
+    The project URLs plus the ping view, used as ROOT_URLCONF while measuring.
+    """
+    @property
+    def urlpatterns(self):
+        from django.urls import include, path
+        return [path("coderr/api/ping/", ping, name="ping"), path("", include("coderr.urls"))]
+
+
+def measure(paths, iterations, repeat):
+    """
+    Sends GET requests for every path through the WSGI handler of this process.
+
+    :param paths: The request paths to measure.
+    :param iterations: The number of requests per round.
+    :param repeat: The number of rounds, the fastest one is reported.
+    :return: A dictionary mapping each path to its mean time per request in microseconds.
+    """
+    from django.conf import settings
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.test import RequestFactory
+
+    settings.ROOT_URLCONF = PingURLConf()
+    logging.getLogger("coderr.requests").setLevel(logging.WARNING)
+    handler, factory = WSGIHandler(), RequestFactory()
+    results = {}
+    for request_path in paths:
+        def request():
+            environ = factory._base_environ(PATH_INFO=request_path, REQUEST_METHOD="GET", HTTP_HOST="127.0.0.1")
+            response = handler(environ, lambda status, headers: None)
+            b"".join(response)
+            response.close()
+
+        request()
+        results[request_path] = min(timeit.repeat(request, number=iterations, repeat=repeat)) / iterations * 1e6
+    return results
+
+
+def run_profile(profile, args):
+    env = {**os.environ, "CODERR_ENV": profile, "SECRET_KEY": os.environ.get("SECRET_KEY", "benchmark")}
+    command = [sys.executable, "-m", "benchmarks.middleware_overhead", "--child",
+               "--iterations", str(args.iterations), "--repeat", str(args.repeat), *args.paths]
+    output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=DEFAULT_PATHS)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "coderr.settings")
+        django.setup()
+        print(json.dumps(measure(args.paths, args.iterations, args.repeat)))
+        return
+
+    development, production = run_profile("development", args), run_profile("production", args)
+    report = {
+        request_path: {
+            "development_us": round(development[request_path], 1),
+            "production_us": round(production[request_path], 1),
+            "saved_us": round(development[request_path] - production[request_path], 1),
+        }
+        for request_path in args.paths
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
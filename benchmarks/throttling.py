@@ -0,0 +1,71 @@
+"""
+Measures the per-request overhead of TokenBucketThrottle with the file and
+the cache store, and checks that worker processes share the buckets: the
+processes together must not get more tokens than one bucket holds.
+
+    python -m benchmarks.throttling --iterations 100000 --processes 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import timeit
+
+import django
+
+
+def grant_count(path, attempts):
+    """
+    Sends requests against one shared bucket from a separate process.
+
+    :return: The number of requests that got a token.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "coderr.settings")
+    django.setup()
+    from coderr.throttling import FileBucketStore
+    store = FileBucketStore(path, 1024)
+    return sum(1 for _ in range(attempts) if store.consume("shared", 100, 0.001, time.time()) == 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "coderr.settings")
+    django.setup()
+    from django.test import override_settings
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from coderr import throttling
+
+    class View:
+        throttle_scope = "benchmark"
+
+    request = Request(APIRequestFactory().post("/coderr/api/login/", REMOTE_ADDR="10.0.0.1"))
+    directory = tempfile.mkdtemp()
+    report = {}
+    for store in ("file", "cache"):
+        with override_settings(THROTTLE_STORE=store, THROTTLE_FILE=os.path.join(directory, "throttle.db"),
+                               THROTTLE_SCOPES={"benchmark": {"rate": "1000000000/s", "keys": ["ip"]}}):
+            throttle = throttling.TokenBucketThrottle()
+            bucket_store = throttling.get_store()
+            consume = timeit.timeit(lambda: bucket_store.consume("benchmark:ip:10.0.0.1", 10**9, 10**9, time.time()),
+                                    number=args.iterations)
+            allow = timeit.timeit(lambda: throttle.allow_request(request, View), number=args.iterations)
+            report[store] = {
+                "consume_us": round(consume / args.iterations * 1e6, 2),
+                "allow_request_us": round(allow / args.iterations * 1e6, 2),
+            }
+
+    path = os.path.join(directory, "shared.db")
+    with multiprocessing.get_context("fork").Pool(args.processes) as pool:
+        granted = pool.starmap(grant_count, [(path, 200)] * args.processes)
+    report["shared_bucket"] = {"capacity": 100, "requests": 200 * args.processes, "granted": sum(granted)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coderr.settings')
+os.environ.setdefault('CODERR_ASYNC_READ_VIEWS', '1')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.EVENTS_DISPATCHER == 'thread':
+    from events.dispatcher import start_dispatcher_thread
+    start_dispatcher_thread()
@@ -0,0 +1,105 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import NotFound
+from rest_framework.settings import api_settings
+
+
+class AsyncReadAPIView(View):
+    """
+    Base class for the async GET variants of the read-only API views.
+
+    Subclasses set `sync_view_class` to the DRF view they mirror and implement
+    `get_data` with Django's async ORM, returning the response data. The
+    authentication, permissions and throttles of the sync view run first, in
+    a thread since they may query the database. Errors are turned into the
+    same responses DRF would send and the data is rendered with the first
+    configured DRF renderer, so the responses match the sync views byte for
+    byte.
+    """
+    http_method_names = ['get', 'head']
+    sync_view_class = None
+
+    async def get(self, request, *args, **kwargs):
+        view = self.sync_view_class(args=args, kwargs=kwargs, headers={})
+        drf_request = view.initialize_request(request, *args, **kwargs)
+        view.request = drf_request
+        try:
+            await sync_to_async(view.initial)(drf_request, *args, **kwargs)
+            data = await self.get_data(drf_request, *args, **kwargs)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+            return self.render(response.data, response.status_code, response.headers)
+        return self.render(data, 200)
+
+    async def get_data(self, request, *args, **kwargs):
+        raise NotImplementedError('`get_data()` must be implemented.')
+
+    def render(self, data, status_code, headers=None):
+        """
+        Renders the data with the default DRF renderer.
+
+        :param data: The response data.
+        :param status_code: The HTTP status code of the response.
+        :param headers: Headers of the error response, e.g. WWW-Authenticate or Retry-After.
+        :return: An HttpResponse with the rendered body.
+        """
+        renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+        content_type = f"{renderer.media_type}; charset={renderer.charset}" if renderer.charset else renderer.media_type
+        response = HttpResponse(renderer.render(data), content_type=content_type, status=status_code)
+        for name, value in (headers or {}).items():
+            if name.lower() != 'content-type':
+                response[name] = value
+        return response
+
+
+async def apaginate(pagination, queryset, request):
+    """
+    Async counterpart of `PageNumberPagination.paginate_queryset`.
+
+    The count is fetched with the async ORM up front, the page itself is
+    resolved by the regular Django paginator and then loaded with `async for`.
+    Afterwards `pagination.get_paginated_response` can be used as usual.
+
+    :param pagination: The PageNumberPagination instance of the view.
+    :param queryset: The queryset to paginate.
+    :param request: The DRF request carrying the page query parameters.
+    :return: The list of objects on the requested page.
+    :raises NotFound: If the requested page does not exist.
+    """
+    paginator = pagination.django_paginator_class(queryset, pagination.get_page_size(request))
+    # Pre-fill the cached count so the paginator does not run a sync COUNT query.
+    paginator.count = await queryset.acount()
+    page_number = pagination.get_page_number(request, paginator)
+    try:
+        pagination.page = paginator.page(page_number)
+    except InvalidPage as exc:
+        raise NotFound(pagination.invalid_page_message.format(page_number=page_number, message=str(exc)))
+    pagination.request = request
+    return [obj async for obj in pagination.page.object_list]
+
+
+def read_split(sync_view, async_view):
+    """
+    Routes GET and HEAD requests to the async variant of a view when
+    ASYNC_READ_VIEWS is enabled (the ASGI deployment mode). Every other method
+    keeps going through the sync DRF view. Without the setting the sync view
+    is returned unchanged.
+
+    :param sync_view: The DRF view callable.
+    :param async_view: The AsyncReadAPIView callable for the read path.
+    :return: The view callable to route to.
+    """
+    if not settings.ASYNC_READ_VIEWS:
+        return sync_view
+    sync_handler = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            return await async_view(request, *args, **kwargs)
+        return await sync_handler(request, *args, **kwargs)
+
+    view.csrf_exempt = getattr(sync_view, 'csrf_exempt', False)
+    return view
@@ -0,0 +1,121 @@
+"""
+Response compression helpers used by CompressionMiddleware.
+
+gzip is always available, brotli when the `brotli` package is installed.
+Compressed bodies are kept in a small in-process LRU cache keyed by encoding
+and body digest, so a response served again with the same bytes (a cached
+page, an unchanged listing) is not compressed a second time.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from coderr import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _compress_gzip(content):
+    # mtime=0 keeps the output stable for identical bodies.
+    return gzip.compress(content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _compress_brotli(content):
+    return brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+
+def available_encodings():
+    """
+    Returns the supported encodings in order of preference.
+
+    :return: A dictionary mapping encoding names to compress functions.
+    """
+    encodings = {}
+    if brotli is not None:
+        encodings['br'] = _compress_brotli
+    encodings['gzip'] = _compress_gzip
+    return encodings
+
+
+def negotiate(accept_encoding, encodings):
+    """
+    Picks the encoding for a response from an Accept-Encoding header.
+
+    The encoding with the highest q-value wins, ties go to the order of
+    `encodings`. `*` matches every encoding not listed explicitly and a
+    q-value of 0 excludes an encoding.
+
+    :param accept_encoding: The value of the Accept-Encoding header.
+    :param encodings: The supported encodings in order of preference.
+    :return: The chosen encoding name, or None to send the body uncompressed.
+    """
+    weights = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if name:
+            weights[name.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for name in encodings:
+        weight = weights.get(name, weights.get('*', 0.0))
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+
+class CompressedBodyCache:
+    """
+    A thread-safe LRU cache of compressed bodies, bounded by the total size
+    of the stored bytes. Lookups are recorded as the "compression" cache in
+    the metrics.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compress(self, encoding, content, compress):
+        """
+        Returns the compressed body, compressing and storing it on a miss.
+
+        :param encoding: The encoding name, part of the cache key.
+        :param content: The uncompressed body.
+        :param compress: The function compressing the body.
+        :return: The compressed body.
+        """
+        key = (encoding, hashlib.blake2b(content, digest_size=16).digest(), len(content))
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+        metrics.record_cache('compression', compressed is not None)
+        if compressed is not None:
+            return compressed
+        compressed = compress(content)
+        if len(compressed) <= self.max_bytes:
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = compressed
+                    self.size += len(compressed)
+                while self.size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.size -= len(evicted)
+        return compressed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
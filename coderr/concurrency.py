@@ -0,0 +1,67 @@
+"""
+Optimistic concurrency for rows with a `version` column.
+
+A PATCH may send the `version` it last read. The row is written with one
+conditional UPDATE that only matches the expected version and increments it,
+so of two concurrent editors of the same version only the first one wins; the
+second gets a 409 response and has to reload the row. Without a `version` in
+the request the version loaded by the view is expected, which still guards
+the window between reading and writing the row.
+"""
+from django.db.models import F
+from rest_framework.exceptions import APIException, ValidationError
+
+
+class VersionConflict(APIException):
+    status_code = 409
+    default_detail = {"detail": ["Der Datensatz wurde inzwischen geändert. Bitte neu laden und erneut versuchen."]}
+    default_code = "version_conflict"
+
+
+def expected_version(data, instance):
+    """
+    Returns the version a request expects the row to have.
+
+    :param data: The request data, optionally containing `version`.
+    :param instance: The instance loaded by the view.
+    :return: The expected version.
+    :raises ValidationError: If the sent version is not an integer.
+    :raises VersionConflict: If the sent version is not the loaded one.
+    """
+    version = data.get('version')
+    if version in (None, ''):
+        return instance.version
+    try:
+        version = int(version)
+    except (TypeError, ValueError):
+        raise ValidationError({"detail": ["Die Version muss eine ganze Zahl sein."]})
+    if version != instance.version:
+        raise VersionConflict()
+    return version
+
+
+def save_versioned(instance, field_names, version):
+    """
+    Writes the given fields of an instance if its row still has the expected
+    version and increments the version in the same UPDATE.
+
+    The fields are prepared like `Model.save` does, so uploaded files are
+    stored and `auto_now` fields are set. The instance is updated in place
+    and not read again.
+
+    :param instance: The changed instance.
+    :param field_names: The names of the fields to write.
+    :param version: The expected version.
+    :raises VersionConflict: If the row has been changed or deleted meanwhile.
+    """
+    model = type(instance)
+    values = {}
+    for name in field_names:
+        field = model._meta.get_field(name)
+        values[field.attname] = field.pre_save(instance, False)
+    updated = model._default_manager.filter(pk=instance.pk, version=version).update(
+        version=F('version') + 1, **values,
+    )
+    if not updated:
+        raise VersionConflict()
+    instance.version = version + 1
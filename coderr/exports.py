@@ -0,0 +1,216 @@
+"""
+Streaming CSV and JSON Lines exports.
+
+The rows are read through `.iterator(chunk_size=EXPORT_CHUNK_SIZE)` and sent
+as a StreamingHttpResponse, one block of EXPORT_CHUNK_SIZE rows at a time, so
+the memory of an export stays the same for a hundred or a million rows. Under
+ASGI the blocks are handed over as an async iterator: Django would collect a
+sync iterator into one list before sending it. The
+rows have the fields and values of the list endpoints, produced by their
+ValuesListSerializer, and support the same `fields` and `omit` parameters.
+"""
+import csv
+import datetime
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from coderr.fieldsets import FieldsetViewMixin
+from coderr.renderers import FastJSONRenderer
+
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """
+    File-like object for csv.writer that returns each written line instead of storing it.
+    """
+    def write(self, value):
+        return value
+
+
+def parse_bound(value, name, end_of_day):
+    """
+    Parses a date or datetime query parameter into an aware datetime.
+
+    :param value: The parameter value, e.g. "2024-05-01" or "2024-05-01T12:00:00".
+    :param name: The parameter name, used in the error message.
+    :param end_of_day: Turn a plain date into the start of the following day
+                       and a datetime into the next microsecond.
+    :return: The aware datetime.
+    :raises ValidationError: If the value is neither a date nor a datetime.
+    """
+    try:
+        day = parse_date(value)
+        if day is not None:
+            if end_of_day:
+                day += datetime.timedelta(days=1)
+            moment = datetime.datetime.combine(day, datetime.time.min)
+        else:
+            moment = parse_datetime(value)
+            if moment is None:
+                raise ValueError(value)
+            if end_of_day:
+                moment += datetime.timedelta(microseconds=1)
+    except ValueError:
+        raise ValidationError({"detail": [f"{name} muss ein Datum (JJJJ-MM-TT) oder ein Zeitpunkt sein."]})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def filter_created(queryset, params):
+    """
+    Filters a queryset by `created_from` and `created_to`. Both bounds are
+    inclusive; a plain date as `created_to` includes the whole day.
+    """
+    if params.get('created_from'):
+        queryset = queryset.filter(created_at__gte=parse_bound(params['created_from'], 'created_from', False))
+    if params.get('created_to'):
+        queryset = queryset.filter(created_at__lt=parse_bound(params['created_to'], 'created_to', True))
+    return queryset
+
+
+def filter_choices(queryset, params, name, choices):
+    """
+    Filters a queryset by a comma separated list of choice values, e.g. `status=completed,cancelled`.
+
+    :raises ValidationError: If a value is not one of the choices.
+    """
+    if not params.get(name):
+        return queryset
+    values = [value.strip() for value in params[name].split(',') if value.strip()]
+    allowed = [choice for choice, _ in choices]
+    unknown = [value for value in values if value not in allowed]
+    if unknown:
+        raise ValidationError({"detail": [f"Unbekannte Werte für {name}: {', '.join(unknown)}. Erlaubt sind: {', '.join(allowed)}."]})
+    return queryset.filter(**{f'{name}__in': values})
+
+
+def filter_int_range(queryset, params, name):
+    """
+    Filters a queryset by `min_<name>` and `max_<name>`, both inclusive.
+
+    :raises ValidationError: If a bound is not an integer.
+    """
+    for prefix, lookup in (('min', 'gte'), ('max', 'lte')):
+        value = params.get(f'{prefix}_{name}')
+        if value in (None, ''):
+            continue
+        try:
+            queryset = queryset.filter(**{f'{name}__{lookup}': int(value)})
+        except ValueError:
+            raise ValidationError({"detail": [f"{prefix}_{name} muss eine ganze Zahl sein."]})
+    return queryset
+
+
+def csv_value(value):
+    """
+    Returns the CSV cell of a value. Lists and objects are written as JSON.
+    """
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def csv_blocks(keys, rows, block_size):
+    """
+    Yields the CSV header and then the rows in blocks of `block_size` lines.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(keys)
+    block = []
+    for row in rows:
+        block.append(writer.writerow([csv_value(row[key]) for key in keys]))
+        if len(block) >= block_size:
+            yield ''.join(block)
+            block = []
+    if block:
+        yield ''.join(block)
+
+
+def jsonl_blocks(rows, block_size):
+    """
+    Yields the rows as JSON Lines in blocks of `block_size` lines, encoded
+    like the JSON responses of the API.
+    """
+    renderer = FastJSONRenderer()
+    block = []
+    for row in rows:
+        block.append(renderer.render(row))
+        if len(block) >= block_size:
+            yield b'\n'.join(block) + b'\n'
+            block = []
+    if block:
+        yield b'\n'.join(block) + b'\n'
+
+
+async def async_blocks(blocks):
+    """
+    Yields the blocks of a sync generator to an ASGI server. Each block is
+    produced in the thread of the sync view, where its database cursor lives,
+    one at a time.
+    """
+    next_block = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    while (block := await next_block(blocks, done)) is not done:
+        yield block
+
+
+def export_response(values_serializer, export_format, filename, asgi=False):
+    """
+    Streams the rows of a ValuesListSerializer as a CSV or JSON Lines download.
+
+    :param values_serializer: The serializer with the queryset and fieldset to export.
+    :param export_format: "csv" or "jsonl".
+    :param filename: The download name without extension.
+    :param asgi: Whether the response is served by an ASGI server, which needs an async iterator.
+    :return: The StreamingHttpResponse.
+    """
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+    rows = values_serializer.iterator(chunk_size)
+    if export_format == 'csv':
+        keys = [accessor[0] for accessor in values_serializer.compile(values_serializer.fieldset)[1]]
+        content = csv_blocks(keys, rows, chunk_size)
+    else:
+        content = jsonl_blocks(rows, chunk_size)
+    if asgi:
+        content = async_blocks(content)
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+
+class ExportViewMixin(FieldsetViewMixin):
+    """
+    GET handler streaming the queryset of `get_export_queryset` with
+    `values_serializer_class` in the format taken from the URL.
+    """
+    values_serializer_class = None
+    export_filename = None
+
+    def perform_content_negotiation(self, request, force=False):
+        """
+        Accepts any Accept header, the export format is chosen by the URL.
+        """
+        return super().perform_content_negotiation(request, force=True)
+
+    def get_export_queryset(self):
+        raise NotImplementedError
+
+    def get(self, request, export_format, format=None):
+        serializer = self.values_serializer_class(self.get_export_queryset(), fieldset=self.get_fieldset())
+        asgi = isinstance(request._request, ASGIRequest)
+        return export_response(serializer, export_format, self.export_filename, asgi=asgi)
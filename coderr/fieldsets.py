@@ -0,0 +1,119 @@
+"""
+Sparse fieldsets for the read endpoints.
+
+`?fields=id,title` limits a response to the listed fields and
+`?omit=description,features` removes fields from it. Both are validated
+against the readable fields of the view's serializer. The selected fields
+trim the serializer (see FieldsetSerializerMixin) and the SQL projection
+(see fieldset_columns), so columns that are not returned are not fetched.
+"""
+from functools import lru_cache
+
+from rest_framework.exceptions import ValidationError
+
+
+@lru_cache(maxsize=None)
+def readable_fields(serializer_class):
+    """
+    Returns the readable fields of a serializer class.
+
+    :param serializer_class: The serializer class.
+    :return: A dictionary of field names and their sources, in declaration order.
+    """
+    return {name: field.source for name, field in serializer_class().fields.items() if not field.write_only}
+
+
+def _parse_names(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def get_fieldset(request, serializer_class):
+    """
+    Reads the `fields` and `omit` query parameters of a request.
+
+    :param request: The DRF request.
+    :param serializer_class: The serializer whose fields may be selected.
+    :return: A tuple of the selected field names in declaration order, or
+             None if neither parameter is given.
+    :raises ValidationError: If a name is not a field of the serializer or no field is left.
+    """
+    fields = _parse_names(request.query_params.get('fields', ''))
+    omit = _parse_names(request.query_params.get('omit', ''))
+    if not fields and not omit:
+        return None
+    available = readable_fields(serializer_class)
+    unknown = [name for name in fields + omit if name not in available]
+    if unknown:
+        raise ValidationError({"detail": [
+            f"Unbekannte Felder: {', '.join(unknown)}. Erlaubt sind: {', '.join(available)}."
+        ]})
+    fieldset = tuple(name for name in available if (not fields or name in fields) and name not in omit)
+    if not fieldset:
+        raise ValidationError({"detail": ["Es muss mindestens ein Feld ausgewählt sein."]})
+    return fieldset
+
+
+def fieldset_columns(serializer_class, fieldset):
+    """
+    Returns the `.only()` lookups needed to serialize the given fields.
+
+    Fields whose source is a concrete model field use that column. Other
+    fields (method fields, nested serializers) use the lookups declared in the
+    serializer's `fieldset_columns`, or none if they are not declared there.
+
+    :param serializer_class: A serializer class with FieldsetSerializerMixin.
+    :param fieldset: The selected field names.
+    :return: A list of lookups for `QuerySet.only()`.
+    """
+    model = serializer_class.Meta.model
+    concrete = {field.name for field in model._meta.concrete_fields}
+    sources = readable_fields(serializer_class)
+    columns = []
+    for name in fieldset:
+        if name in serializer_class.fieldset_columns:
+            columns += serializer_class.fieldset_columns[name]
+        elif sources[name] in concrete:
+            columns.append(sources[name])
+    return columns
+
+
+class FieldsetSerializerMixin:
+    """
+    Removes the fields that are not in the `fieldset` entry of the serializer
+    context. Without the entry all fields are kept, so writes are unaffected.
+
+    `fieldset_columns` maps fields that are not backed by a column of the model
+    to the lookups they read, e.g. a method field reading the creator's profile.
+    """
+    fieldset_columns = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fieldset = self.context.get('fieldset')
+        if fieldset is not None:
+            for name in [name for name in self.fields if name not in fieldset]:
+                self.fields.pop(name)
+
+
+class FieldsetViewMixin:
+    """
+    Adds the sparse fieldset of GET requests to the serializer context of a
+    generic view. `fieldset_serializer_class` defaults to the view's serializer.
+    """
+    fieldset_serializer_class = None
+
+    def get_fieldset(self):
+        """
+        Returns the validated fieldset of the request, None for writes or if
+        the request does not select fields.
+        """
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = None
+            if self.request.method in ('GET', 'HEAD'):
+                self._fieldset = get_fieldset(self.request, self.fieldset_serializer_class or self.get_serializer_class())
+        return self._fieldset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fieldset'] = self.get_fieldset()
+        return context
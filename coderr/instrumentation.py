@@ -0,0 +1,213 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework import serializers
+
+
+current_timings = ContextVar('current_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Collects the query count and the time spent in the database, the
+    serializers, the view and the renderer for a single request.
+    """
+    def __init__(self):
+        self.started = perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.view_started = None
+        self.view_finished = None
+        self.finished = None
+
+    def finish(self):
+        self.finished = perf_counter()
+        if self.view_finished is None:
+            self.view_finished = self.finished
+
+    @property
+    def total_time(self):
+        return (self.finished or perf_counter()) - self.started
+
+    @property
+    def view_time(self):
+        if self.view_started is None:
+            return 0.0
+        return (self.view_finished or perf_counter()) - self.view_started
+
+    @property
+    def render_time(self):
+        if self.view_finished is None or self.finished is None:
+            return 0.0
+        return self.finished - self.view_finished
+
+    def as_dict(self):
+        """
+        Returns the collected values with all durations in milliseconds.
+        """
+        to_ms = lambda seconds: round(seconds * 1000, 3)
+        return {
+            "queries": self.queries,
+            "db_ms": to_ms(self.db_time),
+            "serializer_ms": to_ms(self.serializer_time),
+            "view_ms": to_ms(self.view_time),
+            "render_ms": to_ms(self.render_time),
+            "total_ms": to_ms(self.total_time),
+        }
+
+
+def route_name(request):
+    """
+    Returns a stable label for the route that handled the request: the URL
+    name if the pattern has one, otherwise the route pattern without the API
+    prefix, e.g. "offerdetails" or "orders/<int:pk>/".
+
+    :param request: The HTTP request.
+    :return: The route label, or "unmatched" if the URL did not resolve.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    if match.url_name:
+        return match.url_name
+    return match.route.removeprefix('coderr/api/')
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper that counts the query and its duration on the timings of
+    the current request. Queries outside of a request are passed through.
+    """
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.db_time += perf_counter() - started
+
+
+def install_query_recorder(sender=None, connection=None, **kwargs):
+    """
+    Adds `record_query` to the execute wrappers of a database connection.
+
+    The wrapper stays installed for the lifetime of the connection and reads
+    the request from a context variable, so it also sees the queries the
+    async ORM runs in worker threads. It does not depend on DEBUG or on
+    `connection.queries`.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def serializer_timing():
+    """
+    Adds the duration of the block to the serializer time of the current
+    request. Blocks nested in another one, e.g. a serializer building the
+    `.data` of a related serializer, are not counted twice.
+    """
+    timings = current_timings.get()
+    if timings is None or timings.serializer_depth:
+        yield
+        return
+    timings.serializer_depth += 1
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        timings.serializer_depth -= 1
+        timings.serializer_time += perf_counter() - started
+
+
+class TimedSerializerMixin:
+    """
+    Times the `data` of a DRF serializer with `serializer_timing`. Lists of
+    the serializer (`many=True`) use TimedListSerializer unless its Meta names
+    another `list_serializer_class`.
+    """
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = getattr(cls, 'Meta', None)
+        if meta is not None and not hasattr(meta, 'list_serializer_class'):
+            meta.list_serializer_class = TimedListSerializer
+
+    @property
+    def data(self):
+        with serializer_timing():
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
+
+
+_exhausted = object()
+
+
+def timed_stream(content, timings, on_close):
+    """
+    Wraps the content of a streaming response, whose rows are usually
+    fetched only after the middleware has returned. The queries run while a
+    chunk is produced are counted on `timings`, and `on_close` is called once
+    the content is exhausted or the client has gone away.
+
+    :param content: The sync or async iterator of the response.
+    :param timings: The RequestTimings of the request, or None to only call `on_close`.
+    :param on_close: A callable without arguments.
+    :return: An iterator of the same kind as `content`.
+    """
+    if hasattr(content, '__aiter__'):
+        return _timed_async_stream(content, timings, on_close)
+    return _timed_sync_stream(content, timings, on_close)
+
+
+def _timed_sync_stream(content, timings, on_close):
+    iterator = iter(content)
+    try:
+        while True:
+            token = current_timings.set(timings) if timings is not None else None
+            try:
+                chunk = next(iterator, _exhausted)
+            finally:
+                if token is not None:
+                    current_timings.reset(token)
+            if chunk is _exhausted:
+                return
+            yield chunk
+    finally:
+        on_close()
+
+
+async def _timed_async_stream(content, timings, on_close):
+    iterator = aiter(content)
+    try:
+        while True:
+            token = current_timings.set(timings) if timings is not None else None
+            try:
+                chunk = await anext(iterator, _exhausted)
+            finally:
+                if token is not None:
+                    current_timings.reset(token)
+            if chunk is _exhausted:
+                return
+            yield chunk
+    finally:
+        on_close()
+
+
+def install():
+    """
+    Installs the query recorder on all current and future connections. Safe
+    to call more than once.
+    """
+    connection_created.connect(install_query_recorder, dispatch_uid='coderr.instrumentation')
+    for connection in connections.all(initialized_only=True):
+        install_query_recorder(connection=connection)
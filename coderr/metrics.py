@@ -0,0 +1,348 @@
+"""
+Prometheus style metrics shared between worker processes.
+
+Every process writes its samples into its own memory mapped file in
+METRICS_DIR. The metrics endpoint reads and sums the files of all processes,
+so the numbers cover every gunicorn worker no matter which one is scraped.
+Files of exited workers are merged into an archive file, which keeps counters
+monotonic across worker recycling: by the gunicorn `child_exit` hook, and by
+every process when it opens its own file, whatever server started it. A file
+left behind under the process's own pid belongs to an earlier process that
+had the same pid and is merged as well.
+"""
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+
+REQUEST_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+DISPATCH_LAG_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+HANDLER_DURATION_BUCKETS = REQUEST_DURATION_BUCKETS
+JOB_DELAY_BUCKETS = DISPATCH_LAG_BUCKETS
+JOB_DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+METRICS = {
+    'coderr_http_requests_total': ('counter', 'HTTP requests by route, method and status code.'),
+    'coderr_http_request_duration_seconds': ('histogram', 'HTTP request latency by route and method.', REQUEST_DURATION_BUCKETS),
+    'coderr_http_request_queries': ('histogram', 'SQL queries per HTTP request by route.', QUERY_COUNT_BUCKETS),
+    'coderr_db_queries_total': ('counter', 'SQL queries run while handling requests, by route.'),
+    'coderr_cache_requests_total': ('counter', 'Cache lookups by cache and result.'),
+    'coderr_outbox_events_dispatched_total': ('counter', 'Outbox events dispatched to their handlers, by kind.'),
+    'coderr_outbox_dispatch_lag_seconds': ('histogram', 'Time from writing an outbox event to its dispatch, by kind.', DISPATCH_LAG_BUCKETS),
+    'coderr_outbox_handler_duration_seconds': ('histogram', 'Duration of one outbox handler call, by handler.', HANDLER_DURATION_BUCKETS),
+    'coderr_outbox_handler_failures_total': ('counter', 'Failed outbox handler calls, by handler.'),
+    'coderr_jobs_total': ('counter', 'Background jobs run, by task and result.'),
+    'coderr_job_duration_seconds': ('histogram', 'Run time of background jobs, by task.', JOB_DURATION_BUCKETS),
+    'coderr_job_start_delay_seconds': ('histogram', 'Time from the scheduled start of a job to its claim, by task.', JOB_DELAY_BUCKETS),
+}
+
+HEADER = struct.Struct('i')
+LENGTH = struct.Struct('i')
+VALUE = struct.Struct('d')
+INITIAL_SIZE = 64 * 1024
+ARCHIVE_NAME = 'archive.db'
+
+
+def _padded(length):
+    return length + (-length % 8)
+
+
+class MmapedDict:
+    """
+    A string to float map stored in a memory mapped file.
+
+    Layout: a 4 byte header with the number of used bytes (padded to 8),
+    followed by entries of a 4 byte key length, the UTF-8 key padded to 8 byte
+    alignment and an 8 byte double. Only the owning process writes to the
+    file, other processes read it with `read_all`.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(INITIAL_SIZE)
+        self._capacity = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._used = HEADER.unpack_from(self._map, 0)[0] or 8
+        self._positions = {key: position for key, _, position in self._entries(self._map, self._used)}
+
+    @staticmethod
+    def _entries(data, used):
+        position = 8
+        while position < used:
+            length = LENGTH.unpack_from(data, position)[0]
+            key = bytes(data[position + 4:position + 4 + length]).decode('utf-8')
+            value_position = position + _padded(4 + length)
+            yield key, VALUE.unpack_from(data, value_position)[0], value_position
+            position = value_position + VALUE.size
+
+    @classmethod
+    def read_all(cls, path):
+        """
+        Reads every key and value of a metrics file without mapping it.
+
+        :param path: The file to read.
+        :return: A list of (key, value) tuples.
+        """
+        data = Path(path).read_bytes()
+        if len(data) < 8:
+            return []
+        return [(key, value) for key, value, _ in cls._entries(data, HEADER.unpack_from(data, 0)[0])]
+
+    def increment(self, key, amount=1.0):
+        with self._lock:
+            position = self._positions.get(key)
+            if position is None:
+                position = self._add_key(key)
+            value = VALUE.unpack_from(self._map, position)[0]
+            VALUE.pack_into(self._map, position, value + amount)
+
+    def _add_key(self, key):
+        encoded = key.encode('utf-8')
+        entry_size = _padded(4 + len(encoded)) + VALUE.size
+        while self._used + entry_size > self._capacity:
+            self._grow()
+        LENGTH.pack_into(self._map, self._used, len(encoded))
+        self._map[self._used + 4:self._used + 4 + len(encoded)] = encoded
+        position = self._used + _padded(4 + len(encoded))
+        VALUE.pack_into(self._map, position, 0.0)
+        self._used += entry_size
+        HEADER.pack_into(self._map, 0, self._used)
+        self._positions[key] = position
+        return position
+
+    def _grow(self):
+        self._capacity *= 2
+        self._map.close()
+        self._file.truncate(self._capacity)
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+_store = None
+_store_pid = None
+_store_lock = threading.Lock()
+
+
+def metrics_dir():
+    path = Path(settings.METRICS_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def get_store():
+    """
+    Returns the metrics file of the current process, opening a new one after a fork.
+    """
+    global _store, _store_pid
+    pid = os.getpid()
+    if _store_pid != pid:
+        with _store_lock:
+            if _store_pid != pid:
+                archive_dead_processes()
+                _store = MmapedDict(metrics_dir() / f'metrics_{pid}.db')
+                _store_pid = pid
+    return _store
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def archive_dead_processes():
+    """
+    Merges the files of processes that are no longer running into the
+    archive, and the file of the current pid, which can only be left over
+    from an earlier process. Called before a process opens its own file.
+    """
+    own_pid = os.getpid()
+    for path in metrics_dir().glob('metrics_*.db'):
+        try:
+            pid = int(path.stem.split('_', 1)[1])
+        except ValueError:
+            continue
+        if pid == own_pid or not _is_running(pid):
+            mark_process_dead(pid)
+
+
+def sample_key(name, labels, suffix=''):
+    return json.dumps([name, suffix, sorted(labels.items())])
+
+
+def inc(name, labels, amount=1.0):
+    """
+    Increments a counter.
+
+    :param name: The metric name as declared in METRICS.
+    :param labels: A dictionary of label names and values.
+    :param amount: The value to add.
+    """
+    get_store().increment(sample_key(name, labels), amount)
+
+
+def observe(name, labels, value, buckets):
+    """
+    Records one observation of a histogram. The bucket counts are stored
+    per bucket and made cumulative when the metrics are exported.
+
+    :param name: The metric name as declared in METRICS.
+    :param labels: A dictionary of label names and values.
+    :param value: The observed value.
+    :param buckets: The upper bounds of the histogram buckets.
+    """
+    store = get_store()
+    bound = next((bucket for bucket in buckets if value <= bucket), '+Inf')
+    store.increment(sample_key(name, {**labels, 'le': str(bound)}, '_bucket'))
+    store.increment(sample_key(name, labels, '_sum'), value)
+    store.increment(sample_key(name, labels, '_count'))
+
+
+def record_request(route, method, status_code, duration, queries):
+    """
+    Records a finished HTTP request.
+    """
+    labels = {'route': route, 'method': method}
+    inc('coderr_http_requests_total', {**labels, 'status': str(status_code)})
+    observe('coderr_http_request_duration_seconds', labels, duration, REQUEST_DURATION_BUCKETS)
+    observe('coderr_http_request_queries', {'route': route}, queries, QUERY_COUNT_BUCKETS)
+    inc('coderr_db_queries_total', {'route': route}, queries)
+
+
+def record_cache(cache_name, hit):
+    """
+    Records a cache lookup. The hit ratio per cache is derived from these
+    counters when the metrics are exported.
+
+    :param cache_name: The name of the cache.
+    :param hit: True for a hit, False for a miss.
+    """
+    inc('coderr_cache_requests_total', {'cache': cache_name, 'result': 'hit' if hit else 'miss'})
+
+
+def collect():
+    """
+    Sums the samples of all metrics files.
+
+    :return: A dictionary mapping sample keys to their summed values.
+    """
+    totals = defaultdict(float)
+    for path in metrics_dir().glob('*.db'):
+        try:
+            samples = MmapedDict.read_all(path)
+        except (OSError, UnicodeDecodeError, struct.error):
+            continue
+        for key, value in samples:
+            totals[key] += value
+    return totals
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+def render_text():
+    """
+    Renders all metrics in the Prometheus text exposition format.
+
+    Histogram buckets are made cumulative here and a `coderr_cache_hit_ratio`
+    gauge is added for every cache that has been used.
+
+    :return: The exposition text.
+    """
+    samples = defaultdict(list)
+    for key, value in collect().items():
+        name, suffix, labels = json.loads(key)
+        samples[name].append((suffix, tuple(map(tuple, labels)), value))
+    lines = []
+    for name, (metric_type, help_text, *buckets) in METRICS.items():
+        if name not in samples:
+            continue
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+        if metric_type == 'histogram':
+            lines += _render_histogram(name, samples[name], buckets[0])
+        else:
+            lines += [f'{name}{_format_labels(labels)} {value}' for _, labels, value in sorted(samples[name])]
+    lines += _render_cache_ratios(samples.get('coderr_cache_requests_total', []))
+    return '\n'.join(lines) + '\n'
+
+
+def _render_histogram(name, samples, bounds):
+    buckets, lines = defaultdict(dict), []
+    for suffix, labels, value in samples:
+        if suffix == '_bucket':
+            base = tuple(label for label in labels if label[0] != 'le')
+            buckets[base][dict(labels)['le']] = value
+    for base in sorted(buckets):
+        cumulative = 0.0
+        for bound in [str(bound) for bound in bounds] + ['+Inf']:
+            cumulative += buckets[base].get(bound, 0.0)
+            lines.append(f'{name}_bucket{_format_labels(base + (("le", bound),))} {cumulative}')
+    lines += [f'{name}{suffix}{_format_labels(labels)} {value}'
+              for suffix, labels, value in sorted(samples) if suffix in ('_sum', '_count')]
+    return lines
+
+
+def _render_cache_ratios(samples):
+    counts = defaultdict(lambda: {'hit': 0.0, 'miss': 0.0})
+    for _, labels, value in samples:
+        labels = dict(labels)
+        counts[labels['cache']][labels['result']] += value
+    if not counts:
+        return []
+    lines = ['# HELP coderr_cache_hit_ratio Share of cache lookups that were hits.', '# TYPE coderr_cache_hit_ratio gauge']
+    for cache_name, count in sorted(counts.items()):
+        ratio = count['hit'] / (count['hit'] + count['miss'])
+        lines.append(f'coderr_cache_hit_ratio{_format_labels((("cache", cache_name),))} {ratio}')
+    return lines
+
+
+def mark_process_dead(pid):
+    """
+    Merges the metrics file of an exited worker into the archive file and
+    removes it. Safe to call from several processes for the same pid.
+
+    :param pid: The pid of the exited worker.
+    """
+    path = metrics_dir() / f'metrics_{pid}.db'
+    if not path.exists():
+        return
+    with open(metrics_dir() / 'archive.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not path.exists():
+            return
+        archive = MmapedDict(metrics_dir() / ARCHIVE_NAME)
+        try:
+            for key, value in MmapedDict.read_all(path):
+                archive.increment(key, value)
+        finally:
+            archive.close()
+        path.unlink()
+
+
+def reset():
+    """
+    Removes all metrics files. Called once when the gunicorn master starts.
+    """
+    for path in metrics_dir().glob('*.db'):
+        path.unlink()
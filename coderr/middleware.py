@@ -0,0 +1,275 @@
+import json
+import logging
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.module_loading import import_string
+
+from coderr import compression, instrumentation, metrics
+
+
+logger = logging.getLogger('coderr.requests')
+
+
+class RequestTimingMiddleware:
+    """
+    Records the number of SQL queries and the database, serializer, view and
+    render time of every request.
+
+    The values are attached to the request as `request.timings`, sent back in
+    a `Server-Timing` header and written as one JSON log line per request.
+    Requests running more queries than their budget (QUERY_BUDGETS per route,
+    QUERY_BUDGET_DEFAULT otherwise) are logged as warnings. Streaming
+    responses are logged once their content is consumed, so the queries
+    fetching the rows are counted; their header only covers the view.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+            # Async hooks keep Django from running them in a worker thread.
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+        instrumentation.install()
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.current_timings.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.current_timings.reset(token)
+        return self.finish(request, response)
+
+    def start(self, request):
+        request.timings = instrumentation.RequestTimings()
+        return instrumentation.current_timings.set(request.timings)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.timings.view_started = perf_counter()
+
+    def process_template_response(self, request, response):
+        request.timings.view_finished = perf_counter()
+        return response
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        request.timings.view_started = perf_counter()
+
+    async def aprocess_template_response(self, request, response):
+        request.timings.view_finished = perf_counter()
+        return response
+
+    def finish(self, request, response):
+        """
+        Closes the timings of the request, adds the Server-Timing header and
+        writes the log line, or wraps the content of a streaming response to
+        write it once the content is consumed.
+
+        :param request: The HTTP request.
+        :param response: The rendered response.
+        :return: The response.
+        """
+        timings = request.timings
+        timings.finish()
+        values = timings.as_dict()
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={values["db_ms"]};desc="{timings.queries} queries"',
+            f'serializer;dur={values["serializer_ms"]}',
+            f'view;dur={values["view_ms"]}',
+            f'render;dur={values["render_ms"]}',
+            f'total;dur={values["total_ms"]}',
+        ])
+        if response.streaming:
+            response.streaming_content = instrumentation.timed_stream(
+                response.streaming_content, timings, lambda: self.log(request, response))
+        else:
+            self.log(request, response)
+        return response
+
+    def log(self, request, response):
+        timings = request.timings
+        timings.finish()
+        route = instrumentation.route_name(request)
+        budget = settings.QUERY_BUDGETS.get(route, settings.QUERY_BUDGET_DEFAULT)
+        over_budget = timings.queries > budget
+        record = {"method": request.method, "route": route, "status": response.status_code,
+                  **timings.as_dict(), "query_budget": budget, "over_budget": over_budget}
+        logger.log(logging.WARNING if over_budget else logging.INFO, json.dumps(record))
+
+
+class MetricsMiddleware:
+    """
+    Records request count, latency, status code and query count per route
+    in the shared metrics store. Must be placed before RequestTimingMiddleware
+    so the timings of the request are complete when they are recorded.
+    Streaming responses are recorded once their content is consumed.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = perf_counter()
+        return self.record(request, self.get_response(request), started)
+
+    async def __acall__(self, request):
+        started = perf_counter()
+        return self.record(request, await self.get_response(request), started)
+
+    def record(self, request, response, started):
+        if response.streaming:
+            response.streaming_content = instrumentation.timed_stream(
+                response.streaming_content, None, lambda: self.store(request, response, started))
+        else:
+            self.store(request, response, started)
+        return response
+
+    def store(self, request, response, started):
+        timings = getattr(request, 'timings', None)
+        metrics.record_request(
+            instrumentation.route_name(request),
+            request.method,
+            response.status_code,
+            perf_counter() - started,
+            timings.queries if timings else 0,
+        )
+
+
+class CompressionMiddleware:
+    """
+    Compresses response bodies with brotli or gzip, as negotiated from the
+    Accept-Encoding header.
+
+    Bodies below COMPRESSION_MIN_SIZE, streaming responses, responses that
+    already have a Content-Encoding, content types in
+    COMPRESSION_SKIP_CONTENT_TYPES (images and archives are compressed
+    already) and paths below COMPRESSION_EXCLUDED_PATHS are sent as they
+    are. Compressed bodies are cached by digest, so repeated identical
+    responses are compressed only once.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        self.encodings = compression.available_encodings()
+        self.cache = compression.CompressedBodyCache(settings.COMPRESSION_CACHE_MAX_BYTES)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def is_exempt(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return True
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return True
+        if response.get('Content-Type', '').startswith(tuple(settings.COMPRESSION_SKIP_CONTENT_TYPES)):
+            return True
+        return request.path_info.startswith(tuple(settings.COMPRESSION_EXCLUDED_PATHS))
+
+    def compress(self, request, response):
+        """
+        Replaces the body of the response with its compressed form if the
+        client accepts a supported encoding and the body gets smaller.
+
+        :param request: The HTTP request.
+        :param response: The response returned by the view.
+        :return: The response.
+        """
+        if self.is_exempt(request, response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.negotiate(request.headers.get('Accept-Encoding', ''), self.encodings)
+        if encoding is None:
+            return response
+        compressed = self.cache.get_or_compress(encoding, response.content, self.encodings[encoding])
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+class AdminOnlyMiddleware:
+    """
+    Runs the middleware listed in ADMIN_ONLY_MIDDLEWARE only for requests
+    below ADMIN_URL_PREFIX. Every other request goes straight to the next
+    middleware, so the token-authenticated API skips the session, CSRF and
+    messages handling it does not use.
+
+    Django only registers the `process_view` hooks of middleware listed in
+    MIDDLEWARE, so the hooks of the wrapped middleware (e.g. the CSRF check)
+    are called from here.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        self.view_hooks = []
+        handler = get_response
+        for path in reversed(settings.ADMIN_ONLY_MIDDLEWARE):
+            handler = import_string(path)(handler)
+            if hasattr(handler, 'process_view'):
+                self.view_hooks.insert(0, handler.process_view)
+        self.admin_handler = handler
+        if self.is_async:
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
+
+    def is_admin_request(self, request):
+        return request.path_info.startswith(settings.ADMIN_URL_PREFIX)
+
+    def __call__(self, request):
+        if self.is_admin_request(request):
+            return self.admin_handler(request)
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.is_admin_request(request):
+            return None
+        for hook in self.view_hooks:
+            response = hook(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if not self.is_admin_request(request):
+            return None
+        return await sync_to_async(AdminOnlyMiddleware.process_view)(self, request, view_func, view_args, view_kwargs)
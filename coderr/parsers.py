@@ -0,0 +1,36 @@
+import re
+from io import BytesIO
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# orjson reads integers beyond 64 bit as floats, the stdlib keeps them exact.
+LONG_DIGIT_RUN = re.compile(rb'[0-9]{19}')
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser that decodes request bodies with orjson when it is installed.
+
+    orjson rejects NaN and Infinity just like the strict stdlib parser. Bodies
+    orjson cannot decode and bodies with integers beyond 64 bit are handed to
+    JSONParser, so they behave exactly as before, including the error message.
+    """
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        body = stream.read()
+        if LONG_DIGIT_RUN.search(body):
+            return super().parse(BytesIO(body), media_type, parser_context)
+        try:
+            return orjson.loads(body if encoding.lower().replace('-', '') == 'utf8' else body.decode(encoding))
+        except (orjson.JSONDecodeError, UnicodeDecodeError):
+            return super().parse(BytesIO(body), media_type, parser_context)
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -22,6 +23,17 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 MEDIA_URL = "/coderr/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Image fields are streamed to disk by ImageUploadHandler and capped per field.
+FILE_UPLOAD_HANDLERS = [
+    'coderr.uploadhandlers.ImageUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+IMAGE_UPLOAD_MAX_SIZES = {
+    'image': 5 * 1024 * 1024,
+    'file': 5 * 1024 * 1024,
+}
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -29,8 +41,13 @@ MEDIA_ROOT = BASE_DIR / "media"
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv('SECRET_KEY')
 
+# CODERR_ENV=production selects the lean production profile: DEBUG off, a
+# minimal middleware chain for the API and JSON rendering only.
+CODERR_ENV = os.getenv('CODERR_ENV', 'development')
+PRODUCTION = CODERR_ENV == 'production'
+
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = not PRODUCTION
 
 ALLOWED_HOSTS = ['127.0.0.1', 'vm.paul-ivan.com', '185.254.96.202']
 
@@ -52,20 +69,169 @@ INSTALLED_APPS = [
     'orders',
     'reviews',
     'baseinfo',
+    'idempotency',
+    'events',
+    'jobs',
 ]
 
 MIDDLEWARE = [
+    'coderr.middleware.MetricsMiddleware',
+    'coderr.middleware.RequestTimingMiddleware',
+    'coderr.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
-    'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# The API authenticates with tokens and only returns JSON, so in production
+# the session, CSRF, auth, messages and clickjacking middleware only run for
+# the admin, wrapped by AdminOnlyMiddleware.
+ADMIN_URL_PREFIX = '/coderr/admin/'
+ADMIN_ONLY_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+if PRODUCTION:
+    MIDDLEWARE = [
+        'coderr.middleware.MetricsMiddleware',
+        'coderr.middleware.RequestTimingMiddleware',
+        'coderr.middleware.CompressionMiddleware',
+        'corsheaders.middleware.CorsMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'django.middleware.common.CommonMiddleware',
+        'coderr.middleware.AdminOnlyMiddleware',
+    ]
+    # The admin checks look for these in MIDDLEWARE, AdminOnlyMiddleware provides them.
+    SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
+
+
+# Responses are compressed with brotli (if installed) or gzip by
+# CompressionMiddleware. Media files are served as they are.
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+COMPRESSION_CACHE_MAX_BYTES = 16 * 1024 * 1024
+COMPRESSION_EXCLUDED_PATHS = [MEDIA_URL, '/static/']
+COMPRESSION_SKIP_CONTENT_TYPES = ['image/', 'video/', 'audio/', 'application/zip', 'application/gzip', 'font/woff2']
+
+# Responses to POSTs with an Idempotency-Key header are replayed for retries
+# within this many seconds, see idempotency/decorators.py.
+IDEMPOTENCY_TTL = 24 * 60 * 60
+
+# Rows fetched per round-trip and sent per block by the CSV/JSONL exports,
+# see coderr/exports.py.
+EXPORT_CHUNK_SIZE = 2000
+
+# Lines validated and inserted per transaction by the bulk offer import,
+# see offers/importer.py.
+OFFER_IMPORT_CHUNK_SIZE = 500
+
+# Most ids one request of `GET /offerdetails/?ids=1,2,3` may ask for.
+OFFER_DETAIL_BATCH_MAX_IDS = 100
+
+# Server-Sent Events of order changes, see events/hub.py. Every ASGI worker
+# polls the outbox every EVENTS_POLL_INTERVAL seconds while clients are
+# connected and sends a comment every EVENTS_HEARTBEAT seconds to idle ones.
+EVENTS_POLL_INTERVAL = 0.5
+EVENTS_POLL_BATCH_SIZE = 500
+EVENTS_POLL_LOOKBACK = 50
+EVENTS_HEARTBEAT = 15
+EVENTS_RETRY_MS = 3000
+EVENTS_QUEUE_SIZE = 1000
+
+# Handlers of outbox events, see events/dispatcher.py. The dispatcher runs as
+# `manage.py run_event_dispatcher` ("process") or as a thread in every web
+# worker ("thread"). It drains up to EVENTS_DISPATCH_BATCH_SIZE events per
+# round and waits EVENTS_DISPATCH_INTERVAL seconds when the outbox is empty.
+EVENTS_DISPATCHER = os.getenv('CODERR_EVENTS_DISPATCHER', 'process')
+EVENTS_DISPATCH_INTERVAL = 1.0
+EVENTS_DISPATCH_BATCH_SIZE = 200
+EVENTS_DISPATCH_MAX_ATTEMPTS = 5
+# `manage.py purge_outbox` deletes dispatched events older than this.
+EVENTS_RETENTION = 7 * 24 * 60 * 60
+
+# Facet counts of `GET /offers/?facets=...`, see offers/facets.py. Price
+# buckets are split at OFFER_FACET_PRICE_EDGES (lower bound inclusive),
+# delivery time buckets end at OFFER_FACET_DELIVERY_EDGES days (inclusive).
+OFFER_FACET_PRICE_EDGES = [50, 100, 250, 500, 1000]
+OFFER_FACET_DELIVERY_EDGES = [1, 3, 7, 14, 30]
+OFFER_FACET_CREATOR_LIMIT = 20
+OFFER_FACETS_CACHE_TTL = 60
+
+# Popularity of offers for `ordering=popular`, see offers/popularity.py. Every
+# order adds 1 to the order score of its offer, which halves every
+# POPULARITY_HALF_LIFE seconds. The seller rating is weighted with
+# POPULARITY_RATING_WEIGHT and pulled towards POPULARITY_RATING_PRIOR by
+# POPULARITY_RATING_PRIOR_COUNT virtual reviews.
+POPULARITY_HALF_LIFE = int(os.getenv('POPULARITY_HALF_LIFE', 7 * 24 * 60 * 60))
+POPULARITY_DECAY_INTERVAL = int(os.getenv('POPULARITY_DECAY_INTERVAL', 60 * 60))
+POPULARITY_RATING_WEIGHT = 1.0
+POPULARITY_RATING_PRIOR = 3.0
+POPULARITY_RATING_PRIOR_COUNT = 5
+
+# Per-process prefix index of `GET /offers/autocomplete/`, see
+# offers/autocomplete.py. It holds at most AUTOCOMPLETE_MAX_ENTRIES keys of
+# AUTOCOMPLETE_KEY_LENGTH characters and applies the outbox events every
+# AUTOCOMPLETE_REFRESH_INTERVAL seconds, 0 to not follow them.
+AUTOCOMPLETE_MAX_ENTRIES = 200_000
+AUTOCOMPLETE_KEY_LENGTH = 32
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+AUTOCOMPLETE_REFRESH_INTERVAL = float(os.getenv('AUTOCOMPLETE_REFRESH_INTERVAL', '1.0'))
+
+# Background jobs stored in the database, see jobs/queue.py and
+# `manage.py run_workers`. Failed jobs are retried after JOBS_RETRY_BACKOFF
+# seconds, doubled with every attempt. On SQLite the claims of all workers
+# are serialized with JOBS_LOCK_FILE.
+JOBS_MAX_ATTEMPTS = 3
+JOBS_RETRY_BACKOFF = 10
+JOBS_RETRY_BACKOFF_MAX = 60 * 60
+JOBS_POLL_INTERVAL = 1.0
+JOBS_LOCK_TIMEOUT = 30 * 60
+JOBS_LOCK_FILE = os.getenv('CODERR_JOBS_LOCK_FILE', os.path.join(tempfile.gettempdir(), 'coderr-jobs.lock'))
+JOBS_RETENTION = 7 * 24 * 60 * 60
+
+# Seconds the platform numbers of /base-info/ are cached, 0 to compute them
+# on every request. The cache is refreshed by an outbox handler after every
+# new offer, review or profile, see baseinfo/handlers.py.
+BASEINFO_CACHE_TTL = int(os.getenv('CODERR_BASEINFO_CACHE_TTL', '0'))
+
+# Token bucket throttling per scope, see coderr/throttling.py. "keys" lists
+# the identities that get their own bucket: "ip", "user" and "token".
+THROTTLE_SCOPES = {
+    'login': {'rate': '10/min', 'keys': ['ip']},
+    'registration': {'rate': '5/hour', 'keys': ['ip']},
+    'order-create': {'rate': '30/min', 'keys': ['user', 'ip']},
+    'review-create': {'rate': '10/min', 'keys': ['user', 'ip']},
+}
+THROTTLE_STORE = os.getenv('CODERR_THROTTLE_STORE', 'file')
+THROTTLE_FILE = os.getenv('CODERR_THROTTLE_FILE', os.path.join(tempfile.gettempdir(), 'coderr-throttle.db'))
+THROTTLE_SLOTS = 65536
+THROTTLE_CACHE = 'default'
+
+# Requests running more SQL queries than their budget are logged as warnings.
+# QUERY_BUDGETS is keyed by URL name or route, e.g. 'offerdetails' or 'orders/<int:pk>/'.
+QUERY_BUDGET_DEFAULT = 20
+QUERY_BUDGETS = {
+    'offers/': 5,
+    'offerdetails': 2,
+    'offerdetails-batch': 1,
+}
+
+# Per-process metrics files, summed by the internal metrics endpoint. The
+# endpoint answers only requests with `Authorization: Bearer <METRICS_TOKEN>`
+# and is disabled while no token is set.
+METRICS_DIR = os.getenv('CODERR_METRICS_DIR', os.path.join(tempfile.gettempdir(), 'coderr-metrics'))
+METRICS_TOKEN = os.getenv('CODERR_METRICS_TOKEN', '')
 
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -89,6 +255,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'coderr.wsgi.application'
 
+# Set by coderr/asgi.py: serve the read-only endpoints through their async views.
+ASYNC_READ_VIEWS = os.getenv('CODERR_ASYNC_READ_VIEWS', '0') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
@@ -101,6 +270,17 @@ DATABASES = {
 }
 
 
+# The cache is shared by the web workers and the outbox dispatcher, whose
+# handlers refresh cached values. Files in CODERR_CACHE_DIR are shared by the
+# processes of one host. Use a shared backend such as Redis for several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CODERR_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'coderr-cache')),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -119,6 +299,12 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Login and registration hash passwords on a bounded thread pool per process,
+# see coderr_auth/hashing.py.
+PASSWORD_HASHING_WORKERS = int(os.getenv('CODERR_PASSWORD_HASHING_WORKERS', '2'))
+PASSWORD_HASHING_MAX_PENDING = int(os.getenv('CODERR_PASSWORD_HASHING_MAX_PENDING', '32'))
+PASSWORD_HASHING_WAIT = 5
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -148,7 +334,39 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'coderr.renderers.FastJSONRenderer',
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'coderr.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,  
+    # Reverse proxies in front of the app. The client address used by the
+    # throttles is taken from X-Forwarded-For only behind a proxy, see
+    # coderr/throttling.py. gunicorn.conf.py expects one.
+    'NUM_PROXIES': int(os.getenv('CODERR_NUM_PROXIES', '1' if PRODUCTION else '0')),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'coderr': {
+            'handlers': ['console'],
+            'level': os.getenv('CODERR_LOG_LEVEL', 'INFO'),
+        },
+    },
 }
 
+# Silences the request log of the test requests, see coderr/test_runner.py.
+TEST_RUNNER = 'coderr.test_runner.TestRunner'
+
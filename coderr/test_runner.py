@@ -0,0 +1,25 @@
+"""
+Test runner of the project, set as TEST_RUNNER.
+
+The test requests would otherwise print one line each on the
+`coderr.requests` logger. Tests of the log lines use `assertLogs`, which
+captures them regardless of the level set here.
+"""
+import logging
+
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        """
+        Silences the request log below errors while the tests run.
+        """
+        super().setup_test_environment(**kwargs)
+        logger = logging.getLogger('coderr.requests')
+        self.request_log_level = logger.level
+        logger.setLevel(logging.ERROR)
+
+    def teardown_test_environment(self, **kwargs):
+        logging.getLogger('coderr.requests').setLevel(self.request_log_level)
+        super().teardown_test_environment(**kwargs)
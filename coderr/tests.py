@@ -0,0 +1,261 @@
+import datetime
+import decimal
+import gzip
+import json
+import os
+import tempfile
+import uuid
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncClient, Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework import serializers
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from coderr import compression, instrumentation, metrics
+from coderr.middleware import CompressionMiddleware
+from coderr.renderers import FastJSONRenderer
+from coderr_auth.models import Profile
+from offers.models import Offer, OfferDetail
+from orders.api.serializers import OrdersListSerializer
+from orders.models import Order
+
+
+class MetricsEndpointTests(TestCase):
+    url = '/coderr/internal/metrics/'
+
+    @override_settings(METRICS_TOKEN='')
+    def test_is_disabled_without_token(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+
+    @override_settings(METRICS_TOKEN='geheim')
+    def test_requires_the_shared_token_from_any_address(self):
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION='Bearer falsch').status_code, 404)
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Bearer geheim', REMOTE_ADDR='203.0.113.7')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('coderr_http_requests_total', response.content.decode())
+
+
+class MetricsFileTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(METRICS_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        store, store_pid = metrics._store, metrics._store_pid
+        self.addCleanup(setattr, metrics, '_store', store)
+        self.addCleanup(setattr, metrics, '_store_pid', store_pid)
+        self.directory = directory.name
+
+    def write_file(self, pid, value):
+        store = metrics.MmapedDict(os.path.join(self.directory, f'metrics_{pid}.db'))
+        store.increment(metrics.sample_key('coderr_jobs_total', {}), value)
+        store.close()
+
+    def test_files_of_dead_and_earlier_processes_are_archived_on_first_use(self):
+        self.write_file(os.getpid(), 2)
+        self.write_file(2 ** 22 + 1, 3)
+        metrics._store_pid = None
+        metrics.inc('coderr_jobs_total', {})
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['archive.db', 'archive.lock', f'metrics_{os.getpid()}.db'])
+        own_file = os.path.join(self.directory, f'metrics_{os.getpid()}.db')
+        self.assertEqual(metrics.MmapedDict.read_all(own_file), [(metrics.sample_key('coderr_jobs_total', {}), 1.0)])
+        self.assertEqual(metrics.collect()[metrics.sample_key('coderr_jobs_total', {})], 6)
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    payloads = [
+        {'a': 1e-05}, {'a': 1e16}, {'a': 0.1, 'b': -2.5}, 1e-05, [1.0, 3],
+        {'price': '149.90', 'text': 'a,1.5 und 2e3'}, {'count': 2 ** 70}, {'count': -2 ** 63},
+        {'name': 'Jürgen 😀', 'ctrl': '\x00\x1f\x7f"\\/', 'sep': '\u2028\u2029'},
+        {'when': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+         'day': datetime.date(2024, 5, 1), 'id': uuid.UUID(int=1), 'amount': decimal.Decimal('9.50')},
+        {'nested': [{'a': None, 'b': True}, [], {}], 1: 'int key'}, None, 'text', [None, False],
+    ]
+
+    def assert_same(self, fast, drf, data):
+        try:
+            expected = drf.render(data)
+        except ValueError:
+            with self.assertRaises(ValueError):
+                fast.render(data)
+            return
+        self.assertEqual(fast.render(data), expected, data)
+
+    def test_renders_the_same_bytes_as_drf(self):
+        for data in self.payloads + [{'a': float('nan')}, [float('inf')], {'a': decimal.Decimal('NaN')}]:
+            self.assert_same(FastJSONRenderer(), JSONRenderer(), data)
+
+    def test_non_default_settings_match_drf(self):
+        for options in ({'ensure_ascii': True}, {'strict': False}):
+            fast = type('Renderer', (FastJSONRenderer,), options)()
+            drf = type('Renderer', (JSONRenderer,), options)()
+            for data in self.payloads + [{'a': float('nan')}, [float('-inf')]]:
+                self.assert_same(fast, drf, data)
+
+
+class RequestTimingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = User.objects.create_user(username='business', password='secret')
+        Profile.objects.create(user=cls.business, email='business@example.com', type='business')
+        offer = Offer.objects.create(user=cls.business, title='Logo', description='Logo Design')
+        detail = OfferDetail.objects.create(offer=offer, title='Basic', revisions=2, delivery_time_in_days=5,
+                                            price=decimal.Decimal('149.90'), features=['Logo'], offer_type='basic')
+        Order.objects.create(offer_detail_id=detail, customer_user=7, status='in_progress')
+
+    def test_serializers_are_timed_without_patching_drf(self):
+        self.assertEqual(serializers.Serializer.__dict__['data'].fget.__module__, 'rest_framework.serializers')
+        timings = instrumentation.RequestTimings()
+        token = instrumentation.current_timings.set(timings)
+        try:
+            serializer = OrdersListSerializer(Order.objects.all(), many=True)
+            self.assertIsInstance(serializer, instrumentation.TimedListSerializer)
+            self.assertEqual(len(serializer.data), 1)
+        finally:
+            instrumentation.current_timings.reset(token)
+        self.assertGreater(timings.serializer_time, 0)
+        self.assertEqual(timings.serializer_depth, 0)
+
+    def test_streaming_responses_are_logged_with_the_queries_of_their_rows(self):
+        client = APIClient()
+        client.force_authenticate(self.business)
+        with self.assertLogs('coderr.requests', 'INFO') as logs:
+            response = client.get('/coderr/api/orders/export.jsonl')
+            self.assertEqual(logs.records, [])
+            self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+        record = json.loads(logs.records[-1].getMessage())
+        view_queries = int(response['Server-Timing'].split('desc="')[1].split()[0])
+        self.assertEqual(record['route'], 'orders-export')
+        self.assertGreater(record['queries'], view_queries)
+
+
+class CompressionNegotiationTests(SimpleTestCase):
+    encodings = {'br': None, 'gzip': None}
+
+    def test_highest_q_value_wins_and_ties_follow_the_preference(self):
+        cases = [
+            ('gzip', 'gzip'), ('GZIP', 'gzip'), ('gzip, br', 'br'), ('br;q=0.5, gzip;q=0.8', 'gzip'),
+            ('', None), ('identity', None), ('deflate', None),
+        ]
+        for header, expected in cases:
+            self.assertEqual(compression.negotiate(header, self.encodings), expected, header)
+
+    def test_zero_q_values_exclude_and_star_matches_the_rest(self):
+        cases = [
+            ('gzip;q=0', None), ('br;q=0, gzip;q=0', None), ('gzip;q=x', None), ('*', 'br'),
+            ('*;q=0', None), ('br;q=0, *', 'gzip'), ('*;q=0.2, gzip;q=0.5', 'gzip'), ('*;q=0, gzip', 'gzip'),
+        ]
+        for header, expected in cases:
+            self.assertEqual(compression.negotiate(header, self.encodings), expected, header)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100, COMPRESSION_EXCLUDED_PATHS=['/coderr/media/'],
+                   COMPRESSION_SKIP_CONTENT_TYPES=['image/'])
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = b'{"results": [' + b', '.join(b'{"title": "Logo Design"}' for _ in range(20)) + b']}'
+
+    def process(self, response, path='/coderr/api/offers/', accept_encoding='gzip'):
+        middleware = CompressionMiddleware(lambda request: response)
+        middleware.encodings = {'gzip': compression._compress_gzip}
+        return middleware(RequestFactory().get(path, HTTP_ACCEPT_ENCODING=accept_encoding))
+
+    def test_compresses_bodies_from_the_minimum_size(self):
+        response = self.process(HttpResponse(self.body, content_type='application/json'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        small = self.process(HttpResponse(self.body[:99], content_type='application/json'))
+        self.assertEqual(small.content, self.body[:99])
+        self.assertFalse(small.has_header('Content-Encoding'))
+
+    def test_refused_encoding_leaves_the_body_but_varies(self):
+        response = self.process(HttpResponse(self.body), accept_encoding='gzip;q=0')
+        self.assertEqual(response.content, self.body)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_skipped_content_types_paths_and_streams_are_sent_as_they_are(self):
+        responses = [
+            self.process(HttpResponse(self.body, content_type='image/svg+xml')),
+            self.process(HttpResponse(self.body), path='/coderr/media/uploads/logo.json'),
+        ]
+        for response in responses:
+            self.assertEqual(response.content, self.body)
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertFalse(response.has_header('Vary'))
+        streaming = self.process(StreamingHttpResponse([self.body]))
+        self.assertEqual(b''.join(streaming.streaming_content), self.body)
+        self.assertFalse(streaming.has_header('Content-Encoding'))
+        encoded = HttpResponse(self.body)
+        encoded['Content-Encoding'] = 'br'
+        self.assertEqual(self.process(encoded).content, self.body)
+
+    def test_strong_etags_become_weak(self):
+        response = HttpResponse(self.body)
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.process(response)['ETag'], 'W/"abc"')
+        response = HttpResponse(self.body)
+        response['ETag'] = 'W/"abc"'
+        self.assertEqual(self.process(response)['ETag'], 'W/"abc"')
+
+
+@override_settings(MIDDLEWARE=[
+    'coderr.middleware.MetricsMiddleware',
+    'coderr.middleware.RequestTimingMiddleware',
+    'coderr.middleware.CompressionMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'coderr.middleware.AdminOnlyMiddleware',
+], THROTTLE_SCOPES={})
+class AdminOnlyMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='secret', email='admin@example.com')
+        cls.business = User.objects.create_user(username='business', password='secret')
+        Profile.objects.create(user=cls.business, email='business@example.com', type='business')
+        cls.token = Token.objects.create(user=cls.business)
+
+    def test_admin_requests_get_session_csrf_and_messages(self):
+        client = Client(enforce_csrf_checks=True)
+        login_page = client.get('/coderr/admin/login/')
+        self.assertEqual(login_page.status_code, 200)
+        self.assertEqual(login_page['X-Frame-Options'], 'DENY')
+        self.assertTrue(hasattr(login_page.wsgi_request, '_messages'))
+        csrf_token = login_page.cookies['csrftoken'].value
+        credentials = {'username': 'admin', 'password': 'secret'}
+        self.assertEqual(client.post('/coderr/admin/login/', credentials).status_code, 403)
+        response = client.post('/coderr/admin/login/', {**credentials, 'csrfmiddlewaretoken': csrf_token})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('sessionid', response.cookies)
+        index = client.get('/coderr/admin/')
+        self.assertEqual(index.status_code, 200)
+        self.assertEqual(index.wsgi_request.user, self.admin)
+
+    def test_api_requests_skip_session_csrf_and_messages(self):
+        client = Client(enforce_csrf_checks=True)
+        response = client.get('/coderr/api/offers/')
+        self.assertEqual(response.status_code, 200)
+        for attribute in ('session', '_messages'):
+            self.assertFalse(hasattr(response.wsgi_request, attribute), attribute)
+        self.assertFalse(response.has_header('X-Frame-Options'))
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        self.assertEqual(response.cookies, {})
+        response = client.post('/coderr/api/offers/', {
+            'title': 'Logo', 'description': 'Logo Design',
+            'details': [{'title': offer_type, 'revisions': 1, 'delivery_time_in_days': 3, 'price': '100',
+                         'features': ['Logo'], 'offer_type': offer_type} for offer_type in ('basic', 'standard', 'premium')],
+        }, content_type='application/json', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(response.status_code, 201, response.content)
+
+    async def test_admin_csrf_check_runs_under_asgi(self):
+        client = AsyncClient(enforce_csrf_checks=True)
+        self.assertEqual((await client.post('/coderr/admin/login/', {'username': 'admin'})).status_code, 403)
+        self.assertEqual((await client.get('/coderr/api/offers/')).status_code, 200)
@@ -0,0 +1,239 @@
+"""
+Token bucket throttling shared by all worker processes.
+
+Every throttled view names a scope in `throttle_scope`. THROTTLE_SCOPES maps
+the scope to its rate (e.g. "10/min", the bucket holds 10 tokens and refills
+one every 6 seconds) and to the identities that get their own bucket:
+"ip", "user" and "token". A request must get a token from each of its
+buckets, otherwise it is answered with 429 and a Retry-After header. All
+buckets are checked before any token is taken, so a request denied by one
+bucket does not drain the others.
+
+The "ip" bucket is keyed by DRF's `get_ident`. REST_FRAMEWORK['NUM_PROXIES']
+must match the reverse proxies in front of the app: with 0 the
+X-Forwarded-For header is ignored, with 1 the address added by the proxy is
+used. Otherwise clients could pick their own bucket by sending the header.
+
+The buckets live in a memory mapped file (THROTTLE_STORE = "file"), so all
+gunicorn workers on a host share them, or in a Django cache
+(THROTTLE_STORE = "cache", using THROTTLE_CACHE) for several hosts.
+"""
+import fcntl
+import functools
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+
+PERIODS = {'s': 1, 'sec': 1, 'second': 1, 'm': 60, 'min': 60, 'minute': 60,
+           'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+SLOT = struct.Struct('Qdd')
+GROUP_SIZE = 8
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """
+    Parses a rate like "10/min" into the bucket capacity and the refill rate.
+
+    :param rate: The number of requests and the period, separated by a slash.
+    :return: A tuple of the capacity in tokens and the tokens added per second.
+    """
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / PERIODS[period.strip()]
+
+
+@functools.lru_cache(maxsize=4096)
+def key_hash(key):
+    """
+    Returns a stable, non-zero 64 bit hash of a bucket key. Python's own
+    `hash` is randomized per process and cannot be shared between workers.
+    """
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+
+
+def refill(tokens, updated, now, capacity, refill_rate):
+    """
+    Takes one token from a bucket.
+
+    :return: A tuple of the new token count and the seconds to wait, 0 if
+             the token was granted.
+    """
+    tokens = min(capacity, tokens + max(0.0, now - updated) * refill_rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / refill_rate
+
+
+class FileBucketStore:
+    """
+    Token buckets in a memory mapped hash table.
+
+    The table has THROTTLE_SLOTS slots of (key hash, tokens, last update),
+    grouped in runs of eight. A key is stored in the group its hash points
+    to, taking over an empty or the least recently updated slot when it is not
+    there yet. The slot last seen for a key is remembered and checked first.
+    Each group is guarded by a byte range lock on the file for the other
+    processes and by a thread lock within the process.
+    """
+    def __init__(self, path, slots):
+        self.path = path
+        self.groups = max(1, slots // GROUP_SIZE)
+        size = self.groups * GROUP_SIZE * SLOT.size
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size < size:
+            self._file.truncate(size)
+        self._fd = self._file.fileno()
+        self._map = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()
+        self._positions = {}
+
+    def consume(self, key, capacity, refill_rate, now, take=True):
+        """
+        Takes one token from the bucket of a key.
+
+        :param key: The bucket key.
+        :param capacity: The maximum number of tokens.
+        :param refill_rate: The tokens added per second.
+        :param now: The current time in seconds.
+        :param take: False to only check for a token and leave the bucket unchanged.
+        :return: The seconds to wait before retrying, 0 if the request may pass.
+        """
+        hashed = key_hash(key)
+        group_size = GROUP_SIZE * SLOT.size
+        start = (hashed % self.groups) * group_size
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, group_size, start)
+            try:
+                position, tokens, updated = self._find_slot(hashed, start, capacity, now)
+                tokens, wait = refill(tokens, updated, now, capacity, refill_rate)
+                if take:
+                    SLOT.pack_into(self._map, position, hashed, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, group_size, start)
+        return wait
+
+    def _find_slot(self, hashed, start, capacity, now):
+        position = self._positions.get(hashed)
+        if position is not None:
+            slot_hash, tokens, updated = SLOT.unpack_from(self._map, position)
+            if slot_hash == hashed:
+                return position, tokens, updated
+        if len(self._positions) >= self.groups * GROUP_SIZE:
+            self._positions.clear()
+        position, tokens, updated = self._scan_group(hashed, start, capacity, now)
+        self._positions[hashed] = position
+        return position, tokens, updated
+
+    def _scan_group(self, hashed, start, capacity, now):
+        oldest_position, oldest_updated = start, math.inf
+        for position in range(start, start + GROUP_SIZE * SLOT.size, SLOT.size):
+            slot_hash, tokens, updated = SLOT.unpack_from(self._map, position)
+            if slot_hash == hashed:
+                return position, tokens, updated
+            if slot_hash == 0:
+                return position, capacity, now
+            if updated < oldest_updated:
+                oldest_position, oldest_updated = position, updated
+        return oldest_position, capacity, now
+
+
+class CacheBucketStore:
+    """
+    Token buckets in a Django cache, for deployments spanning several hosts.
+    Reads and writes are not atomic, so concurrent requests of one client
+    may occasionally both get the last token.
+    """
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def consume(self, key, capacity, refill_rate, now, take=True):
+        cache_key = f'throttle:{key}'
+        tokens, updated = self.cache.get(cache_key, (capacity, now))
+        tokens, wait = refill(tokens, updated, now, capacity, refill_rate)
+        if take:
+            self.cache.set(cache_key, (tokens, now), timeout=math.ceil(capacity / refill_rate) + 1)
+        return wait
+
+
+_store = None
+_store_config = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    Returns the bucket store configured by THROTTLE_STORE, reopening it when
+    the configuration or the process changes.
+    """
+    global _store, _store_config
+    config = (settings.THROTTLE_STORE, settings.THROTTLE_FILE, settings.THROTTLE_CACHE, os.getpid())
+    if _store_config != config:
+        with _store_lock:
+            if _store_config != config:
+                if settings.THROTTLE_STORE == 'cache':
+                    _store = CacheBucketStore(settings.THROTTLE_CACHE)
+                else:
+                    _store = FileBucketStore(settings.THROTTLE_FILE, settings.THROTTLE_SLOTS)
+                _store_config = config
+    return _store
+
+
+class TooManyRequests(Throttled):
+    default_detail = "Zu viele Anfragen."
+    extra_detail_singular = "Bitte in {wait} Sekunde erneut versuchen."
+    extra_detail_plural = "Bitte in {wait} Sekunden erneut versuchen."
+
+    def __init__(self, wait=None, detail=None, code=None):
+        super().__init__(wait, detail, code)
+        self.detail = {"detail": [self.detail]}
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttles the requests of a view by its `throttle_scope`, see the module
+    docstring. Views can limit throttling to some methods with
+    `throttle_methods`, e.g. only POST on a list endpoint.
+    """
+    def allow_request(self, request, view):
+        methods = getattr(view, 'throttle_methods', None)
+        if methods is not None and request.method not in methods:
+            return True
+        scope = settings.THROTTLE_SCOPES.get(getattr(view, 'throttle_scope', None))
+        if not scope:
+            return True
+        capacity, refill_rate = parse_rate(scope['rate'])
+        store, now = get_store(), time.time()
+        keys = self.get_keys(request, view.throttle_scope, scope['keys'])
+        wait = max((store.consume(key, capacity, refill_rate, now, take=False) for key in keys), default=0.0)
+        if not wait:
+            for key in keys:
+                wait = max(wait, store.consume(key, capacity, refill_rate, now))
+        if wait:
+            raise TooManyRequests(wait)
+        return True
+
+    def get_keys(self, request, scope_name, identities):
+        """
+        Returns the bucket keys of a request for the configured identities.
+        The user and token buckets only apply to authenticated requests.
+        """
+        keys = []
+        if 'ip' in identities:
+            keys.append(f'{scope_name}:ip:{self.get_ident(request)}')
+        if 'user' in identities and request.user and request.user.is_authenticated:
+            keys.append(f'{scope_name}:user:{request.user.pk}')
+        if 'token' in identities and request.auth is not None:
+            keys.append(f'{scope_name}:token:{key_hash(str(getattr(request.auth, "key", request.auth))):x}')
+        return keys
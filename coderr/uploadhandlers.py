@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.core.files.uploadhandler import StopFutureHandlers, TemporaryFileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+
+
+IMAGE_SIGNATURES = (
+    b'\x89PNG\r\n\x1a\n',
+    b'\xff\xd8\xff',
+    b'GIF87a',
+    b'GIF89a',
+)
+
+
+class ImageUploadRejected(MultiPartParserError):
+    """
+    Raised while the multipart body is still being read when an image upload
+    is too large or is not an image. DRF turns it into a 400 response.
+    """
+
+
+def has_image_signature(head):
+    """
+    Checks the first bytes of an upload against the known image formats.
+
+    :param head: The first chunk of the uploaded file.
+    :return: True if the chunk starts with a PNG, JPEG, GIF or WEBP signature.
+    """
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return True
+    return head.startswith(IMAGE_SIGNATURES)
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams the image-bearing fields listed in IMAGE_UPLOAD_MAX_SIZES straight
+    into a temporary file in fixed chunks. The magic bytes are checked on the
+    first chunk and the size cap on every chunk, so bad uploads are rejected
+    before the rest of the body is read. Other fields are passed on to the
+    next handler untouched.
+    """
+    chunk_size = 64 * 2 ** 10
+
+    def new_file(self, field_name, *args, **kwargs):
+        """
+        Takes over the file if its field is an image field, otherwise leaves it
+        to the following handlers.
+        """
+        self.max_size = settings.IMAGE_UPLOAD_MAX_SIZES.get(field_name)
+        if self.max_size is None:
+            self.file = None
+            return
+        super().new_file(field_name, *args, **kwargs)
+        if self.content_length and self.content_length > self.max_size:
+            self._reject("Die Datei ist zu groß.")
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        """
+        Writes an image chunk to the temporary file after checking the
+        signature and the size cap. Chunks of other fields are returned as is.
+        """
+        if self.file is None:
+            return raw_data
+        if start == 0 and not has_image_signature(raw_data):
+            self._reject("Die Datei ist kein gültiges Bild.")
+        if start + len(raw_data) > self.max_size:
+            self._reject("Die Datei ist zu groß.")
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        if self.file is None:
+            return None
+        return super().file_complete(file_size)
+
+    def upload_interrupted(self):
+        if getattr(self, 'file', None) is not None:
+            super().upload_interrupted()
+
+    def _reject(self, message):
+        """
+        Drops the partially written temporary file and aborts the upload.
+
+        :param message: The error message returned to the client.
+        :raises ImageUploadRejected: Always.
+        """
+        self.file.close()
+        self.file = None
+        raise ImageUploadRejected(f"{self.field_name}: {message}")
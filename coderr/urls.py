@@ -16,14 +16,17 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from coderr.views import metrics_view
 
 urlpatterns = [
     path('coderr/admin/', admin.site.urls),
+    path('coderr/internal/metrics/', metrics_view, name='metrics'),
     path('coderr/api/' , include('coderr_auth.api.urls')),
     path('coderr/api/' , include('offers.api.urls')),
     path('coderr/api/' , include('orders.api.urls')),
     path('coderr/api/' , include('reviews.api.urls')),
     path('coderr/api/' , include('baseinfo.api.urls')),
+    path('coderr/api/' , include('events.urls')),
 ]
 
 from django.conf import settings
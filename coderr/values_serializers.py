@@ -0,0 +1,99 @@
+from rest_framework import serializers
+
+from coderr.instrumentation import serializer_timing
+
+
+def field_converter(field):
+    """
+    Returns a function that turns a raw `.values_list()` value into the
+    output of the given DRF field, or None if the value is used as is.
+
+    :param field: A bound field of the DRF serializer being reproduced.
+    :return: A callable taking the raw value, or None.
+    """
+    if isinstance(field, serializers.RelatedField):
+        return None
+    if isinstance(field, serializers.FileField):
+        storage = field.parent.Meta.model._meta.get_field(field.source).storage
+        return lambda name: storage.url(name) if name else None
+    if isinstance(field, (serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+                          serializers.ChoiceField, serializers.JSONField)) and not getattr(field, 'binary', False):
+        return None
+    return field.to_representation
+
+
+class ValuesListSerializer:
+    """
+    Read-only list serializer producing the same output as `serializer_class`
+    with `many=True`, but from `.values_list()` rows instead of model instances.
+
+    The accessors are compiled once per class from the fields of the DRF
+    serializer: every output key gets its column and, where the DRF field
+    changes the raw value (decimals, datetimes, files), that field's converter.
+    Nested objects are described in `nested_lookups` as an ordered mapping of
+    output keys to lookups. With a sparse fieldset (see coderr.fieldsets) only
+    the columns of the selected fields are queried. The DRF serializers stay
+    in use for writes and single objects.
+    """
+    serializer_class = None
+    nested_lookups = {}
+
+    def __init__(self, queryset, fieldset=None):
+        self.queryset = queryset
+        self.fieldset = fieldset
+
+    @classmethod
+    def compile(cls, fieldset=None):
+        """
+        Builds the column list and the accessors for the given fields, cached per class.
+
+        :param fieldset: The names of the fields to output, None for all fields.
+        :return: A tuple of the `.values_list()` lookups and the accessors, each
+                 `(key, column index, converter, None)` for plain fields or
+                 `(key, column indexes, None, nested keys)` for nested objects.
+        """
+        if '_compiled' not in cls.__dict__:
+            cls._compiled = {}
+        if fieldset not in cls._compiled:
+            lookups, accessors = [], []
+            for name, field in cls.serializer_class().fields.items():
+                if field.write_only or (fieldset is not None and name not in fieldset):
+                    continue
+                if name in cls.nested_lookups:
+                    nested = cls.nested_lookups[name]
+                    indexes = tuple(range(len(lookups), len(lookups) + len(nested)))
+                    lookups += nested.values()
+                    accessors.append((name, indexes, None, tuple(nested)))
+                else:
+                    accessors.append((name, len(lookups), field_converter(field), None))
+                    lookups.append(field.source)
+            cls._compiled[fieldset] = (lookups, accessors)
+        return cls._compiled[fieldset]
+
+    @property
+    def data(self):
+        lookups, accessors = self.compile(self.fieldset)
+        with serializer_timing():
+            return [self.to_representation(row, accessors) for row in self.queryset.values_list(*lookups)]
+
+    def iterator(self, chunk_size):
+        """
+        Yields the representations one by one, fetching the rows in chunks
+        through a server-side cursor where the database supports it.
+
+        :param chunk_size: The number of rows fetched per round-trip.
+        """
+        lookups, accessors = self.compile(self.fieldset)
+        for row in self.queryset.values_list(*lookups).iterator(chunk_size=chunk_size):
+            yield self.to_representation(row, accessors)
+
+    @staticmethod
+    def to_representation(row, accessors):
+        representation = {}
+        for key, index, convert, nested_keys in accessors:
+            if nested_keys is not None:
+                representation[key] = {nested_key: row[nested_index] for nested_key, nested_index in zip(nested_keys, index)}
+                continue
+            value = row[index]
+            representation[key] = value if convert is None or value is None else convert(value)
+        return representation
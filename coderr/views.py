@@ -0,0 +1,24 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+from coderr import metrics
+
+
+def metrics_view(request):
+    """
+    Exposes the metrics of all worker processes in the Prometheus text format.
+
+    The endpoint is internal: it needs the shared METRICS_TOKEN as bearer
+    token. Behind the reverse proxy every request comes from the proxy's
+    address, so the client address cannot be used to restrict it. Without a
+    configured token or with a wrong one the endpoint answers 404.
+
+    :param request: The HTTP request.
+    :return: An HttpResponse with the exposition text.
+    """
+    token = settings.METRICS_TOKEN
+    if not token or not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        raise Http404()
+    return HttpResponse(metrics.render_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -2,6 +2,13 @@ from rest_framework import serializers
 from rest_framework.authtoken.models import Token
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from coderr_auth import hashing
+from coderr.concurrency import save_versioned
+from coderr.fieldsets import FieldsetSerializerMixin
+from coderr.instrumentation import TimedSerializerMixin
+from coderr.values_serializers import ValuesListSerializer
 from coderr_auth.models import Profile
 
 class UserSerializer(serializers.ModelSerializer):
@@ -45,7 +52,7 @@ class RegistrationSerializer(serializers.ModelSerializer):
         If the data is not valid, it raises a serializers.ValidationError with the
         appropriate error message.
         """
-        if User.objects.filter(username=data['username']).exists() or User.objects.filter(email=data['email']).exists():
+        if User.objects.filter(Q(username=data['username']) | Q(email=data['email'])).exists():
             raise serializers.ValidationError(
                 {"detail": ["Benutzername oder Email bereits vorhanden."]}
             )
@@ -63,21 +70,25 @@ class RegistrationSerializer(serializers.ModelSerializer):
         The validated data must contain the keys 'username', 'email', 'password' and 'type'.
         It creates a new user with the given username, email and password and
         then creates a new profile for the user with the given type.
+        The password is hashed on the hashing pool.
         It returns the created user.
         """
         username = validated_data['username']
         email = validated_data['email']
         password = validated_data['password']
         user_type = validated_data['type']
-        user = User.objects.create_user(username=username, email=email, password=password)
+        user = User(username=User.normalize_username(username), email=User.objects.normalize_email(email))
+        user.password = hashing.make_password(password)
+        user.save()
         Profile.objects.create(user=user, email=email, type=user_type)
         return user
     
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(TimedSerializerMixin, FieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Profile
         fields = '__all__'
+        read_only_fields = ['version']
         extra_kwargs = {
             'email': {'error_messages': {'blank': ["Dieses Feld darf nicht leer sein."] , 'required': "Dieses Feld ist erforderlich.", 'unique': "Email bereits vorhanden."}},
             'first_name': {'error_messages': {'blank': ["Dieses Feld darf nicht leer sein."]}},
@@ -108,10 +119,18 @@ class ProfileSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         """
         Override the update method to update only the allowed fields.
+        Only the changed fields and `uploaded_at` are written, in one conditional
+        UPDATE that expects the `version` passed to `save` and increments it,
+        together with a `profile.updated` event.
+
+        :raises VersionConflict: If the profile has been changed since the expected version.
         """
+        version = validated_data.pop('version', instance.version)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
+        with transaction.atomic():
+            save_versioned(instance, [*validated_data, 'uploaded_at'], version)
+            instance.record_change('profile.updated')
         return instance
 
 
@@ -128,15 +147,20 @@ class LoginSerializer(serializers.Serializer):
         The data to be validated must contain the keys 'username' and 'password'.
         If the data is not valid, it raises a serializers.ValidationError with the
         appropriate error message.
+        The user and the token are loaded in one query and the password is
+        checked on the hashing pool, which also rehashes outdated hashes.
         """
         username = data.get("username")
         password = data.get("password")
-        user = User.objects.filter(username=username).first()
+        user = User.objects.select_related('auth_token').filter(username=username).first()
         if not user:
             raise serializers.ValidationError({"details": ["Falsche Username oder Passwort."]})
-        if not user.check_password(password):
+        if not hashing.check_password(user, password):
             raise serializers.ValidationError({"details": ["Falsche Username oder Passwort."]})
-        token, created = Token.objects.get_or_create(user=user)
+        try:
+            token = user.auth_token
+        except Token.DoesNotExist:
+            token = Token.objects.create(user=user)
         data['user_id'] = user.id
         data['token'] = token.key
         data['email'] = user.email
@@ -184,4 +208,25 @@ class CustomerProfilesListSerializer(serializers.ModelSerializer):
         representation = super().to_representation(instance)
         user_representation = representation['user']
         user_representation['pk'] = user_representation.pop('id')
-        return representation
\ No newline at end of file
+        return representation
+
+
+class BusinessProfilesListValuesSerializer(ValuesListSerializer):
+    """
+    Read path of the business profile list, same output as BusinessProfilesListSerializer.
+    The names in the user field come from the profile.
+    """
+    serializer_class = BusinessProfilesListSerializer
+    nested_lookups = {
+        'user': {'username': 'user__username', 'first_name': 'first_name', 'last_name': 'last_name', 'pk': 'user_id'},
+    }
+
+
+class CustomerProfilesListValuesSerializer(ValuesListSerializer):
+    """
+    Read path of the customer profile list, same output as CustomerProfilesListSerializer.
+    """
+    serializer_class = CustomerProfilesListSerializer
+    nested_lookups = {
+        'user': {'username': 'user__username', 'first_name': 'user__first_name', 'last_name': 'user__last_name', 'pk': 'user_id'},
+    }
@@ -4,14 +4,20 @@ from rest_framework import status
 from .serializers import RegistrationSerializer, LoginSerializer
 from rest_framework.authtoken.models import Token
 from coderr_auth.models import Profile
-from coderr_auth.api.serializers import ProfileSerializer, BusinessProfilesListSerializer, CustomerProfilesListSerializer
+from coderr_auth.api.serializers import ProfileSerializer, BusinessProfilesListValuesSerializer, CustomerProfilesListValuesSerializer
+from coderr_auth.api.serializers import BusinessProfilesListSerializer, CustomerProfilesListSerializer
+from coderr.concurrency import expected_version
+from coderr.fieldsets import FieldsetViewMixin, fieldset_columns
 from django.shortcuts import get_object_or_404
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.exceptions import PermissionDenied
+from coderr.throttling import TokenBucketThrottle
 
 
 class RegistrationAPIView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'registration'
     def post(self, request):
         """
         Handles user registration by validating and saving the provided data.
@@ -31,7 +37,7 @@ class RegistrationAPIView(APIView):
         serializer = RegistrationSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            token, created = Token.objects.get_or_create(user=user)
+            token = Token.objects.create(user=user)
             return Response({
                 "email": user.email,
                 "username": user.username,
@@ -41,23 +47,28 @@ class RegistrationAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
-class ProfileDetailsAPIView(APIView):
+class ProfileDetailsAPIView(FieldsetViewMixin, APIView):
     permission_classes = [AllowAny]
+    fieldset_serializer_class = ProfileSerializer
     def get(self, request, pk):
         """
         Retrieves the profile details for a given primary key.
 
         This method fetches the profile from the database using the provided
-        primary key and serializes the data for response.
+        primary key and serializes the data for response. The `fields` and
+        `omit` query parameters limit the loaded columns and the returned fields.
 
         :param request: The HTTP request object.
         :param pk: The primary key of the profile to retrieve.
         :return: A Response object containing the serialized profile data
                 with an HTTP 200 status code.
         """
-
-        profile = get_object_or_404(Profile, pk=pk)
-        serializer = ProfileSerializer(profile)
+        fieldset = self.get_fieldset()
+        profiles = Profile.objects.all()
+        if fieldset is not None:
+            profiles = profiles.only(*fieldset_columns(ProfileSerializer, fieldset))
+        profile = get_object_or_404(profiles, pk=pk)
+        serializer = ProfileSerializer(profile, context={'fieldset': fieldset})
         data = serializer.data
         data.pop('uploaded_at', None)
         return Response(data, status=status.HTTP_200_OK)
@@ -65,23 +76,30 @@ class ProfileDetailsAPIView(APIView):
     def patch(self, request, pk, format=None):
         """
         Updates allowed fields of a profile and includes the user in the response.
+        The fields are written with a conditional UPDATE that expects the sent
+        `version`, or the loaded one, and answers with 409 if the profile has
+        been changed meanwhile. The response is built from the written data.
         """
         profile = get_object_or_404(Profile, pk=pk)
-        if profile.user != request.user:
+        if profile.user_id != request.user.pk:
             raise PermissionDenied("Sie haben keine Berechtigung, dieses Profil zu ändern.")
         allowed_fields = {'email', 'first_name', 'last_name', 'file', 'location', 'description', 'working_hours', 'tel'}
-        invalid_fields = [key for key in request.data if key not in allowed_fields]
+        invalid_fields = [key for key in request.data if key not in allowed_fields | {'version'}]
         if invalid_fields:
             return Response({"detail": [f"Die Felder {', '.join(invalid_fields)} sind nicht erlaubt."]}, status=status.HTTP_400_BAD_REQUEST)
+        version = expected_version(request.data, profile)
         data = {key: value for key, value in request.data.items() if key in allowed_fields}
         serializer = ProfileSerializer(profile, data=data, partial=True)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response({**{key: serializer.data[key] for key in data}, "user": pk}, status=status.HTTP_200_OK)
+        serializer.save(version=version)
+        return Response({**{key: serializer.data[key] for key in data}, "user": pk, "version": profile.version},
+                        status=status.HTTP_200_OK)
         
 
 class LoginView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'login'
     def post(self, request):
         """
         Handles user login by validating and returning the authentication token.
@@ -107,15 +125,16 @@ class LoginView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
-class ProfileListCustomers(APIView):
+class ProfileListCustomers(FieldsetViewMixin, APIView):
     permission_classes = [IsAuthenticated]
     pagination_class = None
+    fieldset_serializer_class = CustomerProfilesListSerializer
     def get(self, request):
         """
         Retrieves a list of customer profiles.
 
         This method fetches all profiles with the type 'customer' from the database, 
-        serializes the data using `ProfilesListSerializer`, and returns the serialized
+        serializes the data using `CustomerProfilesListValuesSerializer`, and returns the serialized
         data with an HTTP 200 status code.
 
         :param request: The HTTP request object.
@@ -124,19 +143,20 @@ class ProfileListCustomers(APIView):
         """
 
         profiles = Profile.objects.filter(type='customer')
-        serializer = CustomerProfilesListSerializer(profiles, many=True)
+        serializer = CustomerProfilesListValuesSerializer(profiles, fieldset=self.get_fieldset())
         return Response(serializer.data, status=status.HTTP_200_OK)
     
 
-class ProfileListBusiness(APIView):
+class ProfileListBusiness(FieldsetViewMixin, APIView):
     permission_classes = [IsAuthenticated]
     pagination_class = None
+    fieldset_serializer_class = BusinessProfilesListSerializer
     def get(self, request):
         """
         Retrieves a list of business profiles.
 
         This method fetches all profiles with the type 'business' from the database,
-        serializes the data using `ProfilesListSerializer`, and returns the serialized
+        serializes the data using `BusinessProfilesListValuesSerializer`, and returns the serialized
         data with an HTTP 200 status code.
 
         :param request: The HTTP request object.
@@ -145,7 +165,7 @@ class ProfileListBusiness(APIView):
         """
 
         profiles = Profile.objects.filter(type='business')
-        serializer = BusinessProfilesListSerializer(profiles, many=True)
+        serializer = BusinessProfilesListValuesSerializer(profiles, fieldset=self.get_fieldset())
         return Response(serializer.data, status=status.HTTP_200_OK)
     
 
@@ -0,0 +1,90 @@
+"""
+Password hashing on a bounded thread pool.
+
+PBKDF2 is CPU bound and releases the GIL, so login and registration bursts
+would otherwise run as many hashes in parallel as there are worker threads.
+The pool caps the hashes running per process at PASSWORD_HASHING_WORKERS and
+the requests waiting for it at PASSWORD_HASHING_MAX_PENDING; a request that
+cannot get a slot within PASSWORD_HASHING_WAIT seconds gets a 503 instead of
+piling up. Only the hashing runs in the pool, all queries stay on the
+request thread.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework.exceptions import APIException
+
+
+class HashingOverloaded(APIException):
+    status_code = 503
+    default_detail = {"detail": ["Der Server ist ausgelastet. Bitte versuchen Sie es später erneut."]}
+    default_code = "hashing_overloaded"
+
+
+_executor = None
+_slots = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_pool():
+    """
+    Returns the executor and the slot semaphore of the current process,
+    creating them after a fork since threads do not survive it.
+    """
+    global _executor, _slots, _executor_pid
+    pid = os.getpid()
+    if _executor_pid != pid:
+        with _executor_lock:
+            if _executor_pid != pid:
+                workers = settings.PASSWORD_HASHING_WORKERS
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+                _slots = threading.BoundedSemaphore(workers + settings.PASSWORD_HASHING_MAX_PENDING)
+                _executor_pid = pid
+    return _executor, _slots
+
+
+def run(func, *args):
+    """
+    Runs a hashing function on the pool and waits for its result.
+
+    :param func: The function to run.
+    :param args: The arguments of the function.
+    :return: The result of the function.
+    :raises HashingOverloaded: If no slot becomes free within PASSWORD_HASHING_WAIT seconds.
+    """
+    executor, slots = _get_pool()
+    if not slots.acquire(timeout=settings.PASSWORD_HASHING_WAIT):
+        raise HashingOverloaded()
+    try:
+        return executor.submit(func, *args).result()
+    finally:
+        slots.release()
+
+
+def make_password(raw_password):
+    """
+    Hashes a password with the preferred hasher on the pool.
+    """
+    return run(hashers.make_password, raw_password)
+
+
+def check_password(user, raw_password):
+    """
+    Checks the password of a user on the pool.
+
+    Like `User.check_password`, a correct password stored with an outdated
+    hasher or work factor is rehashed with the current configuration and saved.
+
+    :param user: The user whose password is checked.
+    :param raw_password: The password sent by the client.
+    :return: True if the password is correct.
+    """
+    is_correct, must_update = run(hashers.verify_password, raw_password, user.password)
+    if is_correct and must_update:
+        user.password = make_password(raw_password)
+        user.save(update_fields=['password'])
+    return is_correct
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coderr_auth', '0011_fileupload_alter_profile_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -1,6 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils.timezone import now
+from events.models import record_event
 
 class FileUpload(models.Model):
     file = models.FileField(upload_to='uploads/', blank=True, null=True)
@@ -20,18 +21,29 @@ class Profile(models.Model):
     working_hours = models.CharField(max_length=100, default = '8 - 16')
     tel = models.CharField(max_length=100, default = '0123456789')
     uploaded_at = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField(default=1)
     
     def save(self, *args, **kwargs):
         """
         Saves the current instance. Overwrites the username with the username of the associated User.
         Updates the uploaded_at field if the file has changed.
+        Records a `profile.created` or `profile.updated` event in the same transaction.
         """
         self.username = self.user.username
         if self.pk:  
             original = Profile.objects.get(pk=self.pk)
             if original.file != self.file:  
                 self.uploaded_at = now()
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.record_change('profile.created' if adding else 'profile.updated')
+
+    def record_change(self, kind):
+        """
+        Records an event of the given kind for this profile in the outbox.
+        """
+        record_event(kind, {'id': self.pk, 'user': self.user_id, 'type': self.type, 'username': self.username})
 
 
 
@@ -1,3 +1,228 @@
-from django.test import TestCase
+import os
+import tempfile
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from coderr_auth.api.serializers import (
+    BusinessProfilesListSerializer, BusinessProfilesListValuesSerializer,
+    CustomerProfilesListSerializer, CustomerProfilesListValuesSerializer, ProfileSerializer,
+)
+from coderr_auth.models import Profile
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ProfilesListValuesSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for index, profile_type in enumerate(['business', 'customer', 'business', 'customer']):
+            user = User.objects.create_user(username=f'{profile_type}_{index}', password='secret',
+                                            first_name=f'Jürgen {index}', last_name='Müller')
+            profile = Profile.objects.create(user=user, email=f'{profile_type}_{index}@example.com',
+                                             type=profile_type, first_name=f'Profil {index}')
+            if index < 2:
+                profile.file = SimpleUploadedFile(f'profil_{index}.png', b'\x89PNG\r\n\x1a\n')
+                profile.save()
+
+    def assertSameOutput(self, expected, actual):
+        self.assertEqual(len(actual), 2)
+        for expected_profile, actual_profile in zip(expected, actual):
+            self.assertEqual(list(actual_profile), list(expected_profile))
+            for key in expected_profile:
+                self.assertEqual(actual_profile[key], expected_profile[key], key)
+            self.assertEqual(list(actual_profile['user']), list(expected_profile['user']))
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_business_profiles_match_model_serializer(self):
+        profiles = Profile.objects.filter(type='business').order_by('pk')
+        self.assertSameOutput(BusinessProfilesListSerializer(profiles, many=True).data,
+                              BusinessProfilesListValuesSerializer(profiles).data)
+
+    def test_customer_profiles_match_model_serializer(self):
+        profiles = Profile.objects.filter(type='customer').order_by('pk')
+        self.assertSameOutput(CustomerProfilesListSerializer(profiles, many=True).data,
+                              CustomerProfilesListValuesSerializer(profiles).data)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ProfileUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='kunde', password='secret')
+        cls.profile = Profile.objects.create(user=cls.user, email='kunde@example.com', type='customer')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name, content):
+        return self.client.patch(f'/coderr/api/profile/{self.profile.pk}/',
+                                 {'file': SimpleUploadedFile(name, content)}, format='multipart')
+
+    def test_images_are_stored(self):
+        for name, content in (('bild.png', b'\x89PNG\r\n\x1a\n' + b'0' * 64),
+                              ('bild.webp', b'RIFF\x00\x00\x00\x00WEBPVP8 ')):
+            response = self.upload(name, content)
+            self.assertEqual(response.status_code, 200, response.content)
+            self.profile.refresh_from_db()
+            self.assertEqual(self.profile.file.read(), content)
+
+    def test_files_without_image_signature_are_rejected(self):
+        response = self.upload('bild.png', b'%PDF-1.7 kein Bild')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('file: Die Datei ist kein gültiges Bild.', response.json()['detail'])
+        self.profile.refresh_from_db()
+        self.assertFalse(self.profile.file)
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZES={'file': 64})
+    def test_files_above_the_size_of_their_field_are_rejected(self):
+        self.assertEqual(self.upload('klein.png', b'\x89PNG\r\n\x1a\n' + b'0' * 56).status_code, 200)
+        response = self.upload('gross.png', b'\x89PNG\r\n\x1a\n' + b'0' * 57)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('file: Die Datei ist zu groß.', response.json()['detail'])
+
+
+@override_settings(THROTTLE_SCOPES={})
+class LoginAndRegistrationTests(TestCase):
+    def register(self, username, email):
+        return APIClient().post('/coderr/api/registration/', {
+            'username': username, 'email': email, 'password': 'geheim123',
+            'repeated_password': 'geheim123', 'type': 'customer',
+        }, format='json')
+
+    def test_registration_creates_user_profile_and_token(self):
+        response = self.register('kunde', 'kunde@example.com')
+        self.assertEqual(response.status_code, 201)
+        user = User.objects.get(username='kunde')
+        self.assertTrue(user.check_password('geheim123'))
+        self.assertEqual(response.json()['token'], user.auth_token.key)
+        self.assertEqual(user.profile.type, 'customer')
+
+    def test_registration_rejects_taken_username_or_email(self):
+        self.register('kunde', 'kunde@example.com')
+        for username, email in [('kunde', 'neu@example.com'), ('neu', 'kunde@example.com')]:
+            response = self.register(username, email)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'detail': ['Benutzername oder Email bereits vorhanden.']})
+
+    def test_login_loads_user_and_token_in_one_query(self):
+        self.register('kunde', 'kunde@example.com')
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().post('/coderr/api/login/', {'username': 'kunde', 'password': 'geheim123'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['token'], Token.objects.get(user__username='kunde').key)
+        self.assertEqual(len(queries), 1)
+
+    def test_login_rejects_wrong_password(self):
+        self.register('kunde', 'kunde@example.com')
+        response = APIClient().post('/coderr/api/login/', {'username': 'kunde', 'password': 'falsch'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'details': ['Falsche Username oder Passwort.']})
+
+    def test_login_rehashes_outdated_password_hash(self):
+        md5, pbkdf2 = 'django.contrib.auth.hashers.MD5PasswordHasher', 'django.contrib.auth.hashers.PBKDF2PasswordHasher'
+        with self.settings(PASSWORD_HASHERS=[md5, pbkdf2]):
+            User.objects.create_user(username='alt', password='geheim123')
+        self.assertTrue(User.objects.get(username='alt').password.startswith('md5$'))
+        with self.settings(PASSWORD_HASHERS=[pbkdf2, md5]):
+            response = APIClient().post('/coderr/api/login/', {'username': 'alt', 'password': 'geheim123'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        password = User.objects.get(username='alt').password
+        self.assertTrue(password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(User.objects.get(username='alt').check_password('geheim123'))
+
+
+@override_settings(THROTTLE_FILE=os.path.join(tempfile.mkdtemp(), 'throttle.db'),
+                   THROTTLE_SCOPES={'login': {'rate': '3/min', 'keys': ['ip']}})
+class LoginThrottleTests(TestCase):
+    def login(self, address):
+        return APIClient().post('/coderr/api/login/', {'username': 'niemand', 'password': 'x'},
+                                format='json', REMOTE_ADDR=address)
+
+    def test_login_is_throttled_per_ip_with_retry_after(self):
+        for _ in range(3):
+            self.assertEqual(self.login('10.0.0.1').status_code, 400)
+        response = self.login('10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+        self.assertEqual(response.json(), {'detail': ['Zu viele Anfragen. Bitte in 20 Sekunden erneut versuchen.']})
+        self.assertEqual(self.login('10.0.0.2').status_code, 400)
+
+    def test_forwarded_for_header_does_not_pick_the_bucket_without_proxy(self):
+        for index in range(4):
+            response = APIClient().post('/coderr/api/login/', {'username': 'niemand', 'password': 'x'}, format='json',
+                                        REMOTE_ADDR='10.0.1.1', HTTP_X_FORWARDED_FOR=f'192.0.2.{index}')
+        self.assertEqual(response.status_code, 429)
+
+    def test_behind_one_proxy_the_address_added_by_the_proxy_is_used(self):
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            for index in range(4):
+                response = APIClient().post('/coderr/api/login/', {'username': 'niemand', 'password': 'x'}, format='json',
+                                            REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR=f'192.0.2.{index}, 10.0.2.1')
+            self.assertEqual(response.status_code, 429)
+            response = APIClient().post('/coderr/api/login/', {'username': 'niemand', 'password': 'x'}, format='json',
+                                        REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='10.0.2.2')
+            self.assertEqual(response.status_code, 400)
+
+
+@override_settings(THROTTLE_FILE=os.path.join(tempfile.mkdtemp(), 'throttle.db'),
+                   THROTTLE_SCOPES={'order-create': {'rate': '2/min', 'keys': ['user', 'ip']}})
+class ThrottleBucketTests(TestCase):
+    def post_order(self, user, address):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.post('/coderr/api/orders/', {}, format='json', REMOTE_ADDR=address)
+
+    def test_denied_requests_take_no_token_from_the_other_buckets(self):
+        first = User.objects.create_user(username='erster', password='secret')
+        second = User.objects.create_user(username='zweiter', password='secret')
+        for user in (first, second):
+            Profile.objects.create(user=user, email=f'{user.username}@example.com', type='customer')
+        for _ in range(2):
+            self.assertNotEqual(self.post_order(first, '10.0.3.1').status_code, 429)
+        for _ in range(3):
+            self.assertEqual(self.post_order(second, '10.0.3.1').status_code, 429)
+        for _ in range(2):
+            self.assertNotEqual(self.post_order(second, '10.0.3.2').status_code, 429)
+        self.assertEqual(self.post_order(second, '10.0.3.2').status_code, 429)
+
+
+class ProfileVersionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='kunde', password='secret')
+        cls.profile = Profile.objects.create(user=cls.user, email='kunde@example.com', type='customer')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/coderr/api/profile/{self.profile.pk}/'
+
+    def test_patch_writes_changed_fields_and_increments_version(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.url, {'location': 'Berlin', 'version': 1}, format='json')
+        self.assertEqual(response.json(), {'location': 'Berlin', 'user': self.profile.pk, 'version': 2})
+        update = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(update), 1)
+        self.assertNotIn('"tel"', update[0])
+        self.assertEqual(Profile.objects.get(pk=self.profile.pk).version, 2)
+
+    def test_stale_version_is_rejected_with_conflict(self):
+        self.client.patch(self.url, {'location': 'Berlin', 'version': 1}, format='json')
+        response = self.client.patch(self.url, {'location': 'Hamburg', 'version': 1}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Profile.objects.get(pk=self.profile.pk).location, 'Berlin')
+
+    def test_serializer_saved_without_version_expects_the_loaded_one(self):
+        profile = Profile.objects.get(pk=self.profile.pk)
+        serializer = ProfileSerializer(profile, data={'location': 'Köln'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual((profile.location, profile.version), ('Köln', 2))
@@ -0,0 +1,30 @@
+"""
+System checks of the event outbox.
+
+Outbox handlers refresh cached values in the dispatcher, which is a process
+of its own or a thread of one web worker. A per-process cache would only
+update the copy of that process, so the cached values need a shared backend.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+PROCESS_LOCAL_BACKENDS = ['django.core.cache.backends.locmem.LocMemCache']
+
+# Settings that enable a cache refreshed by an outbox handler.
+CACHE_SETTINGS = ['BASEINFO_CACHE_TTL', 'OFFER_FACETS_CACHE_TTL']
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Fails when a cache refreshed by the dispatcher is enabled on a per-process cache backend.
+    """
+    enabled = [name for name in CACHE_SETTINGS if getattr(settings, name)]
+    if not enabled or settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_BACKENDS:
+        return []
+    return [Error(
+        f"{', '.join(enabled)} needs a cache shared by the web workers and the outbox dispatcher.",
+        hint="Configure CACHES['default'] with a shared backend, e.g. FileBasedCache or Redis.",
+        id='events.E001',
+    )]
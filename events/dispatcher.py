@@ -0,0 +1,193 @@
+"""
+Dispatcher of the event outbox.
+
+Apps register handlers for event kinds in a `handlers.py` module with the
+`handles` decorator. The dispatcher reads the pending events in id order,
+EVENTS_DISPATCH_BATCH_SIZE at a time, and calls every handler once per round
+with the list of its events, so a handler can coalesce a burst of changes
+into one cache refresh or counter rebuild. The work runs outside the
+requests that wrote the events.
+
+An event is marked dispatched when all of its handlers succeeded. If one
+fails, the event is retried in the next round, up to
+EVENTS_DISPATCH_MAX_ATTEMPTS times, and its other handlers run again.
+Handlers must therefore be idempotent, e.g. recompute a value instead of
+incrementing it. On PostgreSQL several dispatchers share the outbox with
+`SELECT ... FOR UPDATE SKIP LOCKED`; on SQLite run a single one.
+"""
+import fnmatch
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from coderr import metrics
+from events.models import OutboxEvent
+
+
+logger = logging.getLogger(__name__)
+
+_handlers = []
+
+
+def handles(*kinds):
+    """
+    Registers a function as handler of the events of the given kinds.
+
+    :param kinds: Event kinds or shell style patterns, e.g. "order.*".
+    :return: The decorator. The function receives a list of OutboxEvents.
+    """
+    def decorator(function):
+        _handlers.append((kinds, function))
+        return function
+    return decorator
+
+
+def load_handlers():
+    """
+    Imports the `handlers` module of every installed app.
+    """
+    autodiscover_modules('handlers')
+
+
+def handlers_for(kind):
+    return [function for kinds, function in _handlers
+            if any(fnmatch.fnmatchcase(kind, pattern) for pattern in kinds)]
+
+
+def handler_name(function):
+    return f'{function.__module__}.{function.__qualname__}'
+
+
+def dispatch_batch(batch_size=None):
+    """
+    Runs the handlers of the oldest pending events in one transaction.
+
+    Every handler runs in its own savepoint, so a failing handler rolls back
+    only its own writes.
+
+    :param batch_size: The maximum number of events, EVENTS_DISPATCH_BATCH_SIZE by default.
+    :return: The number of events read.
+    """
+    batch_size = batch_size or settings.EVENTS_DISPATCH_BATCH_SIZE
+    with transaction.atomic():
+        pending = OutboxEvent.objects.filter(
+            dispatched_at__isnull=True, attempts__lt=settings.EVENTS_DISPATCH_MAX_ATTEMPTS,
+        ).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            pending = pending.select_for_update(skip_locked=True)
+        events = list(pending[:batch_size])
+        if not events:
+            return 0
+        batches = defaultdict(list)
+        for event in events:
+            for function in handlers_for(event.kind):
+                batches[function].append(event)
+        errors = {}
+        for function, handled in batches.items():
+            name = handler_name(function)
+            started = time.perf_counter()
+            try:
+                with transaction.atomic():
+                    function(handled)
+            except Exception as exc:
+                logger.exception("Outbox handler %s failed for %d events.", name, len(handled))
+                metrics.inc('coderr_outbox_handler_failures_total', {'handler': name})
+                error = f"{name}: {exc!r}"
+                for event in handled:
+                    errors.setdefault(event.id, error)
+            metrics.observe('coderr_outbox_handler_duration_seconds', {'handler': name},
+                            time.perf_counter() - started, metrics.HANDLER_DURATION_BUCKETS)
+        record_results(events, errors)
+    return len(events)
+
+
+def record_results(events, errors):
+    """
+    Marks the events without errors as dispatched and counts a failed attempt
+    for the others, with one UPDATE per outcome.
+
+    :param events: The events of the round.
+    :param errors: A dictionary mapping the ids of failed events to their error.
+    """
+    dispatched_at = timezone.now()
+    dispatched = [event for event in events if event.id not in errors]
+    if dispatched:
+        OutboxEvent.objects.filter(id__in=[event.id for event in dispatched]).update(dispatched_at=dispatched_at)
+    failed = defaultdict(list)
+    for event_id, error in errors.items():
+        failed[error].append(event_id)
+    for error, event_ids in failed.items():
+        OutboxEvent.objects.filter(id__in=event_ids).update(attempts=F('attempts') + 1, last_error=error)
+    for event in dispatched:
+        metrics.inc('coderr_outbox_events_dispatched_total', {'kind': event.kind})
+        metrics.observe('coderr_outbox_dispatch_lag_seconds', {'kind': event.kind},
+                        (dispatched_at - event.created_at).total_seconds(), metrics.DISPATCH_LAG_BUCKETS)
+    for event in events:
+        if event.id in errors and event.attempts + 1 >= settings.EVENTS_DISPATCH_MAX_ATTEMPTS:
+            logger.error("Outbox event %s (%s) failed %d times and is given up.", event.id, event.kind,
+                         event.attempts + 1)
+
+
+class Dispatcher:
+    """
+    Drains the outbox until it is stopped. A full batch is followed by the
+    next one right away, otherwise it waits EVENTS_DISPATCH_INTERVAL seconds
+    or until `wake` is called.
+    """
+    def __init__(self, interval=None, batch_size=None):
+        self.interval = settings.EVENTS_DISPATCH_INTERVAL if interval is None else interval
+        self.batch_size = batch_size or settings.EVENTS_DISPATCH_BATCH_SIZE
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+
+    def wake(self):
+        self.wakeup.set()
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+
+    def run(self):
+        load_handlers()
+        while not self.stopping.is_set():
+            self.wakeup.clear()
+            try:
+                count = dispatch_batch(self.batch_size)
+            except DatabaseError:
+                logger.exception("Dispatching the event outbox failed.")
+                count = 0
+            finally:
+                close_old_connections()
+            if count < self.batch_size:
+                self.wakeup.wait(self.interval)
+
+
+_dispatcher = None
+
+
+def start_dispatcher_thread():
+    """
+    Starts a dispatcher in a daemon thread of this process. Events recorded
+    by this process wake it up as soon as their transaction is committed.
+
+    :return: The Dispatcher.
+    """
+    global _dispatcher
+    _dispatcher = Dispatcher()
+    threading.Thread(target=_dispatcher.run, name='outbox-dispatcher', daemon=True).start()
+    return _dispatcher
+
+
+def wake_dispatcher():
+    """
+    Wakes the dispatcher thread of this process, if there is one.
+    """
+    if _dispatcher is not None:
+        _dispatcher.wake()
@@ -0,0 +1,162 @@
+"""
+In-process fan-out of outbox events to Server-Sent Events streams.
+
+Every event loop (one per ASGI worker) has one EventHub. While at least one
+client is connected, the hub polls the outbox for new events and puts each
+event into the queues of the streams of its business user and customer, so
+a worker runs one query per poll interval however many clients it serves.
+
+Ids are assigned when an event is inserted, but concurrent transactions may
+commit them out of order. The hub therefore looks back EVENTS_POLL_LOOKBACK
+ids on every poll and skips the events it has already published.
+
+When the hub starts, the events already in the outbox are marked as
+published without being sent. `subscribe` returns only after that, so a
+stream reading the events it missed afterwards gets every event either from
+its replay or from the hub.
+"""
+import asyncio
+import collections
+import logging
+import weakref
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Max, Q
+
+from events.models import OutboxEvent
+
+
+logger = logging.getLogger(__name__)
+
+class Subscription:
+    """
+    The queue of one stream. `overflowed` is set when the client reads too
+    slowly and events had to be dropped; the stream then ends and the client
+    resumes from its Last-Event-ID.
+    """
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class EventHub:
+    def __init__(self):
+        self.subscriptions = collections.defaultdict(set)
+        self.last_id = None
+        self.published = collections.deque()
+        self.published_ids = set()
+        self.task = None
+        self.started = None
+
+    async def subscribe(self, user_id):
+        """
+        Registers a stream of a user and starts polling if it is the first
+        one. Returns once the hub has set its cursor.
+
+        :param user_id: The id of the connected user.
+        :return: The Subscription receiving the user's new events.
+        :raises DatabaseError: If the hub could not read the outbox.
+        """
+        subscription = Subscription(user_id)
+        self.subscriptions[user_id].add(subscription)
+        if self.task is None or self.task.done():
+            loop = asyncio.get_running_loop()
+            self.started = loop.create_future()
+            self.task = loop.create_task(self.poll(self.started))
+        try:
+            await asyncio.shield(self.started)
+        except BaseException:
+            self.unsubscribe(subscription)
+            raise
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscriptions = self.subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[subscription.user_id]
+
+    async def poll(self, started):
+        """
+        Publishes new events until the last stream has disconnected.
+
+        :param started: The future resolved once the cursor is set.
+        """
+        lookback, batch_size = settings.EVENTS_POLL_LOOKBACK, settings.EVENTS_POLL_BATCH_SIZE
+        try:
+            self.last_id = (await OutboxEvent.objects.aaggregate(last_id=Max('id')))['last_id'] or 0
+            async for event_id in OutboxEvent.objects.filter(id__gt=self.last_id - lookback).values_list('id', flat=True):
+                self.remember(event_id)
+        except Exception as exc:
+            self.last_id = None
+            self.published.clear()
+            self.published_ids.clear()
+            started.set_exception(exc)
+            return
+        started.set_result(None)
+        while self.subscriptions:
+            try:
+                events = [event async for event in OutboxEvent.objects.filter(
+                    id__gt=max(0, self.last_id - lookback),
+                ).order_by('id')[:batch_size + lookback]]
+            except DatabaseError:
+                logger.exception("Polling the event outbox failed.")
+                events = []
+            for event in events:
+                if event.id not in self.published_ids:
+                    self.publish(event)
+            if len(events) < batch_size + lookback:
+                await asyncio.sleep(settings.EVENTS_POLL_INTERVAL)
+        self.last_id = None
+        self.published.clear()
+        self.published_ids.clear()
+
+    def remember(self, event_id):
+        """
+        Marks an event id as published, keeping the ids of the look-back window.
+        """
+        self.last_id = max(self.last_id, event_id)
+        self.published.append(event_id)
+        self.published_ids.add(event_id)
+        while len(self.published) > settings.EVENTS_POLL_LOOKBACK * 2:
+            self.published_ids.discard(self.published.popleft())
+
+    def publish(self, event):
+        """
+        Puts an event into the queues of the users it concerns.
+        """
+        self.remember(event.id)
+        for user_id in {event.business_user_id, event.customer_user_id} - {None}:
+            for subscription in self.subscriptions.get(user_id, ()):
+                subscription.put(event)
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    """
+    Returns the hub of the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _hubs:
+        _hubs[loop] = EventHub()
+    return _hubs[loop]
+
+
+def events_of_user(user_id, after_id):
+    """
+    Returns the stored events of a user after an event id, for resuming a stream.
+    """
+    return OutboxEvent.objects.filter(
+        Q(business_user_id=user_id) | Q(customer_user_id=user_id), id__gt=after_id,
+    ).order_by('id')
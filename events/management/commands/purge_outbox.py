@@ -0,0 +1,25 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils.timezone import now
+
+from events.models import OutboxEvent
+
+
+class Command(BaseCommand):
+    help = "Deletes dispatched outbox events older than EVENTS_RETENTION seconds."
+
+    def handle(self, *args, **options):
+        """
+        Deletes the old dispatched events. The last EVENTS_POLL_LOOKBACK ids
+        are kept, since the event hub and the autocomplete index read them
+        back on every poll.
+        """
+        cutoff = now() - datetime.timedelta(seconds=settings.EVENTS_RETENTION)
+        last_id = OutboxEvent.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        deleted, _ = OutboxEvent.objects.filter(
+            dispatched_at__lt=cutoff, id__lte=last_id - settings.EVENTS_POLL_LOOKBACK,
+        ).delete()
+        self.stdout.write(f"{deleted} dispatched events deleted.")
@@ -0,0 +1,36 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from events.dispatcher import Dispatcher, dispatch_batch, load_handlers
+
+
+class Command(BaseCommand):
+    help = "Runs the handlers of the event outbox until SIGTERM or SIGINT."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.EVENTS_DISPATCH_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=settings.EVENTS_DISPATCH_INTERVAL,
+                            help="Seconds to wait when the outbox is empty.")
+        parser.add_argument('--once', action='store_true',
+                            help="Dispatch the pending events and exit.")
+
+    def handle(self, *args, **options):
+        """
+        Dispatches the outbox in this process. With `--once` the pending
+        events are dispatched and the number of processed events is printed.
+        """
+        if options['once']:
+            load_handlers()
+            total = 0
+            while count := dispatch_batch(options['batch_size']):
+                total += count
+                if count < options['batch_size']:
+                    break
+            self.stdout.write(f"{total} outbox events processed.")
+            return
+        dispatcher = Dispatcher(options['interval'], options['batch_size'])
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: dispatcher.stop())
+        dispatcher.run()
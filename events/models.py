@@ -0,0 +1,67 @@
+from django.db import models, transaction
+
+
+class OutboxEvent(models.Model):
+    """
+    A domain event, written in the same transaction as the change it
+    describes. The ids increase with every event and serve as SSE event ids.
+    `business_user_id` and `customer_user_id` are the users it concerns.
+    `dispatched_at` is set once every handler has processed the event, failed
+    rounds are counted in `attempts` with the error of the last one.
+    """
+    kind = models.CharField(max_length=64)
+    payload = models.JSONField()
+    business_user_id = models.IntegerField(null=True, blank=True)
+    customer_user_id = models.IntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], name='outbox_pending', condition=models.Q(dispatched_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.pk} {self.kind}"
+
+
+def record_event(kind, payload, business_user_id=None, customer_user_id=None):
+    """
+    Appends an event to the outbox. Call it inside the transaction of the
+    change, so the event is stored if and only if the change is committed.
+    A dispatcher thread of this process is woken up after the commit.
+
+    :param kind: The event type, e.g. "order.created".
+    :param payload: The JSON serializable event data.
+    :param business_user_id: The id of the business user the event concerns.
+    :param customer_user_id: The id of the customer the event concerns.
+    :return: The stored event.
+    """
+    from events.dispatcher import wake_dispatcher
+
+    event = OutboxEvent.objects.create(kind=kind, payload=payload, business_user_id=business_user_id,
+                                       customer_user_id=customer_user_id)
+    transaction.on_commit(wake_dispatcher)
+    return event
+
+
+def record_events(kind, payloads, business_user_id=None):
+    """
+    Appends several events of one kind to the outbox with a single insert,
+    for bulk changes. Call it inside the transaction of the change, like
+    `record_event`.
+
+    :param kind: The event type, e.g. "offer.created".
+    :param payloads: The JSON serializable data of each event.
+    :param business_user_id: The id of the business user the events concern.
+    :return: The stored events.
+    """
+    from events.dispatcher import wake_dispatcher
+
+    events = OutboxEvent.objects.bulk_create([
+        OutboxEvent(kind=kind, payload=payload, business_user_id=business_user_id) for payload in payloads
+    ])
+    transaction.on_commit(wake_dispatcher)
+    return events
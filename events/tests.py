@@ -0,0 +1,180 @@
+import asyncio
+import io
+import json
+import multiprocessing
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils.timezone import now
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from coderr_auth.models import Profile
+from events import checks, dispatcher
+from events.hub import EventHub
+from events.models import OutboxEvent, record_event
+from offers.models import Offer, OfferDetail
+from orders.models import Order
+
+
+def run_in_child(function):
+    """
+    Runs a function in a forked process, which shares the test database but no memory with the test.
+    """
+    process = multiprocessing.get_context('fork').Process(target=function)
+    process.start()
+    process.join(10)
+    assert process.exitcode == 0, process.exitcode
+
+
+def file_cache(directory):
+    return {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}}
+
+
+def parse(message):
+    fields = dict(line.split(': ', 1) for line in message.strip().splitlines())
+    return int(fields['id']), fields['event'], json.loads(fields['data'])
+
+
+@override_settings(ASYNC_READ_VIEWS=True, EVENTS_POLL_INTERVAL=0.01)
+class OrderEventStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = User.objects.create_user(username='business', password='secret')
+        offer = Offer.objects.create(user=cls.business, title='Logo', description='Logo Design')
+        cls.detail = OfferDetail.objects.create(offer=offer, title='Basic', revisions=2, delivery_time_in_days=5,
+                                                price=Decimal('149.90'), features=['Logo'], offer_type='basic')
+        cls.token = Token.objects.create(user=cls.business)
+        cls.order = Order.objects.create(offer_detail_id=cls.detail, customer_user=7)
+
+    async def next_message(self, stream):
+        return (await asyncio.wait_for(anext(stream), 5)).decode()
+
+    async def test_resumes_from_last_event_id_and_streams_live_events(self):
+        first_event = await OutboxEvent.objects.aget()
+        response = await self.async_client.get('/coderr/api/order-events/', {'token': self.token.key},
+                                               headers={'Last-Event-ID': str(first_event.id - 1)})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await self.next_message(stream), 'retry: 3000\n\n')
+        event_id, kind, data = parse(await self.next_message(stream))
+        self.assertEqual((event_id, kind, data['id'], data['status']), (first_event.id, 'order.created', self.order.pk, 'in_progress'))
+
+        await asyncio.sleep(0.05)
+        order = await Order.objects.aget(pk=self.order.pk)
+        order.status = 'completed'
+        await sync_to_async(order.save)()
+        event_id, kind, data = parse(await self.next_message(stream))
+        self.assertEqual((kind, data['from_status'], data['status']), ('order.status_changed', 'in_progress', 'completed'))
+        await response.streaming_content.aclose()
+
+    async def test_subscribe_returns_once_the_cursor_is_set(self):
+        hub = EventHub()
+        subscription = await hub.subscribe(self.business.pk)
+        self.assertEqual(hub.last_id, (await OutboxEvent.objects.alast()).id)
+        order = await Order.objects.aget(pk=self.order.pk)
+        order.status = 'completed'
+        await sync_to_async(order.save)()
+        event = await asyncio.wait_for(subscription.queue.get(), 5)
+        self.assertEqual((event.kind, event.payload['status']), ('order.status_changed', 'completed'))
+        hub.unsubscribe(subscription)
+        await asyncio.wait_for(hub.task, 5)
+        self.assertIsNone(hub.last_id)
+
+    async def test_requires_token(self):
+        response = await self.async_client.get('/coderr/api/order-events/', {'token': 'falsch'})
+        self.assertEqual(response.status_code, 401)
+
+
+class OutboxDispatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = User.objects.create_user(username='business', password='secret')
+        Profile.objects.create(user=cls.business, email='business@example.com', type='business')
+
+    def post_offer(self):
+        client = APIClient()
+        client.force_authenticate(self.business)
+        return client.post('/coderr/api/offers/', {
+            'title': 'Logo', 'description': 'Logo Design',
+            'details': [{'title': offer_type, 'revisions': 1, 'delivery_time_in_days': 3, 'price': '100',
+                         'features': ['Logo'], 'offer_type': offer_type} for offer_type in ('basic', 'standard', 'premium')],
+        }, format='json')
+
+    def test_writes_record_events_in_their_transaction(self):
+        self.assertEqual(self.post_offer().status_code, 201)
+        offer = Offer.objects.get()
+        kinds = list(OutboxEvent.objects.order_by('id').values_list('kind', 'payload'))
+        self.assertEqual(kinds[0][0], 'profile.created')
+        self.assertEqual(kinds[1], ('offer.created', {'id': offer.pk, 'user': self.business.pk, 'title': 'Logo'}))
+        self.assertEqual(OutboxEvent.objects.filter(dispatched_at__isnull=True).count(), 2)
+
+    def test_handlers_receive_their_events_in_one_batch(self):
+        calls = []
+        handlers = [(('order.*',), lambda events: calls.append(('orders', [event.kind for event in events]))),
+                    (('profile.created',), lambda events: calls.append(('profiles', [event.kind for event in events])))]
+        record_event('order.created', {})
+        record_event('order.status_changed', {})
+        with mock.patch.object(dispatcher, '_handlers', handlers):
+            self.assertEqual(dispatcher.dispatch_batch(), 3)
+            self.assertEqual(dispatcher.dispatch_batch(), 0)
+        self.assertEqual(sorted(calls), [('orders', ['order.created', 'order.status_changed']),
+                                         ('profiles', ['profile.created'])])
+        self.assertFalse(OutboxEvent.objects.filter(dispatched_at__isnull=True).exists())
+
+    @override_settings(EVENTS_DISPATCH_MAX_ATTEMPTS=2)
+    def test_failed_events_are_retried_until_the_attempts_are_used_up(self):
+        def failing(events):
+            Profile.objects.update(location='Berlin')
+            raise RuntimeError('kaputt')
+
+        with mock.patch.object(dispatcher, '_handlers', [(('profile.*',), failing)]), \
+                self.assertLogs('events.dispatcher', 'ERROR') as logs:
+            self.assertEqual(dispatcher.dispatch_batch(), 1)
+            self.assertEqual(dispatcher.dispatch_batch(), 1)
+            self.assertEqual(dispatcher.dispatch_batch(), 0)
+        event = OutboxEvent.objects.get()
+        self.assertEqual((event.attempts, event.dispatched_at), (2, None))
+        self.assertIn("RuntimeError('kaputt')", event.last_error)
+        self.assertIn('given up', logs.output[-1])
+        self.assertEqual(Profile.objects.get().location, 'Lappland')
+
+    @override_settings(BASEINFO_CACHE_TTL=60)
+    def test_base_info_cache_is_refreshed_by_the_dispatcher_process(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(CACHES=file_cache(directory)):
+            dispatcher.load_handlers()
+            dispatcher.dispatch_batch()
+            self.assertEqual(APIClient().get('/coderr/api/base-info/').json()['offer_count'], 0)
+            self.post_offer()
+            self.assertEqual(APIClient().get('/coderr/api/base-info/').json()['offer_count'], 0)
+            run_in_child(dispatcher.dispatch_batch)
+            self.assertEqual(APIClient().get('/coderr/api/base-info/').json()['offer_count'], 1)
+
+    def test_cache_refresh_needs_a_shared_cache(self):
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with self.settings(BASEINFO_CACHE_TTL=60, CACHES=local):
+            self.assertEqual([error.id for error in checks.check_shared_cache(None)], ['events.E001'])
+        with self.settings(BASEINFO_CACHE_TTL=0, OFFER_FACETS_CACHE_TTL=60, CACHES=local):
+            self.assertEqual([error.id for error in checks.check_shared_cache(None)], ['events.E001'])
+        with self.settings(BASEINFO_CACHE_TTL=0, OFFER_FACETS_CACHE_TTL=0, CACHES=local):
+            self.assertEqual(checks.check_shared_cache(None), [])
+        with tempfile.TemporaryDirectory() as directory, self.settings(BASEINFO_CACHE_TTL=60, CACHES=file_cache(directory)):
+            self.assertEqual(checks.check_shared_cache(None), [])
+
+    @override_settings(EVENTS_RETENTION=3600, EVENTS_POLL_LOOKBACK=2)
+    def test_purge_deletes_old_dispatched_events_outside_the_lookback(self):
+        events = [record_event('offer.created', {'id': index}) for index in range(6)]
+        OutboxEvent.objects.filter(pk__in=[event.pk for event in events[:5]]).update(dispatched_at=now() - timedelta(hours=2))
+        OutboxEvent.objects.filter(pk=events[1].pk).update(dispatched_at=None)
+        OutboxEvent.objects.filter(pk=events[2].pk).update(dispatched_at=now())
+        output = io.StringIO()
+        call_command('purge_outbox', stdout=output)
+        self.assertEqual(output.getvalue().strip(), '2 dispatched events deleted.')
+        self.assertEqual(list(OutboxEvent.objects.filter(kind='offer.created').order_by('pk').values_list('payload__id', flat=True)), [1, 2, 4, 5])
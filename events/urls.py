@@ -0,0 +1,6 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('order-events/', views.OrderEventStreamView.as_view(), name='order-events'),
+]
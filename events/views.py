@@ -0,0 +1,89 @@
+import asyncio
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.views import View
+from rest_framework.authtoken.models import Token
+
+from coderr.async_views import AsyncReadAPIView
+from coderr.renderers import FastJSONRenderer
+from events.hub import events_of_user, get_hub
+
+
+def format_event(event):
+    """
+    Formats an outbox event as a Server-Sent Events message.
+    """
+    data = FastJSONRenderer().render(event.payload).decode()
+    return f"id: {event.id}\nevent: {event.kind}\ndata: {data}\n\n"
+
+
+class OrderEventStreamView(View):
+    """
+    Streams the order events of the authenticated user as Server-Sent Events.
+
+    Browsers cannot set headers on an EventSource, so the token may also be
+    passed as `?token=`. A reconnecting client sends the id of the last event
+    it received in the Last-Event-ID header (or `?last_event_id=`) and first
+    gets the events it missed from the outbox, then the live events of the
+    worker's EventHub. The stream needs the ASGI deployment, under WSGI every
+    open stream would block a worker thread.
+    """
+    http_method_names = ['get']
+
+    async def get(self, request):
+        if not settings.ASYNC_READ_VIEWS:
+            return AsyncReadAPIView().render({"detail": ["Der Event-Stream ist nur im ASGI-Betrieb verfügbar."]}, 501)
+        user_id = await self.authenticate(request)
+        if user_id is None:
+            return AsyncReadAPIView().render({"detail": ["Anmeldedaten fehlen oder sind ungültig."]}, 401)
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        try:
+            last_event_id = int(last_event_id) if last_event_id else None
+        except ValueError:
+            return AsyncReadAPIView().render({"detail": ["Last-Event-ID muss eine ganze Zahl sein."]}, 400)
+        response = StreamingHttpResponse(self.stream(user_id, last_event_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def authenticate(self, request):
+        """
+        Resolves the token of the Authorization header or of the `token` parameter.
+
+        :return: The id of the token's user, or None.
+        """
+        header = request.headers.get('Authorization', '')
+        key = header[6:] if header.startswith('Token ') else request.GET.get('token')
+        if not key:
+            return None
+        return await Token.objects.filter(key=key, user__is_active=True).values_list('user_id', flat=True).afirst()
+
+    async def stream(self, user_id, last_event_id):
+        """
+        Yields the missed events, then the live events and a comment every
+        EVENTS_HEARTBEAT seconds without events. Ends when the client reads
+        too slowly, so it reconnects and resumes from the outbox.
+
+        :param user_id: The id of the connected user.
+        :param last_event_id: The id of the last event the client received, or None.
+        """
+        hub = get_hub()
+        yield f"retry: {settings.EVENTS_RETRY_MS}\n\n"
+        subscription = await hub.subscribe(user_id)
+        try:
+            replayed = set()
+            if last_event_id is not None:
+                async for event in events_of_user(user_id, last_event_id):
+                    replayed.add(event.id)
+                    yield format_event(event)
+            while not subscription.overflowed:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), settings.EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if event.id not in replayed:
+                    yield format_event(event)
+        finally:
+            hub.unsubscribe(subscription)
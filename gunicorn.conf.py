@@ -0,0 +1,103 @@
+"""
+Gunicorn configuration for the Coderr backend.
+
+    gunicorn -c gunicorn.conf.py
+
+The preset is selected with GUNICORN_PRESET (sync, gthread or lowmem). Each
+value can be overridden through the environment variables read below.
+"""
+import gc
+import multiprocessing
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "coderr.settings")
+
+
+CPU_COUNT = multiprocessing.cpu_count()
+
+PRESETS = {
+    # One request per process, classic sizing for CPU bound Django workers.
+    "sync": {"worker_class": "sync", "workers": CPU_COUNT * 2 + 1, "threads": 1},
+    # Fewer processes with a few threads each, cheaper in memory for I/O waits.
+    "gthread": {"worker_class": "gthread", "workers": CPU_COUNT + 1, "threads": 4},
+    # Smallest footprint for small VMs.
+    "lowmem": {"worker_class": "gthread", "workers": max(2, CPU_COUNT), "threads": 2},
+}
+
+preset = PRESETS[os.getenv("GUNICORN_PRESET", "sync")]
+
+wsgi_app = "coderr.wsgi:application"
+bind = os.getenv("GUNICORN_BIND", "127.0.0.1:8000")
+worker_class = preset["worker_class"]
+workers = int(os.getenv("GUNICORN_WORKERS", preset["workers"]))
+threads = int(os.getenv("GUNICORN_THREADS", preset["threads"]))
+
+# Load Django once in the master so the workers share its pages copy-on-write.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Recycle workers after a jittered number of requests to cap memory growth
+# without restarting them all at the same moment.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 2
+
+# The heartbeat file is touched constantly, keep it off the disk.
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+accesslog = os.getenv("GUNICORN_ACCESSLOG")
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+
+
+def on_starting(server):
+    """
+    Removes the metrics files of the previous run.
+    """
+    from coderr import metrics
+    metrics.reset()
+
+
+def child_exit(server, worker):
+    """
+    Merges the metrics of an exited worker into the archive file, so the
+    counters survive worker recycling.
+    """
+    from coderr import metrics
+    metrics.mark_process_dead(worker.pid)
+
+
+def when_ready(server):
+    """
+    Moves everything allocated while preloading into the permanent GC
+    generation, so the collector in the workers does not touch (and copy)
+    the shared pages.
+    """
+    if preload_app:
+        gc.freeze()
+
+
+def pre_fork(server, worker):
+    """
+    Closes the database connections the preloaded master may have opened, so
+    no worker inherits their sockets. Closing them in the worker instead
+    would end the session the master and the other workers share. Every
+    worker opens its own connections on first use.
+    """
+    if preload_app:
+        from django.db import connections
+        connections.close_all()
+
+
+def post_fork(server, worker):
+    """
+    With CODERR_EVENTS_DISPATCHER=thread every worker dispatches the event
+    outbox in a background thread.
+    """
+    if os.getenv("CODERR_EVENTS_DISPATCHER") == "thread":
+        import django
+        django.setup()
+        from events.dispatcher import start_dispatcher_thread
+        start_dispatcher_thread()
@@ -0,0 +1,97 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.response import Response
+
+from idempotency.models import IdempotencyRecord
+
+
+def request_fingerprint(request):
+    """
+    Returns a digest of the method, path and parsed data of a request.
+    Uploaded files are represented by their name and size.
+
+    :param request: The DRF request.
+    :return: The hex digest.
+    """
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = sorted(data.lists())
+    payload = json.dumps([request.method, request.path, data], sort_keys=True,
+                         default=lambda value: f"{getattr(value, 'name', value)}:{getattr(value, 'size', '')}")
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def replay(record, fingerprint):
+    """
+    Returns the stored response of a record, or a 422 response if the key was
+    first used for a different request.
+    """
+    if record.fingerprint != fingerprint:
+        return Response(
+            {"detail": ["Der Idempotency-Key wurde bereits für eine andere Anfrage verwendet."]},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return Response(record.data, status=record.status_code,
+                    headers={**record.headers, 'Idempotent-Replayed': 'true'})
+
+
+def idempotent(view_method):
+    """
+    Honors the Idempotency-Key header on a DRF view method.
+
+    The first response for a key is stored with a TTL of IDEMPOTENCY_TTL
+    seconds and replayed for retries with the same key and request without
+    running the view again. A completed key costs one indexed lookup. A new
+    key runs the view in a transaction holding the key's row, so concurrent
+    duplicates wait for the first request and then replay its response.
+    Server errors and exceptions raised by the view are not stored, the row
+    is rolled back with the view's changes and a retry runs the view again.
+    Exceptions are left to DRF's `dispatch`, which also renders the response.
+
+    :param view_method: The view method handling the POST.
+    :return: The wrapped method.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"detail": ["Der Idempotency-Key darf höchstens 255 Zeichen lang sein."]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        user_id = request.user.pk or 0
+        fingerprint = request_fingerprint(request)
+        try:
+            record = IdempotencyRecord.objects.get(user_id=user_id, key=key)
+        except IdempotencyRecord.DoesNotExist:
+            record = None
+        if record is not None and record.status_code is not None and record.expires_at > now():
+            return replay(record, fingerprint)
+
+        expires_at = now() + timedelta(seconds=settings.IDEMPOTENCY_TTL)
+        with transaction.atomic():
+            record, created = IdempotencyRecord.objects.select_for_update().get_or_create(
+                user_id=user_id, key=key, defaults={'fingerprint': fingerprint, 'expires_at': expires_at},
+            )
+            if not created:
+                if record.status_code is not None and record.expires_at > now():
+                    return replay(record, fingerprint)
+                record.fingerprint, record.expires_at = fingerprint, expires_at
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code >= 500:
+                transaction.set_rollback(True)
+                return response
+            record.status_code = response.status_code
+            record.data = response.data
+            record.headers = {name: value for name, value in response.items() if name.lower() != 'content-type'}
+            record.save()
+        return response
+
+    return wrapper
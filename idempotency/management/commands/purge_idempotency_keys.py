@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from idempotency.models import IdempotencyRecord
+
+
+class Command(BaseCommand):
+    help = "Deletes stored idempotency responses whose TTL has expired."
+
+    def handle(self, *args, **options):
+        """
+        Deletes the expired records using the index on `expires_at`.
+        """
+        deleted, _ = IdempotencyRecord.objects.filter(expires_at__lte=now()).delete()
+        self.stdout.write(f"{deleted} expired idempotency keys deleted.")
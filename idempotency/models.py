@@ -0,0 +1,28 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class IdempotencyRecord(models.Model):
+    """
+    The stored response of a POST sent with an Idempotency-Key header.
+
+    Keys are scoped per user. The fingerprint identifies the request the key
+    was first used with, so a key reused for a different request is rejected
+    instead of replaying an unrelated response. The response is stored as its
+    data and the headers set by the view, and rendered again on replay.
+    """
+    user_id = models.IntegerField()
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    data = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    headers = models.JSONField(default=dict)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_id', 'key'], name='idempotency_unique_user_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.key}"
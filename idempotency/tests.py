@@ -0,0 +1,111 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+
+from coderr_auth.models import Profile
+from idempotency.decorators import idempotent
+from idempotency.models import IdempotencyRecord
+from offers.models import Offer, OfferDetail
+from orders.models import Order
+
+
+@override_settings(THROTTLE_SCOPES={})
+class IdempotentOrderCreationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        business = User.objects.create_user(username='business', password='secret')
+        Profile.objects.create(user=business, email='business@example.com', type='business')
+        offer = Offer.objects.create(user=business, title='Logo', description='Logo Design')
+        cls.detail = OfferDetail.objects.create(offer=offer, title='Basic', revisions=2, delivery_time_in_days=5,
+                                                price=Decimal('149.90'), features=['Logo'], offer_type='basic')
+        cls.customer = User.objects.create_user(username='customer', password='secret')
+        Profile.objects.create(user=cls.customer, email='customer@example.com', type='customer')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def order(self, key, detail_id=None):
+        return self.client.post('/coderr/api/orders/', {'offer_detail_id': detail_id or self.detail.pk},
+                                format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_first_response_without_creating_a_duplicate(self):
+        first = self.order('abc')
+        self.assertEqual(first.status_code, 201)
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.order('abc')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(len([query for query in queries.captured_queries if 'idempotency' in query['sql']]), 1)
+
+    def test_key_reused_for_another_request_is_rejected(self):
+        self.order('abc')
+        other_detail = OfferDetail.objects.create(offer=self.detail.offer, title='Premium', revisions=5,
+                                                  delivery_time_in_days=9, price=Decimal('499'), features=['Logo'],
+                                                  offer_type='premium')
+        response = self.order('abc', other_detail.pk)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_requests_without_key_are_not_stored(self):
+        self.client.post('/coderr/api/orders/', {'offer_detail_id': self.detail.pk}, format='json')
+        self.client.post('/coderr/api/orders/', {'offer_detail_id': self.detail.pk}, format='json')
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+
+class CountingView(APIView):
+    authentication_classes = []
+    permission_classes = []
+    calls = 0
+    finalized = 0
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        type(self).finalized += 1
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    @idempotent
+    def post(self, request):
+        type(self).calls += 1
+        if request.data.get('invalid'):
+            raise ValidationError({'detail': ['Ungültig.']})
+        return Response({'id': 7}, status=status.HTTP_201_CREATED, headers={'Location': '/coderr/api/things/7/'})
+
+
+class IdempotentDecoratorTests(TestCase):
+    def setUp(self):
+        CountingView.calls = CountingView.finalized = 0
+        self.view = CountingView.as_view()
+
+    def post(self, key, data):
+        return self.view(APIRequestFactory().post('/things/', data, format='json', HTTP_IDEMPOTENCY_KEY=key))
+
+    def test_replay_keeps_the_headers_set_by_the_view(self):
+        first = self.post('abc', {'name': 'x'})
+        first.render()
+        retry = self.post('abc', {'name': 'x'})
+        retry.render()
+        self.assertEqual(CountingView.calls, 1)
+        self.assertEqual(CountingView.finalized, 2)
+        self.assertEqual((retry.status_code, retry.content), (201, first.content))
+        self.assertEqual(retry['Location'], '/coderr/api/things/7/')
+        self.assertEqual(retry['Content-Type'], first['Content-Type'])
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+
+    def test_exceptions_are_handled_by_dispatch_and_not_stored(self):
+        response = self.post('abc', {'invalid': True})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(CountingView.finalized, 1)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+        self.post('abc', {'invalid': True})
+        self.assertEqual(CountingView.calls, 2)
@@ -0,0 +1,16 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from jobs.models import Job
+
+
+class Command(BaseCommand):
+    help = "Deletes done and failed jobs that finished more than JOBS_RETENTION seconds ago."
+
+    def handle(self, *args, **options):
+        cutoff = now() - datetime.timedelta(seconds=settings.JOBS_RETENTION)
+        deleted, _ = Job.objects.filter(status__in=['done', 'failed'], finished_at__lt=cutoff).delete()
+        self.stdout.write(f"{deleted} finished jobs deleted.")
@@ -0,0 +1,57 @@
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.queue import ensure_jobs, load_tasks, requeue_stale, run_pending, work
+
+
+def worker_main(stopping, poll_interval):
+    """
+    Entry point of a forked worker process. SIGINT is left to the parent,
+    which stops the workers after their current job.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    connections.close_all()
+    work(stopping, poll_interval)
+
+
+class Command(BaseCommand):
+    help = "Runs background jobs in a pool of worker processes until SIGTERM or SIGINT."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2, help="Number of worker processes.")
+        parser.add_argument('--poll-interval', type=float, default=settings.JOBS_POLL_INTERVAL,
+                            help="Seconds an idle worker waits before looking for jobs again.")
+        parser.add_argument('--burst', action='store_true',
+                            help="Run the ready jobs in this process and exit.")
+
+    def handle(self, *args, **options):
+        """
+        Queues the first jobs of the recurring tasks that have none, then
+        starts the worker processes and stops them after their current job on
+        SIGTERM or SIGINT. With `--burst` the ready jobs are run in this
+        process and the number of jobs is printed.
+        """
+        load_tasks()
+        ensure_jobs()
+        if options['burst']:
+            requeue_stale()
+            self.stdout.write(f"{run_pending()} jobs run.")
+            return
+        context = multiprocessing.get_context('fork')
+        stopping = context.Event()
+        connections.close_all()
+        workers = [context.Process(target=worker_main, args=(stopping, options['poll_interval']),
+                                   name=f'job-worker-{index}')
+                   for index in range(options['processes'])]
+        for worker in workers:
+            worker.start()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: stopping.set())
+        self.stdout.write(f"{len(workers)} job workers started.")
+        for worker in workers:
+            worker.join()
@@ -0,0 +1,46 @@
+from django.db import models
+from django.utils.timezone import now
+
+
+class Job(models.Model):
+    """
+    A deferred call of a registered task, see jobs/queue.py.
+
+    Jobs with a higher `priority` run first, jobs of equal priority in the
+    order of `run_at`. A failed job is queued again with a later `run_at`
+    until it has been attempted `max_attempts` times. A queued job with a
+    `key` is unique, enqueueing the same key again returns the queued job.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    task = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict, blank=True)
+    key = models.CharField(max_length=255, null=True, blank=True)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    run_at = models.DateTimeField(default=now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    last_error = models.TextField(blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-priority', 'run_at', 'id'], name='job_ready',
+                         condition=models.Q(status='queued')),
+            models.Index(fields=['locked_at'], name='job_running', condition=models.Q(status='running')),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['key'], name='job_unique_queued_key',
+                                    condition=models.Q(status='queued', key__isnull=False)),
+        ]
+
+    def __str__(self):
+        return f"{self.pk} {self.task} ({self.status})"
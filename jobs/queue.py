@@ -0,0 +1,271 @@
+"""
+Background jobs stored in the project's database.
+
+Apps register tasks in a `tasks.py` module with the `task` decorator and
+defer calls with `enqueue`. Workers started by `manage.py run_workers` claim
+the ready job with the highest priority, run it and record the outcome, so
+no broker is needed. On PostgreSQL the claim uses
+`SELECT ... FOR UPDATE SKIP LOCKED`, so workers never wait for each other.
+SQLite has no row locks, there the claims of all workers on the host are
+serialized with a lock file (JOBS_LOCK_FILE). The task runs after the claim
+is committed, without any lock held.
+
+A failed job is queued again after JOBS_RETRY_BACKOFF * 2^(attempts - 1)
+seconds (at most JOBS_RETRY_BACKOFF_MAX) until `max_attempts` is used up.
+Jobs of a crashed worker are queued again once they have been running for
+JOBS_LOCK_TIMEOUT seconds, so tasks should be idempotent.
+
+Recurring jobs reschedule themselves at the end of each run. Their first job
+is queued by a function registered with `ensure`, which workers call when
+they start and with every check for stale jobs, so a chain is also started
+again after its last job failed for good.
+"""
+import contextlib
+import datetime
+import fcntl
+import logging
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from coderr import metrics
+from jobs.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+_ensure_functions = []
+
+
+def task(function):
+    """
+    Registers a function as task under `<module>.<name>`. It is called with
+    the keyword arguments passed to `enqueue`, which must be JSON serializable.
+    """
+    _tasks[task_name(function)] = function
+    return function
+
+
+def task_name(function):
+    return f'{function.__module__}.{function.__qualname__}'
+
+
+def ensure(function):
+    """
+    Registers a function, called without arguments, that queues the first job
+    of a recurring task unless one is queued or running.
+    """
+    _ensure_functions.append(function)
+    return function
+
+
+def load_tasks():
+    """
+    Imports the `tasks` module of every installed app.
+    """
+    autodiscover_modules('tasks')
+
+
+def ensure_jobs():
+    """
+    Calls the functions registered with `ensure`. A failing function is
+    logged and does not keep the others from running.
+    """
+    for function in _ensure_functions:
+        try:
+            function()
+        except Exception:
+            logger.exception("Ensuring the jobs of %s failed.", task_name(function))
+
+
+def enqueue(function, *, priority=0, run_at=None, delay=None, max_attempts=None, key=None, **kwargs):
+    """
+    Queues a call of a task. Call it inside the transaction of the change the
+    job belongs to, so the job is only queued if the change is committed.
+
+    :param function: The task function or its registered name.
+    :param priority: Jobs with higher priority are claimed first.
+    :param run_at: The earliest time to run the job, now by default.
+    :param delay: Seconds from now to the earliest run, instead of `run_at`.
+    :param max_attempts: How often the job is tried, JOBS_MAX_ATTEMPTS by default.
+    :param key: Identifies the job. While a job with this key is queued, no other one is added.
+    :param kwargs: The keyword arguments of the task.
+    :return: The queued Job.
+    """
+    name = function if isinstance(function, str) else task_name(function)
+    if run_at is None:
+        run_at = timezone.now() + datetime.timedelta(seconds=delay or 0)
+    job = Job(task=name, kwargs=kwargs, key=key, priority=priority, run_at=run_at,
+              max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS)
+    if key is None:
+        job.save()
+        return job
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return Job.objects.get(key=key, status='queued')
+    return job
+
+
+@contextlib.contextmanager
+def claim_lock():
+    """
+    Serializes claims through JOBS_LOCK_FILE on databases without SKIP LOCKED.
+    """
+    if connection.features.has_select_for_update_skip_locked:
+        yield
+        return
+    with open(settings.JOBS_LOCK_FILE, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def claim(worker_id):
+    """
+    Marks the next ready job as running.
+
+    On SQLite the claim runs in autocommit mode under the lock file: a
+    transaction that reads first and writes then cannot wait for the writes
+    of running jobs and fails with "database is locked".
+
+    :param worker_id: The name of the claiming worker, stored in `locked_by`.
+    :return: The claimed Job, or None if no job is ready.
+    """
+    now = timezone.now()
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with claim_lock(), (transaction.atomic() if skip_locked else contextlib.nullcontext()):
+        ready = Job.objects.filter(status='queued', run_at__lte=now).order_by('-priority', 'run_at', 'id')
+        if skip_locked:
+            ready = ready.select_for_update(skip_locked=True)
+        job = ready.first()
+        if job is None or not Job.objects.filter(pk=job.pk, status='queued').update(
+                status='running', locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1):
+            return None
+    job.status, job.locked_by, job.locked_at, job.attempts = 'running', worker_id, now, job.attempts + 1
+    return job
+
+
+def backoff(attempts):
+    """
+    Returns the seconds to wait before the next attempt of a job that failed `attempts` times.
+    """
+    return min(settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1), settings.JOBS_RETRY_BACKOFF_MAX)
+
+
+def run(job):
+    """
+    Runs a claimed job and stores its outcome.
+
+    :return: True if the task succeeded.
+    """
+    function = _tasks.get(job.task)
+    started = time.perf_counter()
+    metrics.observe('coderr_job_start_delay_seconds', {'task': job.task},
+                    (job.locked_at - job.run_at).total_seconds(), metrics.JOB_DELAY_BUCKETS)
+    try:
+        if function is None:
+            raise LookupError(f"Unknown task {job.task}")
+        function(**job.kwargs)
+    except Exception as exc:
+        logger.exception("Job %s (%s) failed in attempt %d.", job.pk, job.task, job.attempts)
+        fail(job, f"{exc!r}")
+        succeeded = False
+    else:
+        Job.objects.filter(pk=job.pk).update(status='done', finished_at=timezone.now(), last_error='')
+        succeeded = True
+    metrics.inc('coderr_jobs_total', {'task': job.task, 'result': 'done' if succeeded else 'failed'})
+    metrics.observe('coderr_job_duration_seconds', {'task': job.task}, time.perf_counter() - started,
+                    metrics.JOB_DURATION_BUCKETS)
+    return succeeded
+
+
+def fail(job, error):
+    """
+    Queues a failed job again after its backoff, or marks it as failed when
+    its attempts are used up or another job with its key has been queued.
+    """
+    jobs = Job.objects.filter(pk=job.pk, status='running')
+    if job.attempts < job.max_attempts:
+        run_at = timezone.now() + datetime.timedelta(seconds=backoff(job.attempts))
+        try:
+            with transaction.atomic():
+                jobs.update(status='queued', run_at=run_at, last_error=error, locked_by='', locked_at=None)
+            return
+        except IntegrityError:
+            error = f"{error}; superseded by a newer job with key {job.key}"
+    jobs.update(status='failed', finished_at=timezone.now(), last_error=error)
+
+
+def requeue_stale():
+    """
+    Queues the jobs again that have been running for more than JOBS_LOCK_TIMEOUT
+    seconds, e.g. because their worker was killed.
+
+    :return: The number of queued jobs.
+    """
+    cutoff = timezone.now() - datetime.timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    requeued = 0
+    for job in Job.objects.filter(status='running', locked_at__lt=cutoff):
+        logger.warning("Job %s (%s) of %s timed out.", job.pk, job.task, job.locked_by)
+        fail(job, f"Timed out on {job.locked_by}")
+        requeued += 1
+    return requeued
+
+
+def run_pending(worker_id=None, limit=None):
+    """
+    Runs ready jobs in this process until none is left.
+
+    :param worker_id: The name stored in `locked_by`, host and pid by default.
+    :param limit: The maximum number of jobs to run.
+    :return: The number of jobs run.
+    """
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+    count = 0
+    while limit is None or count < limit:
+        job = claim(worker_id)
+        if job is None:
+            break
+        run(job)
+        count += 1
+    return count
+
+
+def work(stopping, poll_interval=None):
+    """
+    The loop of a worker process: runs ready jobs and polls every
+    `poll_interval` seconds (JOBS_POLL_INTERVAL) while the queue is empty.
+
+    :param stopping: An Event that ends the loop after the current job.
+    """
+    poll_interval = settings.JOBS_POLL_INTERVAL if poll_interval is None else poll_interval
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    load_tasks()
+    last_requeue = 0
+    while not stopping.is_set():
+        try:
+            if time.monotonic() - last_requeue > settings.JOBS_LOCK_TIMEOUT / 2:
+                requeue_stale()
+                ensure_jobs()
+                last_requeue = time.monotonic()
+            job = claim(worker_id)
+            if job is not None:
+                run(job)
+        except Exception:
+            logger.exception("The job worker %s failed.", worker_id)
+            job = None
+        finally:
+            close_old_connections()
+        if job is None:
+            stopping.wait(poll_interval)
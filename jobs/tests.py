@@ -0,0 +1,74 @@
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import claim, enqueue, requeue_stale, run_pending, task
+
+
+calls = []
+
+
+@task
+def remember(value):
+    calls.append(value)
+
+
+@task
+def explode():
+    raise RuntimeError('kaputt')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_jobs_run_by_priority_and_not_before_run_at(self):
+        enqueue(remember, value='normal')
+        enqueue(remember, value='later', delay=60)
+        enqueue(remember, value='urgent', priority=10)
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(calls, ['urgent', 'normal'])
+        later = Job.objects.get(status='queued')
+        self.assertEqual(later.kwargs, {'value': 'later'})
+        self.assertEqual(Job.objects.filter(status='done').count(), 2)
+
+    @override_settings(JOBS_RETRY_BACKOFF=10)
+    def test_failed_jobs_are_retried_with_backoff_until_attempts_are_used_up(self):
+        job = enqueue(explode, max_attempts=2)
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn("RuntimeError('kaputt')", job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + datetime.timedelta(seconds=8))
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_queued_key_is_unique(self):
+        first = enqueue(remember, key='rebuild', value=1)
+        self.assertEqual(enqueue(remember, key='rebuild', value=2).pk, first.pk)
+        run_pending()
+        self.assertNotEqual(enqueue(remember, key='rebuild', value=3).pk, first.pk)
+
+    def test_stale_running_jobs_are_queued_again(self):
+        enqueue(remember, value='crashed')
+        job = claim('worker-a')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - datetime.timedelta(hours=1))
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertEqual(requeue_stale(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error), ('queued', 'Timed out on worker-a'))
+
+    def test_burst_command_runs_ready_jobs(self):
+        enqueue('jobs.tests.remember', value='burst')
+        output = StringIO()
+        call_command('run_workers', '--burst', stdout=output)
+        self.assertEqual(output.getvalue().strip(), '1 jobs run.')
+        self.assertEqual(calls, ['burst'])
@@ -0,0 +1,70 @@
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404
+from coderr.async_views import AsyncReadAPIView, apaginate
+from coderr.fieldsets import fieldset_columns
+from offers.facets import aget_facets, requested_facets
+from offers.models import OfferDetail
+from offers.api.serializers import OfferSerializer, SingleDetailOfOfferSerializer
+from offers.api.views import OfferListAPIView, OfferDetailBatchAPIView, OfferDetailDetailsAPIView, requested_ids
+
+
+class OfferListAsyncView(AsyncReadAPIView):
+    sync_view_class = OfferListAPIView
+
+    async def get_data(self, request):
+        """
+        Async variant of `OfferListAPIView.get`.
+
+        The queryset, filters and pagination settings are taken from the sync
+        view, so both return the same pages. Only the `user` filter needs a
+        database lookup while it is validated and therefore runs in a thread.
+
+        :param request: The DRF request.
+        :return: The paginated offer list, with the requested facets.
+        """
+        names = requested_facets(request.query_params)
+        view = OfferListAPIView(request=request, args=(), kwargs={}, format_kwarg=None)
+        queryset = view.get_queryset()
+        if request.query_params.get('user'):
+            queryset = await sync_to_async(view.filter_queryset)(queryset)
+        else:
+            queryset = view.filter_queryset(queryset)
+        pagination = view.paginator
+        offers = await apaginate(pagination, queryset, request)
+        serializer = OfferSerializer(offers, many=True, context=view.get_serializer_context())
+        data = pagination.get_paginated_response(serializer.data).data
+        if names:
+            data['facets'] = await aget_facets(queryset, request.query_params, names)
+        return data
+
+
+class OfferDetailDetailsAsyncView(AsyncReadAPIView):
+    sync_view_class = OfferDetailDetailsAPIView
+
+    async def get_data(self, request, pk):
+        """
+        Async variant of `OfferDetailDetailsAPIView.get`.
+        """
+        fieldset = OfferDetailDetailsAPIView(request=request).get_fieldset()
+        queryset = OfferDetail.objects.all()
+        if fieldset is not None:
+            queryset = queryset.only(*fieldset_columns(SingleDetailOfOfferSerializer, fieldset))
+        offer_detail = await aget_object_or_404(queryset, id=pk)
+        return SingleDetailOfOfferSerializer(offer_detail, context={'fieldset': fieldset}).data
+
+
+class OfferDetailBatchAsyncView(AsyncReadAPIView):
+    sync_view_class = OfferDetailBatchAPIView
+
+    async def get_data(self, request):
+        """
+        Async variant of `OfferDetailBatchAPIView.get`.
+        """
+        ids = requested_ids(request.query_params)
+        fieldset = OfferDetailBatchAPIView(request=request).get_fieldset()
+        queryset = OfferDetail.objects.filter(id__in=ids)
+        if fieldset is not None:
+            queryset = queryset.only(*fieldset_columns(SingleDetailOfOfferSerializer, fieldset))
+        details = {detail.id: detail async for detail in queryset}
+        found = [details[pk] for pk in ids if pk in details]
+        return SingleDetailOfOfferSerializer(found, many=True, context={'fieldset': fieldset}).data
@@ -15,6 +15,8 @@ class OrderingHelperOffers:
             - "created_at": Orders the offers by creation time in ascending order.
             - "min_price": Orders the offers by their minimum price in ascending order.
             - "-min_price": Orders the offers by their minimum price in descending order.
+            - "-popular": Orders the offers by their popularity, the most popular first.
+            - "popular": Orders the offers by their popularity, the least popular first.
 
         If the given ordering parameter is not one of the above, it defaults to
         "-created_at" (ordering by creation time in descending order).
@@ -28,6 +30,8 @@ class OrderingHelperOffers:
         "created_at": "created_at",
         "min_price": "min_price",
         "-min_price": "-min_price",
+        "-popular": "-popularity",
+        "popular": "popularity",
         "-updated_at": "updated_at",  
         "updated_at": "-updated_at",    
         }
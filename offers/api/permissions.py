@@ -15,4 +15,4 @@ class IsOwnerOrAdmin(BasePermission):
         :return: A boolean indicating whether the user has permission.
         """
 
-        return request.user == obj.user or request.user.is_staff
\ No newline at end of file
+        return obj.user_id == request.user.pk or request.user.is_staff
\ No newline at end of file
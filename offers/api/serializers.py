@@ -1,9 +1,13 @@
 from rest_framework import serializers
 from django.urls import reverse
+from coderr.concurrency import save_versioned
+from coderr.fieldsets import FieldsetSerializerMixin
+from coderr.instrumentation import TimedSerializerMixin
+from events.models import record_event
 from offers.models import Offer, OfferDetail
-from django.db import models
+from django.db import models, transaction
 
-class OfferDetailSerializer(serializers.ModelSerializer):
+class OfferDetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = OfferDetail
         fields = ['title', 'revisions', 'delivery_time_in_days', 'price', 'features', 'offer_type', 'id']
@@ -108,7 +112,7 @@ class OfferDetailSerializer(serializers.ModelSerializer):
         return value
 
 
-class OfferDetailURLSerializer(serializers.ModelSerializer):
+class OfferDetailURLSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     url = serializers.SerializerMethodField()
 
     class Meta:
@@ -118,11 +122,14 @@ class OfferDetailURLSerializer(serializers.ModelSerializer):
     def get_url(self, obj):
         return reverse('offerdetails', args=[obj.id])
 
-class OfferSerializer(serializers.ModelSerializer):
+class OfferSerializer(TimedSerializerMixin, FieldsetSerializerMixin, serializers.ModelSerializer):
     details = serializers.SerializerMethodField()
     min_price = serializers.SerializerMethodField()
     min_delivery_time = serializers.SerializerMethodField()
     user_details = serializers.SerializerMethodField()
+    fieldset_columns = {
+        'user_details': ['user__profile__first_name', 'user__profile__last_name', 'user__profile__username'],
+    }
 
     class Meta:
         model = Offer
@@ -194,6 +201,8 @@ class OfferSerializer(serializers.ModelSerializer):
         """
         Returns a list of OfferDetails of the given Offer instance.
         If a POST request is made, the OfferDetails are serialized using the OfferDetailSerializer.
+        With `expand_details` in the context (`expand=details` on the list) they are
+        inlined with the SingleDetailOfOfferSerializer of `/offerdetails/<pk>/`.
         If not, the OfferDetails are serialized using the OfferDetailURLSerializer.
         :param obj: The Offer instance to retrieve the OfferDetails from.
         :return: A list of serialized OfferDetails.
@@ -201,22 +210,30 @@ class OfferSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request and request.method == 'POST':
             return OfferDetailSerializer(obj.details.all(), many=True).data
+        if self.context.get('expand_details'):
+            return SingleDetailOfOfferSerializer(obj.details.all(), many=True).data
         return OfferDetailURLSerializer(obj.details.all(), many=True).data
 
     def get_min_price(self, obj):
         """
         Returns the minimum price of all the OfferDetails of the given Offer instance.
+        Uses the `min_price` annotation of the list queryset when it is present.
         :param obj: The Offer instance to retrieve the minimum price from.
         :return: The minimum price of the OfferDetails of the given Offer instance.
         """
+        if hasattr(obj, 'min_price'):
+            return obj.min_price
         return obj.details.aggregate(models.Min('price'))['price__min']
 
     def get_min_delivery_time(self, obj):
         """
         Returns the minimum delivery time in days of all the OfferDetails of the given Offer instance.
+        Uses the `min_delivery_time` annotation of the list queryset when it is present.
         :param obj: The Offer instance to retrieve the minimum delivery time from.
         :return: The minimum delivery time in days of the OfferDetails of the given Offer instance.
         """
+        if hasattr(obj, 'min_delivery_time'):
+            return obj.min_delivery_time
         return obj.details.aggregate(models.Min('delivery_time_in_days'))['delivery_time_in_days__min']
 
     def get_user_details(self, obj):
@@ -234,7 +251,8 @@ class OfferSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         """
-        Creates a new Offer instance with the given validated data and associated OfferDetails.
+        Creates a new Offer instance with the given validated data and associated OfferDetails,
+        and records an `offer.created` event in the same transaction.
 
         The validated data must include a 'validated_details' key containing a list of dictionaries,
         each representing an OfferDetail to be associated with the Offer.
@@ -244,23 +262,28 @@ class OfferSerializer(serializers.ModelSerializer):
         """
 
         validated_details = validated_data.pop('validated_details', [])
-        offer = Offer.objects.create(**validated_data)
-        for detail in validated_details:
-            OfferDetail.objects.create(offer=offer, **detail)
+        with transaction.atomic():
+            offer = Offer.objects.create(**validated_data)
+            for detail in validated_details:
+                OfferDetail.objects.create(offer=offer, **detail)
+            record_event('offer.created', {'id': offer.pk, 'user': offer.user_id, 'title': offer.title})
 
         return offer
     
     
-class SingleDetailOfOfferSerializer(serializers.ModelSerializer):
+class SingleDetailOfOfferSerializer(TimedSerializerMixin, FieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = OfferDetail
         fields = ['title', 'revisions', 'delivery_time_in_days', 'price', 'features', 'offer_type', 'id']
 
-class SingleFullOfferDetailSerializer(serializers.ModelSerializer):
+class SingleFullOfferDetailSerializer(TimedSerializerMixin, FieldsetSerializerMixin, serializers.ModelSerializer):
     details = SingleDetailOfOfferSerializer(many=True) 
     min_price = serializers.SerializerMethodField()
     min_delivery_time = serializers.SerializerMethodField()
     user_details = serializers.SerializerMethodField()
+    fieldset_columns = {
+        'user_details': ['user'],
+    }
 
     class Meta:
         model = Offer
@@ -275,8 +298,10 @@ class SingleFullOfferDetailSerializer(serializers.ModelSerializer):
             'details',
             'min_price',
             'min_delivery_time',
-            'user_details'
+            'user_details',
+            'version'
         ]
+        read_only_fields = ['version']
 
     def get_min_price(self, obj):
         """
@@ -340,20 +365,30 @@ class SingleFullOfferDetailSerializer(serializers.ModelSerializer):
         """
         Updates an Offer instance with the given validated data.
 
-        This method updates the fields of the Offer instance with the given validated
-        data and saves the instance. If the validated data contains a 'details' key, it
-        calls `_update_details` to update the Offer's details.
+        This method sets the fields of the Offer instance from the given validated
+        data and writes them with a conditional UPDATE that expects the `version`
+        passed to `save` and increments it. If the validated data contains a
+        'details' key, it calls `_update_details` to update the Offer's details.
+        The written details are kept in `written_details`, so the response can be
+        built without reading them again. An `offer.updated` event is recorded in
+        the same transaction.
 
         :param instance: The Offer instance to be updated.
-        :param validated_data: The validated data to update the Offer with.
+        :param validated_data: The validated data to update the Offer with, including 'version'.
         :return: The updated Offer instance.
+        :raises VersionConflict: If the offer has been changed since the expected version.
         """
+        version = validated_data.pop('version', instance.version)
         details_data = validated_data.pop('details', None)
+        validated_data.pop('validated_details', None)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        if details_data is not None:
-            self._update_details(instance, details_data)
-        instance.save()
+        with transaction.atomic():
+            save_versioned(instance, [*validated_data, 'updated_at'], version)
+            if details_data is not None:
+                instance.written_details = self._update_details(instance, details_data)
+            record_event('offer.updated', {'id': instance.pk, 'user': instance.user_id, 'title': instance.title,
+                                           'version': instance.version})
         return instance
 
     def _update_details(self, instance, details_data):
@@ -370,16 +405,21 @@ class SingleFullOfferDetailSerializer(serializers.ModelSerializer):
 
         :param instance: The Offer instance whose OfferDetails are to be updated.
         :param details_data: The validated data to update the OfferDetails with.
+        :return: The updated and created OfferDetails, ordered by id.
         """
         existing_details = {detail.id: detail for detail in instance.details.all()}
+        written_details = []
         for detail_data in details_data:
             detail_id = detail_data.get('id')
             if detail_id and detail_id in existing_details:
-                self._update_detail_instance(existing_details.pop(detail_id), detail_data)
+                detail = existing_details.pop(detail_id)
+                self._update_detail_instance(detail, detail_data)
             else:
-                OfferDetail.objects.create(offer=instance, **detail_data)
+                detail = OfferDetail.objects.create(offer=instance, **detail_data)
+            written_details.append(detail)
         for remaining_detail in existing_details.values():
             remaining_detail.delete()
+        return sorted(written_details, key=lambda detail: detail.id)
 
     def _update_detail_instance(self, detail_instance, detail_data):
         """
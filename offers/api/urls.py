@@ -1,8 +1,12 @@
 from django.urls import path
-from . import views
+from coderr.async_views import read_split
+from . import views, async_views
 
 urlpatterns = [
-    path('offers/', views.OfferListAPIView.as_view()),
+    path('offers/', read_split(views.OfferListAPIView.as_view(), async_views.OfferListAsyncView.as_view())),
+    path('offers/import/', views.OfferImportAPIView.as_view()),
+    path('offers/autocomplete/', views.OfferAutocompleteAPIView.as_view()),
     path('offers/<int:pk>/', views.OfferDetailsAPIView.as_view()),
-    path('offerdetails/<int:pk>/', views.OfferDetailDetailsAPIView.as_view(), name='offerdetails'),
+    path('offerdetails/', read_split(views.OfferDetailBatchAPIView.as_view(), async_views.OfferDetailBatchAsyncView.as_view()), name='offerdetails-batch'),
+    path('offerdetails/<int:pk>/', read_split(views.OfferDetailDetailsAPIView.as_view(), async_views.OfferDetailDetailsAsyncView.as_view()), name='offerdetails'),
 ]
@@ -3,19 +3,27 @@ from offers.api.permissions import IsOwnerOrAdmin
 from offers.models import Offer, OfferDetail
 from offers.api.serializers import SingleDetailOfOfferSerializer, SingleFullOfferDetailSerializer, OfferDetailSerializer
 from offers.api.serializers import OfferSerializer
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
-from rest_framework.exceptions import APIException
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.exceptions import APIException, ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import  SearchFilter
 from django.db.models import Min
 from rest_framework.pagination import PageNumberPagination
 from offers.api.ordering import OrderingHelperOffers
-from django.utils.timezone import now
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from rest_framework import status
 from rest_framework.exceptions import PermissionDenied
+from coderr.concurrency import expected_version
+from coderr.fieldsets import FieldsetViewMixin, fieldset_columns
+from idempotency.decorators import idempotent
+from offers.autocomplete import get_index
+from offers.facets import get_facets, requested_facets
+from offers.importer import import_offers
+from django.conf import settings
+from django.db import transaction
+from events.models import record_event
 
 
 
@@ -29,7 +37,39 @@ class OfferPagination(PageNumberPagination):
     page_size = 6 
     page_size_query_param = 'page_size'
 
-class OfferListAPIView(ListCreateAPIView):
+def expands_details(params):
+    """
+    Returns whether the `expand` parameter asks to inline the offer details, e.g. `expand=details`.
+
+    :raises ValidationError: If another expansion is requested.
+    """
+    names = [name.strip() for name in params.get('expand', '').split(',') if name.strip()]
+    unknown = [name for name in names if name != 'details']
+    if unknown:
+        raise ValidationError({"detail": [f"Unbekannte Erweiterungen: {', '.join(unknown)}. Erlaubt ist: details."]})
+    return 'details' in names
+
+
+def requested_ids(params):
+    """
+    Returns the ids of the `ids` parameter, e.g. `ids=1,2,3`, without duplicates.
+
+    :return: The list of ids in the requested order.
+    :raises ValidationError: If the parameter is missing, not a list of numbers
+        or longer than OFFER_DETAIL_BATCH_MAX_IDS.
+    """
+    try:
+        ids = list(dict.fromkeys(int(value) for value in params.get('ids', '').split(',') if value.strip()))
+    except ValueError:
+        raise ValidationError({"detail": ["ids muss eine kommagetrennte Liste von Zahlen sein."]})
+    if not ids:
+        raise ValidationError({"detail": ["Bitte mindestens eine id im Parameter ids angeben."]})
+    if len(ids) > settings.OFFER_DETAIL_BATCH_MAX_IDS:
+        raise ValidationError({"detail": [f"Es können höchstens {settings.OFFER_DETAIL_BATCH_MAX_IDS} ids abgefragt werden."]})
+    return ids
+
+
+class OfferListAPIView(FieldsetViewMixin, ListCreateAPIView):
     queryset = Offer.objects.annotate(min_price=Min('details__price'))
     serializer_class = OfferSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -49,9 +89,24 @@ class OfferListAPIView(ListCreateAPIView):
         - `max_delivery_time`: filter by the maximum delivery time of the offer
         - `ordering`: filter by the ordering of the offer (default is 'updated_at')
 
+        The minimum price and delivery time are annotated and the details and
+        creator profile are loaded up front, so serializing a page runs no
+        per-offer queries. With a sparse fieldset only the columns and
+        relations of the selected fields are loaded.
+
         :return: a filtered queryset of offers
         """
-        queryset = Offer.objects.annotate(min_price=Min('details__price'))
+        fieldset = self.get_fieldset()
+        queryset = Offer.objects.annotate(
+            min_price=Min('details__price'),
+            min_delivery_time=Min('details__delivery_time_in_days'),
+        )
+        if fieldset is None or 'user_details' in fieldset:
+            queryset = queryset.select_related('user__profile')
+        if fieldset is None or 'details' in fieldset:
+            queryset = queryset.prefetch_related('details')
+        if fieldset is not None:
+            queryset = queryset.only(*fieldset_columns(OfferSerializer, fieldset))
         creator_id = self.request.query_params.get('creator_id', None)
         if creator_id:
             queryset = queryset.filter(user_id=creator_id)
@@ -66,6 +121,30 @@ class OfferListAPIView(ListCreateAPIView):
             odering = 'updated_at'
         queryset = OrderingHelperOffers.apply_ordering(queryset, ordering=odering)
         return queryset
+
+    def get_serializer_context(self):
+        """
+        Adds `expand_details` for `expand=details`, which inlines the offer
+        details instead of linking them. They are prefetched either way.
+        """
+        context = super().get_serializer_context()
+        context['expand_details'] = expands_details(self.request.query_params)
+        return context
+
+    def list(self, request, *args, **kwargs):
+        """
+        Returns a page of offers. With `facets=price,delivery_time,creator`
+        the response also contains the facet counts of all filtered offers,
+        see `offers.facets`.
+
+        :raises ValidationError: If an unknown facet or expansion is requested.
+        """
+        names = requested_facets(request.query_params)
+        response = super().list(request, *args, **kwargs)
+        if names:
+            offers = self.filter_queryset(self.get_queryset())
+            response.data['facets'] = get_facets(offers, request.query_params, names)
+        return response
     
 
     def get_permissions(self):
@@ -80,6 +159,14 @@ class OfferListAPIView(ListCreateAPIView):
         if self.request.method == 'POST':
             return [IsOwnerOrAdmin()] 
         return super().get_permissions()
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        """
+        Creates an offer. Retries with the same Idempotency-Key header get
+        the first response again.
+        """
+        return super().post(request, *args, **kwargs)
     
     def perform_create(self, serializer, format = None):
         """
@@ -104,11 +191,74 @@ class OfferListAPIView(ListCreateAPIView):
         serializer.save(user=user)
 
 
-class OfferDetailsAPIView(RetrieveUpdateDestroyAPIView):
+class OfferImportAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, format=None):
+        """
+        Imports offers for the current business user from an uploaded JSON
+        Lines file (field `offers`) with one `POST /offers/` body per line.
+
+        The file is read line by line and imported in chunks, see
+        `offers.importer`. Invalid lines are skipped and listed with their
+        line number and errors.
+
+        :param request: The HTTP request with the uploaded file.
+        :return: A Response with the number of created offers and the errors.
+        :raises BusinessProfileRequired: If the user does not have a business profile.
+        """
+        profile = getattr(request.user, 'profile', None)
+        if not profile or profile.type != 'business':
+            raise BusinessProfileRequired()
+        upload = request.FILES.get('offers')
+        if upload is None:
+            return Response({"detail": ["Bitte eine JSON-Lines-Datei im Feld offers hochladen."]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        result = import_offers(upload, request.user.pk, settings.OFFER_IMPORT_CHUNK_SIZE)
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class OfferAutocompleteAPIView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, format=None):
+        """
+        Returns the offer titles and business usernames with a word starting
+        with the `q` parameter, at most `limit` (AUTOCOMPLETE_LIMIT by
+        default, up to AUTOCOMPLETE_MAX_LIMIT). They are read from the prefix
+        index of this process, see `offers.autocomplete`.
+
+        :param request: The HTTP request with the `q` and `limit` parameters.
+        :return: A Response with the list of results.
+        :raises ValidationError: If `limit` is not a number.
+        """
+        try:
+            limit = int(request.query_params.get('limit', settings.AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            raise ValidationError({"detail": ["limit muss eine ganze Zahl sein."]})
+        limit = max(1, min(limit, settings.AUTOCOMPLETE_MAX_LIMIT))
+        results = get_index().lookup(request.query_params.get('q', ''), limit)
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+class OfferDetailsAPIView(FieldsetViewMixin, RetrieveUpdateDestroyAPIView):
     queryset = Offer.objects.prefetch_related('details')
     serializer_class = SingleFullOfferDetailSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
+    def get_queryset(self):
+        """
+        Returns the offers with their details. With a sparse fieldset only the
+        selected columns are loaded and the details only if they are selected.
+        """
+        fieldset = self.get_fieldset()
+        if fieldset is None:
+            return super().get_queryset()
+        queryset = Offer.objects.only(*fieldset_columns(SingleFullOfferDetailSerializer, fieldset))
+        if 'details' in fieldset:
+            queryset = queryset.prefetch_related('details')
+        return queryset
+
     def get_permissions(self):
         """
         Returns the list of permissions that this view requires.
@@ -124,20 +274,28 @@ class OfferDetailsAPIView(RetrieveUpdateDestroyAPIView):
         return super().get_permissions()
 
     def update(self, request, format=None, **kwargs):
+      """
+      Updates an offer if it still has the `version` sent by the client, or
+      the loaded one if none is sent, and answers with 409 otherwise.
+      The response is built from the written data without reading the offer again.
+      """
       partial = kwargs.pop('partial', False)
       instance = self.get_object()
+      version = expected_version(request.data, instance)
       serializer = self.get_serializer(instance, data=request.data, partial=partial)
       serializer.is_valid(raise_exception=True)
-      serializer.save()
-      instance.updated_at = now()
-      instance.refresh_from_db()
+      serializer.save(version=version)
+      details = getattr(instance, 'written_details', None)
+      if details is None:
+          details = instance.details.all()
 
       updated_data = {
           'id': instance.id,
-          'title': serializer.validated_data.get('title', instance.title),
-          'description': serializer.validated_data.get('description', instance.description),
-          'details': OfferDetailSerializer(instance.details.all(), many=True).data,
-          'image': instance.image.url if instance.image else None 
+          'title': instance.title,
+          'description': instance.description,
+          'details': OfferDetailSerializer(details, many=True).data,
+          'image': instance.image.url if instance.image else None,
+          'version': instance.version,
       }
 
       return Response(updated_data, status=status.HTTP_200_OK)
@@ -148,20 +306,52 @@ class OfferDetailsAPIView(RetrieveUpdateDestroyAPIView):
             raise PermissionDenied({"details": ["Nur der Besitzer oder ein Admin kann das Angebot löschen."], })
         if not (request.user.profile.type == 'business' or request.user.is_staff):
             raise PermissionDenied({"details" : ["Nur ein Unternehmen kann ein Angebot löschen."], })
-        offer.delete()
+        with transaction.atomic():
+            record_event('offer.deleted', {'id': offer.pk, 'user': offer.user_id})
+            offer.delete()
         return Response({}, status=status.HTTP_200_OK)
     
 
 
 
 
-class OfferDetailDetailsAPIView(APIView):
+class OfferDetailDetailsAPIView(FieldsetViewMixin, APIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
+    fieldset_serializer_class = SingleDetailOfOfferSerializer
 
     def get(self, request, pk, format=None):
         """
         API View to get the details of an offer by its primary key (pk).
+        Supports the `fields` and `omit` query parameters.
+        """
+        fieldset = self.get_fieldset()
+        queryset = OfferDetail.objects.all()
+        if fieldset is not None:
+            queryset = queryset.only(*fieldset_columns(SingleDetailOfOfferSerializer, fieldset))
+        offer = get_object_or_404(queryset, id=pk)
+        serializer = SingleDetailOfOfferSerializer(offer, context={'fieldset': fieldset})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class OfferDetailBatchAPIView(FieldsetViewMixin, APIView):
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    fieldset_serializer_class = SingleDetailOfOfferSerializer
+
+    def get(self, request, format=None):
+        """
+        API View to get several offer details by their ids (`ids=1,2,3`) with
+        one query. The details are returned in the requested order, ids that
+        do not exist are left out. Supports the `fields` and `omit` query
+        parameters.
+
+        :raises ValidationError: If `ids` is missing, invalid or too long.
         """
-        offer = get_object_or_404(OfferDetail, id=pk)
-        serializer = SingleDetailOfOfferSerializer(offer)
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        ids = requested_ids(request.query_params)
+        fieldset = self.get_fieldset()
+        queryset = OfferDetail.objects.filter(id__in=ids)
+        if fieldset is not None:
+            queryset = queryset.only(*fieldset_columns(SingleDetailOfOfferSerializer, fieldset))
+        details = {detail.id: detail for detail in queryset}
+        found = [details[pk] for pk in ids if pk in details]
+        serializer = SingleDetailOfOfferSerializer(found, many=True, context={'fieldset': fieldset})
+        return Response(serializer.data, status=status.HTTP_200_OK)
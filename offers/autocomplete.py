@@ -0,0 +1,206 @@
+"""
+Typeahead over offer titles and business usernames (`GET /offers/autocomplete/?q=...`).
+
+Every process holds one PrefixIndex: a sorted list of (key, type, id)
+entries, where the keys are the normalized titles and usernames starting at
+each of their words, cut to AUTOCOMPLETE_KEY_LENGTH characters. A lookup
+bisects to the first key starting with the query and reads on from there,
+so it never touches the database. The index holds at most
+AUTOCOMPLETE_MAX_ENTRIES keys. Business users and the most popular offers
+are loaded first, entries beyond the limit are left out.
+
+The index is built from the tables on the first lookup of a process. A
+daemon thread then applies the offer and profile events of the outbox every
+AUTOCOMPLETE_REFRESH_INTERVAL seconds. Like the event hub, it reads back
+EVENTS_POLL_LOOKBACK ids, since events may commit out of order. Applying an
+event again changes nothing.
+"""
+import bisect
+import itertools
+import logging
+import os
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Max
+
+from coderr_auth.models import Profile
+from events.models import OutboxEvent
+from offers.models import Offer
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text):
+    """
+    Returns the text in lower case, without accents and with single spaces,
+    so "Jürgen  Design" and "jurgen design" have the same key.
+    """
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ' '.join(''.join(char for char in decomposed if not unicodedata.combining(char)).split())
+
+
+class PrefixIndex:
+    def __init__(self, max_entries=None, key_length=None):
+        self.max_entries = max_entries or settings.AUTOCOMPLETE_MAX_ENTRIES
+        self.key_length = key_length or settings.AUTOCOMPLETE_KEY_LENGTH
+        self.entries = []
+        self.labels = {}
+        self.last_id = 0
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    def keys_of(self, label):
+        """
+        Returns the keys of a label: the normalized label from the start of each word.
+        """
+        text = normalize(label)
+        return {text[index:index + self.key_length] for index in range(len(text))
+                if text[index] != ' ' and (index == 0 or text[index - 1] == ' ')}
+
+    def put(self, kind, pk, label):
+        """
+        Adds an entry or replaces its label. Nothing is added if the index is full.
+
+        :param kind: "offer" or "business".
+        :param pk: The id of the offer or business user.
+        :param label: The title or username.
+        """
+        if self.labels.get((kind, pk)) == label:
+            return
+        self.remove(kind, pk)
+        keys = self.keys_of(label)
+        with self.lock:
+            if not keys or len(self.entries) + len(keys) > self.max_entries:
+                return
+            self.labels[(kind, pk)] = label
+            for key in keys:
+                bisect.insort(self.entries, (key, kind, pk))
+
+    def remove(self, kind, pk):
+        """
+        Removes the entry of an offer or business user, if it is in the index.
+        """
+        with self.lock:
+            label = self.labels.pop((kind, pk), None)
+            if label is None:
+                return
+            for key in self.keys_of(label):
+                index = bisect.bisect_left(self.entries, (key, kind, pk))
+                if index < len(self.entries) and self.entries[index] == (key, kind, pk):
+                    del self.entries[index]
+
+    def lookup(self, query, limit):
+        """
+        Returns the entries with a word starting with the query, ordered by the matching key.
+
+        :param query: The typed text.
+        :param limit: The maximum number of results.
+        :return: A list of dictionaries with `type`, `id` and `label`.
+        """
+        prefix = normalize(query)[:self.key_length]
+        if not prefix:
+            return []
+        results, seen = [], set()
+        with self.lock:
+            index = bisect.bisect_left(self.entries, (prefix,))
+            while index < len(self.entries) and len(results) < limit:
+                key, kind, pk = self.entries[index]
+                if not key.startswith(prefix):
+                    break
+                if (kind, pk) not in seen:
+                    seen.add((kind, pk))
+                    results.append({"type": kind, "id": pk, "label": self.labels[(kind, pk)]})
+                index += 1
+        return results
+
+    def build(self):
+        """
+        Loads the business users and offers from the tables and sorts the
+        entries once, instead of inserting them one by one.
+        """
+        self.last_id = OutboxEvent.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        rows = [('business', user_id, username) for user_id, username in
+                Profile.objects.filter(type='business').values_list('user_id', 'username').iterator()]
+        offers = Offer.objects.order_by('-popularity', '-pk').values_list('pk', 'title')
+        entries, labels = [], {}
+        for kind, pk, label in itertools.chain(rows, (('offer', pk, title) for pk, title in offers.iterator())):
+            keys = self.keys_of(label)
+            if len(entries) + len(keys) > self.max_entries:
+                break
+            labels[(kind, pk)] = label
+            entries.extend((key, kind, pk) for key in keys)
+        entries.sort()
+        with self.lock:
+            self.entries, self.labels = entries, labels
+
+    def apply(self, kind, payload):
+        """
+        Applies an outbox event to the index. Other events are ignored.
+        """
+        if kind in ('offer.created', 'offer.updated'):
+            self.put('offer', payload['id'], payload['title'])
+        elif kind == 'offer.deleted':
+            self.remove('offer', payload['id'])
+        elif kind in ('profile.created', 'profile.updated'):
+            if payload['type'] == 'business':
+                self.put('business', payload['user'], payload['username'])
+            else:
+                self.remove('business', payload['user'])
+
+    def sync(self):
+        """
+        Applies the outbox events recorded since the last sync, reading back
+        EVENTS_POLL_LOOKBACK ids for events that committed late.
+        """
+        lookback, batch_size = settings.EVENTS_POLL_LOOKBACK, settings.EVENTS_POLL_BATCH_SIZE
+        while True:
+            events = list(OutboxEvent.objects.filter(id__gt=max(0, self.last_id - lookback))
+                          .order_by('id').values_list('id', 'kind', 'payload')[:batch_size + lookback])
+            for event_id, kind, payload in events:
+                self.apply(kind, payload)
+                self.last_id = max(self.last_id, event_id)
+            if len(events) < batch_size + lookback:
+                return
+
+    def follow(self):
+        """
+        Syncs the index every AUTOCOMPLETE_REFRESH_INTERVAL seconds, for the
+        daemon thread of the process.
+        """
+        while True:
+            time.sleep(settings.AUTOCOMPLETE_REFRESH_INTERVAL)
+            try:
+                self.sync()
+            except DatabaseError:
+                logger.exception("Syncing the autocomplete index failed.")
+            finally:
+                close_old_connections()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Returns the index of this process. It is built on the first call, which
+    also starts the sync thread if AUTOCOMPLETE_REFRESH_INTERVAL is set.
+    Forked processes build their own.
+    """
+    global _index
+    index = _index
+    if index is not None and index.pid == os.getpid():
+        return index
+    with _index_lock:
+        if _index is None or _index.pid != os.getpid():
+            index = PrefixIndex()
+            index.build()
+            if settings.AUTOCOMPLETE_REFRESH_INTERVAL:
+                threading.Thread(target=index.follow, name='autocomplete-sync', daemon=True).start()
+            _index = index
+        return _index
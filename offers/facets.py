@@ -0,0 +1,159 @@
+"""
+Facet counts of the offer list (`GET /offers/?facets=price,delivery_time,creator`).
+
+All facets come from one grouped query over the filtered offers. It groups
+by creator and counts, per creator, the offers with any detail below each
+price edge and up to each delivery time edge. An offer has a detail below
+an edge exactly if its minimum price is below it, so these are cumulative
+counts of `min_price` and `min_delivery_time`. The buckets are the
+differences of neighbouring edges, the totals the sums over the creators.
+
+The result is cached for OFFER_FACETS_CACHE_TTL seconds per filter
+signature. New and changed offers invalidate all cached facets through the
+outbox handler in offers/handlers.py. It bumps a generation number that is
+part of every key, so the cache must be shared with the dispatcher, see
+events/checks.py.
+"""
+import collections
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from rest_framework.exceptions import ValidationError
+
+from coderr import metrics
+from offers.models import Offer
+
+
+FACETS = ['price', 'delivery_time', 'creator']
+FILTER_PARAMS = ['creator_id', 'min_price', 'max_delivery_time', 'search', 'user']
+GENERATION_KEY = 'offers:facets:generation'
+
+
+def requested_facets(params):
+    """
+    Returns the facets listed in the `facets` parameter, e.g. `facets=price,creator`.
+
+    :return: The list of facet names, empty if the parameter is missing.
+    :raises ValidationError: If a name is not a known facet.
+    """
+    names = [name.strip() for name in params.get('facets', '').split(',') if name.strip()]
+    unknown = [name for name in names if name not in FACETS]
+    if unknown:
+        raise ValidationError({"detail": [f"Unbekannte Facetten: {', '.join(unknown)}. Erlaubt sind: {', '.join(FACETS)}."]})
+    return names
+
+
+def facet_queryset(offers):
+    """
+    Builds the grouped query over a filtered offer queryset.
+
+    :param offers: The filtered offers, e.g. `view.filter_queryset(view.get_queryset())`.
+    :return: A values queryset with one row per creator.
+    """
+    counts = {'count': Count('id', distinct=True)}
+    for index, edge in enumerate(settings.OFFER_FACET_PRICE_EDGES):
+        counts[f'price_{index}'] = Count('id', distinct=True, filter=Q(details__price__lt=edge))
+    for index, edge in enumerate(settings.OFFER_FACET_DELIVERY_EDGES):
+        counts[f'delivery_{index}'] = Count('id', distinct=True, filter=Q(details__delivery_time_in_days__lte=edge))
+    counts['priced'] = Count('id', distinct=True, filter=Q(details__isnull=False))
+    return (Offer.objects.filter(pk__in=offers.order_by().values('pk'))
+            .values('user_id', 'user__username').annotate(**counts).order_by())
+
+
+def histogram(totals, prefix, edges, make_bucket):
+    """
+    Turns the cumulative counts up to each edge into bucket counts. The last
+    bucket holds the remaining offers with details.
+    """
+    buckets, previous = [], 0
+    for index, edge in enumerate(edges):
+        cumulative = totals[f'{prefix}_{index}']
+        buckets.append(make_bucket(edges[index - 1] if index else None, edge, cumulative - previous))
+        previous = cumulative
+    buckets.append(make_bucket(edges[-1], None, totals['priced'] - previous))
+    return buckets
+
+
+def build_facets(rows, names):
+    """
+    Builds the facets from the rows of `facet_queryset`.
+
+    Price buckets include `min` and exclude `max`, delivery time buckets
+    include both. The last bucket has no `max`. Offers without details are
+    only counted by the creator facet.
+
+    :param rows: The rows of the grouped query.
+    :param names: The requested facets.
+    :return: A dictionary mapping each facet to its list of buckets.
+    """
+    totals = collections.Counter()
+    for row in rows:
+        totals.update({key: value for key, value in row.items() if key not in ('user_id', 'user__username')})
+    facets = {}
+    if 'price' in names:
+        facets['price'] = histogram(
+            totals, 'price', settings.OFFER_FACET_PRICE_EDGES,
+            lambda previous, edge, count: {"min": previous or 0, "max": edge, "count": count},
+        )
+    if 'delivery_time' in names:
+        facets['delivery_time'] = histogram(
+            totals, 'delivery', settings.OFFER_FACET_DELIVERY_EDGES,
+            lambda previous, edge, count: {"min": previous + 1 if previous else 0, "max": edge, "count": count},
+        )
+    if 'creator' in names:
+        creators = sorted(rows, key=lambda row: (-row['count'], row['user_id']))[:settings.OFFER_FACET_CREATOR_LIMIT]
+        facets['creator'] = [{"user": row['user_id'], "username": row['user__username'], "count": row['count']}
+                             for row in creators]
+    return facets
+
+
+def cache_key(params, names, generation):
+    """
+    Returns the cache key of the facets of a filter signature: the filter
+    parameters and facet names, under the given generation.
+    """
+    signature = '&'.join(f'{name}={params.get(name, "")}' for name in FILTER_PARAMS)
+    digest = hashlib.sha256(f'{signature}|{",".join(sorted(names))}'.encode()).hexdigest()
+    return f'offers:facets:{generation}:{digest}'
+
+
+def get_facets(offers, params, names):
+    """
+    Returns the facets of the filtered offers, from the cache if possible.
+
+    :param offers: The filtered offers.
+    :param params: The query parameters, for the cache key.
+    :param names: The requested facets.
+    """
+    key = cache_key(params, names, cache.get(GENERATION_KEY, 0))
+    facets = cache.get(key)
+    metrics.record_cache('offer_facets', facets is not None)
+    if facets is None:
+        facets = build_facets(list(facet_queryset(offers)), names)
+        cache.set(key, facets, settings.OFFER_FACETS_CACHE_TTL)
+    return facets
+
+
+async def aget_facets(offers, params, names):
+    """
+    Async variant of `get_facets`.
+    """
+    key = cache_key(params, names, await cache.aget(GENERATION_KEY, 0))
+    facets = await cache.aget(key)
+    metrics.record_cache('offer_facets', facets is not None)
+    if facets is None:
+        facets = build_facets([row async for row in facet_queryset(offers)], names)
+        await cache.aset(key, facets, settings.OFFER_FACETS_CACHE_TTL)
+    return facets
+
+
+def invalidate_facets():
+    """
+    Starts a new generation of cache keys, so all cached facets are computed again.
+    """
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
@@ -0,0 +1,31 @@
+from events.dispatcher import handles
+from offers.facets import invalidate_facets
+from offers.popularity import count_orders, refresh_sellers
+
+
+@handles('offer.*')
+def invalidate_cached_facets(events):
+    """
+    Drops the cached facet counts once for a batch of offer events. Handling
+    the events again only drops the cache again.
+    """
+    invalidate_facets()
+
+
+@handles('order.created')
+def count_new_orders(events):
+    """
+    Adds new orders to the popularity of their offers. Every order is only
+    counted once, see `offers.popularity.count_orders`.
+    """
+    count_orders([event.payload['id'] for event in events])
+
+
+@handles('offer.created', 'review.*')
+def refresh_seller_popularity(events):
+    """
+    Recomputes the popularity of the offers of the sellers whose rating or
+    offers changed, from their current reviews.
+    """
+    refresh_sellers({event.payload['business_user'] if event.kind.startswith('review.') else event.payload['user']
+                     for event in events})
@@ -0,0 +1,138 @@
+"""
+Bulk import of offers from JSON Lines.
+
+Every line holds the body of one `POST /offers/`. The lines are read as a
+stream and handled in chunks of OFFER_IMPORT_CHUNK_SIZE: each offer and its
+details are validated once with OfferImportSerializer, and the valid offers
+of a chunk are inserted with one bulk insert for the offers, one for the
+details and one for their `offer.created` outbox events in a single
+transaction. Invalid lines are skipped and reported with
+their line number. The chunks can be spread over several worker processes
+on databases with concurrent writers, SQLite would serialize them.
+"""
+import collections
+import itertools
+import json
+import multiprocessing
+
+from django.db import connection, connections, transaction
+from rest_framework import serializers
+
+from offers.api.serializers import OfferDetailSerializer
+from events.models import record_events
+from offers.models import Offer, OfferDetail
+
+
+class OfferImportSerializer(serializers.ModelSerializer):
+    details = OfferDetailSerializer(many=True)
+
+    class Meta:
+        model = Offer
+        fields = ['title', 'description', 'details']
+
+
+def read_chunks(lines, chunk_size):
+    """
+    Groups the non-blank lines of a stream into chunks.
+
+    :param lines: An iterable of str or bytes lines, e.g. an open file.
+    :param chunk_size: The number of lines per chunk.
+    :return: An iterator of lists of (line number, line) tuples.
+    """
+    numbered = ((number, line) for number, line in enumerate(lines, 1) if line.strip())
+    while chunk := list(itertools.islice(numbered, chunk_size)):
+        yield chunk
+
+
+def validate_line(line):
+    """
+    Parses and validates one line.
+
+    :return: A tuple of the validated data and None, or None and the errors.
+    """
+    try:
+        data = json.loads(line)
+    except ValueError as exc:
+        return None, {"detail": [f"Ungültiges JSON: {exc}"]}
+    if not isinstance(data, dict):
+        return None, {"detail": ["Jede Zeile muss ein JSON-Objekt sein."]}
+    serializer = OfferImportSerializer(data=data)
+    if not serializer.is_valid():
+        return None, serializer.errors
+    return serializer.validated_data, None
+
+
+def import_chunk(chunk, user_id):
+    """
+    Validates a chunk of lines and inserts its valid offers in one
+    transaction, together with an `offer.created` event per offer, so the
+    outbox handlers see imported offers like created ones.
+
+    :param chunk: A list of (line number, line) tuples.
+    :param user_id: The id of the business user owning the offers.
+    :return: A tuple of the number of created offers and the errors of the
+             invalid lines, each `{"line": number, "errors": {...}}`.
+    """
+    offers, details, errors = [], [], []
+    for number, line in chunk:
+        data, line_errors = validate_line(line)
+        if line_errors is not None:
+            errors.append({"line": number, "errors": line_errors})
+            continue
+        details.append(data.pop('details'))
+        offers.append(Offer(user_id=user_id, **data))
+    with transaction.atomic():
+        Offer.objects.bulk_create(offers)
+        OfferDetail.objects.bulk_create([
+            OfferDetail(offer=offer, **detail)
+            for offer, offer_details in zip(offers, details) for detail in offer_details
+        ])
+        if offers:
+            record_events('offer.created', [{'id': offer.pk, 'user': user_id, 'title': offer.title} for offer in offers])
+    return len(offers), errors
+
+
+def import_chunks_in_workers(chunks, user_id, workers):
+    """
+    Imports the chunks in a pool of worker processes. At most two chunks per
+    worker are read ahead, so large files are not loaded into memory.
+
+    :return: An iterator of the results of `import_chunk`.
+    """
+    connections.close_all()
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(import_chunk, (chunk, user_id)))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def import_offers(lines, user_id, chunk_size, workers=1):
+    """
+    Imports offers from JSON Lines.
+
+    Each chunk is committed on its own, so the valid offers of earlier chunks
+    stay imported if a later chunk fails.
+
+    :param lines: An iterable of str or bytes lines, e.g. an open file.
+    :param user_id: The id of the business user owning the offers.
+    :param chunk_size: The number of lines validated and inserted together.
+    :param workers: The number of worker processes, 1 to import in this process.
+    :return: A dict with the number of created offers and the errors ordered by line.
+    :raises ValueError: If several workers are requested on SQLite.
+    """
+    if workers > 1 and connection.vendor == 'sqlite':
+        raise ValueError("SQLite allows one writer at a time, import with a single worker.")
+    chunks = read_chunks(lines, chunk_size)
+    if workers > 1:
+        results = import_chunks_in_workers(chunks, user_id, workers)
+    else:
+        results = (import_chunk(chunk, user_id) for chunk in chunks)
+    created, errors = 0, []
+    for chunk_created, chunk_errors in results:
+        created += chunk_created
+        errors += chunk_errors
+    return {"created": created, "errors": sorted(errors, key=lambda error: error["line"])}
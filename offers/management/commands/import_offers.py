@@ -0,0 +1,37 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from offers.importer import import_offers
+
+
+class Command(BaseCommand):
+    help = "Imports offers from a JSON Lines file with one POST /offers/ body per line."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="The JSON Lines file.")
+        parser.add_argument('--user', required=True, help="Username of the business user owning the offers.")
+        parser.add_argument('--chunk-size', type=int, default=settings.OFFER_IMPORT_CHUNK_SIZE)
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Worker processes validating and inserting chunks in parallel, not on SQLite.")
+
+    def handle(self, *args, **options):
+        """
+        Imports the file and writes the errors of rejected lines to stderr,
+        one JSON object per line.
+        """
+        user = User.objects.select_related('profile').filter(username=options['user']).first()
+        if user is None or getattr(user, 'profile', None) is None or user.profile.type != 'business':
+            raise CommandError(f"{options['user']} is not a business user.")
+        with open(options['path'], 'rb') as lines:
+            try:
+                result = import_offers(lines, user.pk, options['chunk_size'], options['workers'])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+        for error in result['errors']:
+            self.stderr.write(json.dumps(error, ensure_ascii=False))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} offers, rejected {len(result['errors'])} lines."
+        ))
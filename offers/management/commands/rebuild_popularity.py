@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from offers.popularity import rebuild
+from offers.tasks import schedule_decay
+
+
+class Command(BaseCommand):
+    help = "Computes the popularity of all offers from the orders and reviews and schedules its decay."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        """
+        Rebuilds the scores in one transaction and queues the decay job,
+        which then runs in `run_workers` every POPULARITY_DECAY_INTERVAL seconds.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            count = rebuild(now, options['chunk_size'])
+            schedule_decay(now)
+        self.stdout.write(f"Popularity of {count} offers rebuilt.")
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offers', '0004_alter_offerdetail_delivery_time_in_days'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='offer',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
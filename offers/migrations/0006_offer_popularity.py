@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offers', '0005_offer_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='offer',
+            name='order_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='offer',
+            name='popularity',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='offer',
+            name='score_decayed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
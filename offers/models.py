@@ -2,12 +2,21 @@ from django.db import models
 from django.contrib.auth.models import User
 
 class Offer(models.Model):
+    """
+    `order_score` and `popularity` are maintained by offers/popularity.py:
+    the time-decayed number of orders and the score of `ordering=popular`.
+    `score_decayed_at` is the time of their last decay.
+    """
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     image = models.FileField(upload_to='uploads/', null=True)
     description = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField(default=1)
+    order_score = models.FloatField(default=0)
+    popularity = models.FloatField(default=0, db_index=True)
+    score_decayed_at = models.DateTimeField(null=True, blank=True)
 
 class OfferDetail(models.Model):
     OFFER_TYPES = [
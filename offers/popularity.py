@@ -0,0 +1,116 @@
+"""
+Popularity of offers, the score of `GET /offers/?ordering=popular`.
+
+    popularity = order_score + POPULARITY_RATING_WEIGHT * seller rating
+
+`order_score` counts every order of the offer with 1 when it is placed and
+halves that every POPULARITY_HALF_LIFE seconds. The seller rating is the
+average rating of the offer's creator, pulled towards
+POPULARITY_RATING_PRIOR by POPULARITY_RATING_PRIOR_COUNT virtual reviews, so
+a single 5 star review does not outrank a long record of good ones.
+
+Both values are stored on Offer, so sorting by popularity reads one indexed
+column. They are maintained by the outbox handlers in offers/handlers.py:
+new orders add 1 to both, new offers and review changes recompute the
+popularity of the seller's offers. The task in offers/tasks.py decays the
+order scores every POPULARITY_DECAY_INTERVAL seconds. `rebuild_popularity`
+computes everything from the orders and reviews again.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count, F, Q, Sum
+
+from offers.models import Offer
+from orders.models import Order
+from reviews.models import Review
+
+
+def seller_ratings(user_ids):
+    """
+    Returns the prior-weighted average ratings of business users.
+
+    :param user_ids: The ids of the business users.
+    :return: A dictionary mapping every given id to its rating.
+    """
+    prior, prior_count = settings.POPULARITY_RATING_PRIOR, settings.POPULARITY_RATING_PRIOR_COUNT
+    ratings = {user_id: prior for user_id in user_ids}
+    rows = (Review.objects.filter(business_user_id__in=user_ids).values('business_user_id')
+            .annotate(count=Count('id'), total=Sum('rating')).order_by())
+    for row in rows:
+        ratings[row['business_user_id']] = (prior * prior_count + row['total']) / (prior_count + row['count'])
+    return ratings
+
+
+def refresh_sellers(user_ids):
+    """
+    Recomputes the popularity of all offers of the given business users from
+    their order scores and current ratings.
+    """
+    weight = settings.POPULARITY_RATING_WEIGHT
+    for user_id, rating in seller_ratings(set(user_ids)).items():
+        Offer.objects.filter(user_id=user_id).update(popularity=F('order_score') + weight * rating)
+
+
+def count_orders(order_ids):
+    """
+    Adds orders to the scores of their offers. Each order is marked with
+    `popularity_counted` and only counted once, however often its event is
+    handled.
+
+    :param order_ids: The ids of new orders.
+    """
+    uncounted = Order.objects.filter(pk__in=order_ids, popularity_counted=False)
+    counts = dict(uncounted.values_list('offer_detail_id__offer_id').annotate(count=Count('id')).order_by())
+    uncounted.update(popularity_counted=True)
+    for offer_id, count in counts.items():
+        Offer.objects.filter(pk=offer_id).update(order_score=F('order_score') + count,
+                                                 popularity=F('popularity') + count)
+
+
+def decay(previous, now):
+    """
+    Decays the order scores for the time from `previous` to `now`.
+
+    Only offers not decayed since `previous` are updated and they are marked
+    with `now`, so running the same decay twice changes nothing.
+
+    :param previous: The time of the previous decay.
+    :param now: The time of this decay.
+    :return: The number of updated offers.
+    """
+    factor = 0.5 ** ((now - previous).total_seconds() / settings.POPULARITY_HALF_LIFE)
+    return Offer.objects.filter(
+        Q(score_decayed_at__isnull=True) | Q(score_decayed_at__lte=previous), order_score__gt=0,
+    ).update(
+        order_score=F('order_score') * factor,
+        popularity=F('popularity') - F('order_score') * (1 - factor),
+        score_decayed_at=now,
+    )
+
+
+def rebuild(now, chunk_size=2000):
+    """
+    Computes the order scores and popularity of all offers from the orders
+    and reviews, and marks all orders as counted.
+
+    :param now: The time the order scores are computed for, stored as their last decay.
+    :param chunk_size: The number of offers updated per query.
+    :return: The number of offers.
+    """
+    half_life = settings.POPULARITY_HALF_LIFE
+    Order.objects.filter(popularity_counted=False).update(popularity_counted=True)
+    scores = defaultdict(float)
+    for offer_id, created_at in Order.objects.values_list('offer_detail_id__offer_id', 'created_at').iterator(chunk_size):
+        scores[offer_id] += 0.5 ** ((now - created_at).total_seconds() / half_life)
+    offers = list(Offer.objects.only('id', 'user_id'))
+    ratings = seller_ratings({offer.user_id for offer in offers})
+    weight = settings.POPULARITY_RATING_WEIGHT
+    for offer in offers:
+        offer.order_score = scores.get(offer.pk, 0.0)
+        offer.popularity = offer.order_score + weight * ratings[offer.user_id]
+        offer.score_decayed_at = now
+    Offer.objects.bulk_update(offers, ['order_score', 'popularity', 'score_decayed_at'],
+                              batch_size=chunk_size)
+    return len(offers)
+
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from jobs.models import Job
+from jobs.queue import enqueue, ensure, task
+from offers.models import Offer
+from offers.popularity import decay
+
+
+DECAY_KEY = 'offers.decay_popularity'
+
+
+@task
+def decay_popularity(previous):
+    """
+    Decays the order scores of the offers since the previous run and queues
+    the next run POPULARITY_DECAY_INTERVAL seconds later.
+
+    :param previous: The time of the previous run, ISO 8601.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        decay(parse_datetime(previous), now)
+        schedule_decay(now)
+
+
+def schedule_decay(previous):
+    """
+    Queues the next decay of the order scores, unless one is queued already.
+
+    :param previous: The time of the last decay.
+    :return: The queued Job.
+    """
+    return enqueue(decay_popularity, key=DECAY_KEY, delay=settings.POPULARITY_DECAY_INTERVAL,
+                   previous=previous.isoformat())
+
+
+@ensure
+def ensure_decay():
+    """
+    Queues the decay of the order scores unless it is queued or running,
+    continuing from the last decay of any offer.
+
+    :return: The queued Job, or None if the decay is already scheduled.
+    """
+    if Job.objects.filter(key=DECAY_KEY, status__in=('queued', 'running')).exists():
+        return None
+    previous = Offer.objects.aggregate(previous=Max('score_decayed_at'))['previous']
+    return schedule_decay(previous or timezone.now())
@@ -1,3 +1,549 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import os
+import tempfile
+import unittest
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from coderr.throttling import TokenBucketThrottle
+from coderr_auth.models import Profile
+from events.dispatcher import dispatch_batch
+from events.models import OutboxEvent
+from events.tests import file_cache, run_in_child
+from jobs.models import Job
+from offers import autocomplete
+from offers.api import async_views, views
+from offers.api.async_views import OfferDetailBatchAsyncView
+from offers.handlers import invalidate_cached_facets
+from offers.importer import import_chunks_in_workers
+from offers.models import Offer, OfferDetail
+from offers.popularity import count_orders, decay
+from orders.models import Order
+
+
+class OfferFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='business', password='secret')
+        Profile.objects.create(user=user, email='business@example.com', type='business', first_name='Jürgen')
+        cls.offer = Offer.objects.create(user=user, title='Logo', description='Sehr lange Beschreibung')
+        cls.detail = OfferDetail.objects.create(offer=cls.offer, title='Basic', revisions=2, delivery_time_in_days=5,
+                                                price=Decimal('149.90'), features=['Logo'], offer_type='basic')
+
+    def test_fields_limits_output_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().get('/coderr/api/offers/', {'fields': 'id,title,min_price'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{'id': self.offer.pk, 'title': 'Logo', 'min_price': 149.9}])
+        self.assertNotIn('description', queries.captured_queries[-1]['sql'])
+
+    def test_omit_removes_fields_and_keeps_relations_of_selected_fields(self):
+        response = APIClient().get('/coderr/api/offers/', {'omit': 'description,details'})
+        offer = response.json()['results'][0]
+        self.assertNotIn('description', offer)
+        self.assertNotIn('details', offer)
+        self.assertEqual(offer['user_details']['first_name'], 'Jürgen')
+
+    def test_detail_views_support_fieldsets(self):
+        response = APIClient().get(f'/coderr/api/offers/{self.offer.pk}/', {'fields': 'id,details'})
+        self.assertEqual(list(response.json()), ['id', 'details'])
+        response = APIClient().get(f'/coderr/api/offerdetails/{self.detail.pk}/', {'omit': 'features'})
+        self.assertNotIn('features', response.json())
+
+    def test_unknown_fields_are_rejected(self):
+        response = APIClient().get('/coderr/api/offers/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['detail'][0])
+
+
+class OfferVersionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='business', password='secret')
+        Profile.objects.create(user=cls.user, email='business@example.com', type='business')
+        cls.offer = Offer.objects.create(user=cls.user, title='Logo', description='Logo Design')
+        OfferDetail.objects.create(offer=cls.offer, title='Basic', revisions=2, delivery_time_in_days=5,
+                                   price=Decimal('149.90'), features=['Logo'], offer_type='basic')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_patch_increments_version_and_answers_from_written_data(self):
+        response = self.client.patch(f'/coderr/api/offers/{self.offer.pk}/', {'title': 'Neues Logo'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'Neues Logo')
+        self.assertEqual(response.json()['version'], 2)
+        self.assertEqual(response.json()['details'][0]['title'], 'Basic')
+        self.offer.refresh_from_db()
+        self.assertEqual((self.offer.title, self.offer.version), ('Neues Logo', 2))
+
+    def test_stale_version_is_rejected_with_conflict(self):
+        url = f'/coderr/api/offers/{self.offer.pk}/'
+        self.client.patch(url, {'title': 'Erster', 'version': 1}, format='json')
+        response = self.client.patch(url, {'title': 'Zweiter', 'version': 1}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.offer.refresh_from_db()
+        self.assertEqual(self.offer.title, 'Erster')
+
+    def test_write_after_concurrent_change_is_rejected(self):
+        url = f'/coderr/api/offers/{self.offer.pk}/'
+        response = self.client.patch(url, {'title': 'Erster'}, format='json')
+        Offer.objects.filter(pk=self.offer.pk).update(version=5)
+        response = self.client.patch(url, {'title': 'Zweiter', 'version': 2}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class OfferImageUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='business', password='secret')
+        Profile.objects.create(user=cls.user, email='business@example.com', type='business')
+        cls.offer = Offer.objects.create(user=cls.user, title='Logo', description='Logo Design')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, image, **data):
+        return self.client.patch(f'/coderr/api/offers/{self.offer.pk}/', {'image': image, **data}, format='multipart')
+
+    def test_jpeg_is_stored_next_to_the_other_fields(self):
+        response = self.upload(SimpleUploadedFile('logo.jpg', b'\xff\xd8\xff\xe0' + b'0' * 100), title='Neues Logo')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.offer.refresh_from_db()
+        self.assertEqual(self.offer.title, 'Neues Logo')
+        self.assertTrue(self.offer.image.name.endswith('.jpg'))
+
+    def test_non_images_are_rejected_before_the_offer_is_changed(self):
+        response = self.upload(SimpleUploadedFile('logo.jpg', b'<?php echo 1; ?>'), title='Neues Logo')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image: Die Datei ist kein gültiges Bild.', response.json()['detail'])
+        self.offer.refresh_from_db()
+        self.assertEqual(self.offer.title, 'Logo')
+        self.assertFalse(self.offer.image)
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZES={'image': 1024})
+    def test_size_limit_is_checked_per_field(self):
+        response = self.upload(SimpleUploadedFile('logo.gif', b'GIF89a' + b'0' * 1024))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image: Die Datei ist zu groß.', response.json()['detail'])
+
+
+def offer_line(title, price=Decimal('100')):
+    return json.dumps({
+        'title': title, 'description': f'{title} Beschreibung',
+        'details': [{'title': f'{title} {offer_type}', 'revisions': 1, 'delivery_time_in_days': 3, 'price': str(price),
+                     'features': ['Design'], 'offer_type': offer_type} for offer_type in ('basic', 'standard', 'premium')],
+    })
+
+
+def count_chunk(chunk, user_id):
+    return len(chunk), [{"line": number, "user": user_id} for number, line in chunk]
+
+
+class OfferImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='agentur', password='secret')
+        Profile.objects.create(user=cls.user, email='agentur@example.com', type='business')
+
+    def lines(self):
+        return '\n'.join([offer_line('Logo'), '{kaputt', '', offer_line('Website', price=0), offer_line('Shop')]) + '\n'
+
+    def test_endpoint_imports_valid_lines_and_reports_invalid_ones(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.settings(OFFER_IMPORT_CHUNK_SIZE=2), CaptureQueriesContext(connection) as queries:
+            response = client.post('/coderr/api/offers/import/',
+                                   {'offers': SimpleUploadedFile('offers.jsonl', self.lines().encode())}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual([error['line'] for error in response.json()['errors']], [2, 4])
+        self.assertIn('price', response.json()['errors'][1]['errors']['details'][0])
+        self.assertEqual(list(Offer.objects.order_by('pk').values_list('title', flat=True)), ['Logo', 'Shop'])
+        self.assertEqual(OfferDetail.objects.filter(offer__user=self.user).count(), 6)
+        inserts = [query for query in queries.captured_queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 6)
+        events = OutboxEvent.objects.filter(kind='offer.created').order_by('pk')
+        self.assertEqual([event.payload['title'] for event in events], ['Logo', 'Shop'])
+        self.assertEqual({event.payload['user'] for event in events}, {self.user.pk})
+
+    def test_command_imports_file(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as source:
+            source.write(self.lines())
+            source.flush()
+            stdout, stderr = io.StringIO(), io.StringIO()
+            call_command('import_offers', source.name, user='agentur', stdout=stdout, stderr=stderr)
+        self.assertIn('Imported 2 offers, rejected 2 lines.', stdout.getvalue())
+        self.assertEqual(json.loads(stderr.getvalue().splitlines()[0])['line'], 2)
+
+    def test_workers_return_the_chunk_results_in_order_and_read_ahead_two_chunks_each(self):
+        read = []
+
+        def chunks():
+            for number in range(1, 11):
+                read.append(number)
+                yield [(number, offer_line('Logo'))]
+
+        with mock.patch('offers.importer.import_chunk', count_chunk):
+            results = import_chunks_in_workers(chunks(), self.user.pk, 2)
+            first = next(results)
+            self.assertEqual(len(read), 4)
+            results = [first, *results]
+        self.assertEqual(results, [(1, [{"line": number, "user": self.user.pk}]) for number in range(1, 11)])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', "SQLite only")
+    def test_command_rejects_workers_on_sqlite(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as source:
+            source.write(self.lines())
+            source.flush()
+            with self.assertRaisesMessage(CommandError, 'single worker'):
+                call_command('import_offers', source.name, user='agentur', workers=2, stdout=io.StringIO())
+        self.assertFalse(Offer.objects.exists())
+
+
+@unittest.skipIf(connection.vendor == 'sqlite', "SQLite has a single writer")
+class OfferParallelImportTests(TransactionTestCase):
+    def test_command_imports_chunks_in_two_workers(self):
+        user = User.objects.create_user(username='agentur', password='secret')
+        Profile.objects.create(user=user, email='agentur@example.com', type='business')
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as source:
+            source.write('\n'.join([offer_line(f'Angebot {number}') for number in range(9)] + ['{kaputt']) + '\n')
+            source.flush()
+            stdout, stderr = io.StringIO(), io.StringIO()
+            call_command('import_offers', source.name, user='agentur', workers=2, chunk_size=2,
+                         stdout=stdout, stderr=stderr)
+        self.assertIn('Imported 9 offers, rejected 1 lines.', stdout.getvalue())
+        self.assertEqual(json.loads(stderr.getvalue())['line'], 10)
+        self.assertEqual(OfferDetail.objects.count(), 27)
+        self.assertEqual(OutboxEvent.objects.filter(kind='offer.created').count(), 9)
+
+
+@override_settings(OFFER_FACET_PRICE_EDGES=[100, 500], OFFER_FACET_DELIVERY_EDGES=[3, 7])
+class OfferFacetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.anna = User.objects.create_user(username='anna', password='secret')
+        cls.bernd = User.objects.create_user(username='bernd', password='secret')
+        for user in (cls.anna, cls.bernd):
+            Profile.objects.create(user=user, email=f'{user.username}@example.com', type='business')
+        for user, title, prices, delivery in [(cls.anna, 'Logo', [80, 300], 2), (cls.anna, 'Website', [600], 10),
+                                              (cls.bernd, 'Flyer', [120, 90], 5), (cls.bernd, 'Entwurf', [], 0)]:
+            offer = Offer.objects.create(user=user, title=title, description=title)
+            for price in prices:
+                OfferDetail.objects.create(offer=offer, title='Basic', revisions=1, delivery_time_in_days=delivery,
+                                           price=Decimal(price), features=[], offer_type='basic')
+
+    def setUp(self):
+        self.enterContext(self.settings(CACHES=file_cache(self.enterContext(tempfile.TemporaryDirectory()))))
+
+    def facets(self, **params):
+        return APIClient().get('/coderr/api/offers/', {'facets': 'price,delivery_time,creator', **params})
+
+    def test_counts_buckets_of_the_filtered_offers(self):
+        response = self.facets(page_size=1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+        facets = response.json()['facets']
+        self.assertEqual(facets['price'], [{'min': 0, 'max': 100, 'count': 2}, {'min': 100, 'max': 500, 'count': 0},
+                                           {'min': 500, 'max': None, 'count': 1}])
+        self.assertEqual([bucket['count'] for bucket in facets['delivery_time']], [1, 1, 1])
+        self.assertEqual(facets['creator'], [{'user': self.anna.pk, 'username': 'anna', 'count': 2},
+                                             {'user': self.bernd.pk, 'username': 'bernd', 'count': 2}])
+        filtered = self.facets(min_price=100).json()['facets']
+        self.assertEqual([bucket['count'] for bucket in filtered['price']], [0, 0, 1])
+        self.assertEqual(filtered['creator'], [{'user': self.anna.pk, 'username': 'anna', 'count': 1}])
+
+    def test_facets_are_cached_per_filter_signature_until_offers_change(self):
+        self.facets()
+        with CaptureQueriesContext(connection) as queries:
+            self.facets()
+        self.assertFalse([query for query in queries.captured_queries if 'FILTER' in query['sql']])
+        Offer.objects.filter(title='Website').delete()
+        self.assertEqual(self.facets().json()['facets']['price'][2]['count'], 1)
+        invalidate_cached_facets([])
+        self.assertEqual(self.facets().json()['facets']['price'][2]['count'], 0)
+
+    def test_dispatcher_process_invalidates_the_facets_of_the_web_workers(self):
+        self.assertEqual(self.facets().json()['facets']['price'][2]['count'], 1)
+        Offer.objects.filter(title='Website').delete()
+        run_in_child(lambda: invalidate_cached_facets([]))
+        self.assertEqual(self.facets().json()['facets']['price'][2]['count'], 0)
+
+    def test_unknown_facet_is_rejected(self):
+        response = APIClient().get('/coderr/api/offers/', {'facets': 'price,farbe'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('farbe', response.json()['detail'][0])
+
+
+@override_settings(POPULARITY_HALF_LIFE=3600, POPULARITY_RATING_WEIGHT=1.0, POPULARITY_RATING_PRIOR=3.0,
+                   POPULARITY_RATING_PRIOR_COUNT=5)
+class OfferPopularityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = User.objects.create_user(username='business', password='secret')
+        cls.customer = User.objects.create_user(username='customer', password='secret')
+        Profile.objects.create(user=cls.business, email='business@example.com', type='business')
+        Profile.objects.create(user=cls.customer, email='customer@example.com', type='customer')
+        cls.logo, cls.flyer = [Offer.objects.create(user=cls.business, title=title, description=title)
+                               for title in ('Logo', 'Flyer')]
+        cls.details = {offer.pk: OfferDetail.objects.create(offer=offer, title='Basic', revisions=1, delivery_time_in_days=3,
+                                                            price=Decimal('100'), features=[], offer_type='basic')
+                       for offer in (cls.logo, cls.flyer)}
+
+    def order(self, offer):
+        return Order.objects.create(offer_detail_id=self.details[offer.pk], customer_user=self.customer.pk,
+                                    business_user=self.business)
+
+    def test_orders_are_counted_once_and_rank_the_offers(self):
+        orders = [self.order(self.flyer), self.order(self.flyer), self.order(self.logo)]
+        while dispatch_batch():
+            pass
+        count_orders([order.pk for order in orders])
+        self.flyer.refresh_from_db()
+        self.assertEqual((self.flyer.order_score, self.flyer.popularity), (2, 2))
+        response = APIClient().get('/coderr/api/offers/', {'ordering': '-popular'})
+        self.assertEqual([offer['id'] for offer in response.json()['results']], [self.flyer.pk, self.logo.pk])
+
+    def test_reviews_change_the_popularity_of_the_seller_offers(self):
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        response = client.post('/coderr/api/reviews/', {'business_user': self.business.pk, 'rating': 5,
+                                                        'description': 'Sehr gut'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        while dispatch_batch():
+            pass
+        self.logo.refresh_from_db()
+        self.assertAlmostEqual(self.logo.popularity, (3.0 * 5 + 5) / 6)
+        client.delete(f'/coderr/api/reviews/{response.json()["id"]}/')
+        while dispatch_batch():
+            pass
+        self.logo.refresh_from_db()
+        self.assertAlmostEqual(self.logo.popularity, 3.0)
+
+    def test_decay_halves_the_order_scores_once_per_interval(self):
+        start = timezone.now()
+        Offer.objects.filter(pk=self.logo.pk).update(order_score=4, popularity=7, score_decayed_at=start)
+        later = start + datetime.timedelta(hours=1)
+        self.assertEqual(decay(start, later), 1)
+        self.assertEqual(decay(start, later), 0)
+        self.logo.refresh_from_db()
+        self.assertAlmostEqual(self.logo.order_score, 2)
+        self.assertAlmostEqual(self.logo.popularity, 5)
+
+    def test_rebuild_computes_the_scores_and_schedules_the_decay(self):
+        self.order(self.flyer)
+        call_command('rebuild_popularity', stdout=io.StringIO())
+        self.flyer.refresh_from_db()
+        self.assertAlmostEqual(self.flyer.order_score, 1, places=3)
+        self.assertAlmostEqual(self.flyer.popularity, 4, places=3)
+        self.assertFalse(Order.objects.filter(popularity_counted=False).exists())
+        job = Job.objects.get(key='offers.decay_popularity')
+        self.assertEqual(job.kwargs, {'previous': self.flyer.score_decayed_at.isoformat()})
+
+    def test_workers_queue_the_decay_when_none_is_scheduled(self):
+        decayed_at = timezone.now() - datetime.timedelta(hours=2)
+        Offer.objects.filter(pk=self.logo.pk).update(score_decayed_at=decayed_at)
+        call_command('run_workers', '--burst', stdout=io.StringIO())
+        job = Job.objects.get(key='offers.decay_popularity')
+        self.assertEqual(job.kwargs, {'previous': decayed_at.isoformat()})
+        call_command('run_workers', '--burst', stdout=io.StringIO())
+        self.assertEqual(Job.objects.filter(key='offers.decay_popularity').count(), 1)
+        Job.objects.filter(pk=job.pk).update(status='failed')
+        call_command('run_workers', '--burst', stdout=io.StringIO())
+        self.assertEqual(Job.objects.filter(key='offers.decay_popularity', status='queued').count(), 1)
+
+
+@override_settings(AUTOCOMPLETE_REFRESH_INTERVAL=0)
+class OfferAutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = User.objects.create_user(username='jürgen', password='secret')
+        Profile.objects.create(user=cls.business, email='juergen@example.com', type='business')
+        customer = User.objects.create_user(username='julia', password='secret')
+        Profile.objects.create(user=customer, email='julia@example.com', type='customer')
+        cls.logo = Offer.objects.create(user=cls.business, title='Logo Design', description='Logo')
+        cls.website = Offer.objects.create(user=cls.business, title='Website Design', description='Website')
+
+    def setUp(self):
+        autocomplete._index = None
+
+    def suggest(self, query):
+        response = APIClient().get('/coderr/api/offers/autocomplete/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [(result['type'], result['label']) for result in response.json()['results']]
+
+    def test_matches_word_prefixes_from_memory(self):
+        self.assertEqual(self.suggest('ju'), [('business', 'jürgen')])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest(' DES'), [('offer', 'Logo Design'), ('offer', 'Website Design')])
+        self.assertEqual(self.suggest('logo d'), [('offer', 'Logo Design')])
+        self.assertEqual(self.suggest(''), [])
+
+    def test_sync_applies_offer_and_profile_events(self):
+        index = autocomplete.get_index()
+        client = APIClient()
+        client.force_authenticate(self.business)
+        client.patch(f'/coderr/api/offers/{self.logo.pk}/', {'title': 'Visitenkarten'}, format='json')
+        client.delete(f'/coderr/api/offers/{self.website.pk}/')
+        profile = Profile.objects.get(user=self.business)
+        profile.type = 'customer'
+        profile.save()
+        index.sync()
+        index.sync()
+        self.assertEqual(self.suggest('de'), [])
+        self.assertEqual(self.suggest('ju'), [])
+        self.assertEqual(self.suggest('visit'), [('offer', 'Visitenkarten')])
+        self.assertEqual(len(index.entries), 1)
+
+    def test_index_is_bounded(self):
+        index = autocomplete.PrefixIndex(max_entries=3)
+        index.build()
+        self.assertLessEqual(len(index.entries), 3)
+        index.put('offer', 99, 'Flyer Druck Service')
+        self.assertNotIn(('offer', 99), index.labels)
+
+
+class OfferDetailBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='business', password='secret')
+        Profile.objects.create(user=user, email='business@example.com', type='business')
+        cls.offers = [Offer.objects.create(user=user, title=title, description=title) for title in ('Logo', 'Flyer')]
+        cls.details = [OfferDetail.objects.create(offer=offer, title=offer_type, revisions=1, delivery_time_in_days=3,
+                                                  price=Decimal('100'), features=['Logo'], offer_type=offer_type)
+                       for offer in cls.offers for offer_type in ('basic', 'premium')]
+
+    def test_returns_details_in_requested_order_with_one_query(self):
+        ids = [self.details[2].pk, self.details[0].pk, 9999, self.details[2].pk]
+        with self.assertNumQueries(1):
+            response = APIClient().get('/coderr/api/offerdetails/', {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([detail['id'] for detail in response.json()], [self.details[2].pk, self.details[0].pk])
+        single = APIClient().get(f'/coderr/api/offerdetails/{self.details[0].pk}/').json()
+        self.assertEqual(response.json()[1], single)
+        sparse = APIClient().get('/coderr/api/offerdetails/', {'ids': self.details[1].pk, 'fields': 'id,price'})
+        self.assertEqual(sparse.json(), [{'id': self.details[1].pk, 'price': '100.00'}])
+
+    def test_invalid_ids_are_rejected(self):
+        for ids in ['', '1,zwei', ','.join(map(str, range(101)))]:
+            response = APIClient().get('/coderr/api/offerdetails/', {'ids': ids})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('ids', response.json()['detail'][0])
+
+    async def test_async_view_matches_sync_view(self):
+        ids = f'{self.details[3].pk},{self.details[1].pk}'
+        request = AsyncRequestFactory().get('/coderr/api/offerdetails/', {'ids': ids})
+        response = await OfferDetailBatchAsyncView.as_view()(request)
+        self.assertEqual(json.loads(response.content), [
+            {'title': 'premium', 'revisions': 1, 'delivery_time_in_days': 3, 'price': '100.00', 'features': ['Logo'],
+             'offer_type': 'premium', 'id': pk} for pk in (self.details[3].pk, self.details[1].pk)])
+
+    def test_expand_inlines_details_in_offer_list_without_extra_queries(self):
+        with CaptureQueriesContext(connection) as linked:
+            plain = APIClient().get('/coderr/api/offers/')
+        with CaptureQueriesContext(connection) as inlined:
+            expanded = APIClient().get('/coderr/api/offers/', {'expand': 'details'})
+        self.assertEqual(len(inlined), len(linked))
+        self.assertIn('url', plain.json()['results'][0]['details'][0])
+        details = {detail['id']: detail for offer in expanded.json()['results'] for detail in offer['details']}
+        self.assertEqual(set(details), {detail.pk for detail in self.details})
+        self.assertEqual(details[self.details[0].pk]['offer_type'], 'basic')
+        self.assertEqual(APIClient().get('/coderr/api/offers/', {'expand': 'reviews'}).status_code, 400)
+
+
+class OfferAsyncParityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owners = []
+        for name in ('logo_studio', 'druckerei'):
+            user = User.objects.create_user(username=name, password='secret')
+            Profile.objects.create(user=user, email=f'{name}@example.com', type='business', first_name=name.title())
+            cls.owners.append(user)
+        cls.details = []
+        for index in range(8):
+            offer = Offer.objects.create(user=cls.owners[index % 2], title=f'Angebot {index}',
+                                         description='Logo' if index % 3 else 'Flyer', popularity=index % 4)
+            cls.details += [OfferDetail.objects.create(
+                offer=offer, title=offer_type, revisions=1, delivery_time_in_days=2 + index + days,
+                price=Decimal(50 * (index + 1) + 10 * days), features=['Logo'], offer_type=offer_type,
+            ) for days, offer_type in enumerate(('basic', 'standard', 'premium'))]
+
+    async def assert_same_response(self, sync_view, async_view, path, params=None, headers=None, **kwargs):
+        sync_response = await sync_to_async(
+            lambda: sync_view(RequestFactory().get(path, params, headers=headers), **kwargs).render())()
+        await cache.aclear()
+        async_response = await async_view(AsyncRequestFactory().get(path, params, headers=headers), **kwargs)
+        self.assertEqual(async_response.status_code, sync_response.status_code, params)
+        self.assertEqual(async_response['Content-Type'], sync_response['Content-Type'])
+        self.assertEqual(async_response.get('WWW-Authenticate'), sync_response.get('WWW-Authenticate'))
+        self.assertEqual(async_response.content, sync_response.content, params)
+        return sync_response
+
+    async def test_offer_list_matches_for_pagination_and_filters(self):
+        owner, statuses = self.owners[0].pk, []
+        for params in [
+            {}, {'page': 2}, {'page_size': 3, 'page': 3}, {'page': 9}, {'page_size': 'viele'},
+            {'creator_id': owner}, {'user': owner}, {'user': 9999}, {'min_price': 200}, {'max_delivery_time': 4},
+            {'search': 'flyer'}, {'ordering': 'min_price'}, {'ordering': '-popular', 'page_size': 4},
+            {'fields': 'id,title,min_price'}, {'expand': 'details'}, {'facets': 'price,creator', 'min_price': 100},
+            {'facets': 'farbe'},
+        ]:
+            response = await self.assert_same_response(
+                views.OfferListAPIView.as_view(), async_views.OfferListAsyncView.as_view(), '/coderr/api/offers/', params)
+            statuses.append(response.status_code)
+        self.assertEqual(statuses.count(200), 14)
+
+    async def test_offer_detail_and_batch_match(self):
+        detail = self.details[4].pk
+        for pk, params in [(detail, None), (detail, {'fields': 'id,price,features'}), (9999, None)]:
+            await self.assert_same_response(
+                views.OfferDetailDetailsAPIView.as_view(), async_views.OfferDetailDetailsAsyncView.as_view(),
+                f'/coderr/api/offerdetails/{pk}/', params, pk=pk)
+        for params in [{'ids': f'{detail},{self.details[0].pk},9999'}, {'ids': detail, 'fields': 'title'}, {'ids': 'x'}]:
+            await self.assert_same_response(
+                views.OfferDetailBatchAPIView.as_view(), async_views.OfferDetailBatchAsyncView.as_view(),
+                '/coderr/api/offerdetails/', params)
+
+    async def test_bad_token_is_rejected_like_the_sync_views(self):
+        detail = self.details[4].pk
+        for sync_view, async_view, path, params, kwargs in [
+            (views.OfferListAPIView, async_views.OfferListAsyncView, '/coderr/api/offers/', None, {}),
+            (views.OfferDetailDetailsAPIView, async_views.OfferDetailDetailsAsyncView,
+             f'/coderr/api/offerdetails/{detail}/', None, {'pk': detail}),
+            (views.OfferDetailBatchAPIView, async_views.OfferDetailBatchAsyncView,
+             '/coderr/api/offerdetails/', {'ids': detail}, {}),
+        ]:
+            response = await self.assert_same_response(sync_view.as_view(), async_view.as_view(), path, params,
+                                                       headers={'Authorization': 'Token falsch'}, **kwargs)
+            self.assertEqual(response.status_code, 401)
+
+    @override_settings(THROTTLE_FILE=os.path.join(tempfile.mkdtemp(), 'throttle.db'),
+                       THROTTLE_SCOPES={'offer-list': {'rate': '1/min', 'keys': ['ip']}})
+    async def test_throttled_clients_are_rejected_like_the_sync_view(self):
+        with mock.patch.multiple(views.OfferListAPIView, throttle_classes=[TokenBucketThrottle],
+                                 throttle_scope='offer-list', create=True):
+            sync_view, async_view = views.OfferListAPIView.as_view(), async_views.OfferListAsyncView.as_view()
+            sync_responses = [await sync_to_async(lambda: sync_view(
+                RequestFactory().get('/coderr/api/offers/', REMOTE_ADDR='10.0.0.1')).render())() for _ in range(2)]
+            async_responses = [await async_view(AsyncRequestFactory().get('/coderr/api/offers/', REMOTE_ADDR='10.0.0.2'))
+                               for _ in range(2)]
+        self.assertEqual([response.status_code for response in sync_responses], [200, 429])
+        self.assertEqual([response.status_code for response in async_responses], [200, 429])
+        self.assertEqual(async_responses[1].content, sync_responses[1].content)
+        self.assertEqual(async_responses[1]['Retry-After'], sync_responses[1]['Retry-After'])
@@ -0,0 +1,39 @@
+from django.contrib.auth.models import User
+from rest_framework.exceptions import NotFound
+from coderr.async_views import AsyncReadAPIView
+from orders.api.views import OrdersBusinessCompletedCountAPIView, OrdersBusinessUncompletedCountAPIView
+from orders.models import Order
+
+
+async def acount_business_orders(pk, order_status):
+    """
+    Counts the orders of a business user with the given status.
+
+    :param pk: The primary key of the business user.
+    :param order_status: The order status to count.
+    :return: The number of matching orders.
+    :raises NotFound: If the business user does not exist.
+    """
+    if not await User.objects.filter(pk=pk).aexists():
+        raise NotFound({"detail": ["Diesen Business User gibt es nicht."]})
+    return await Order.objects.filter(business_user_id=pk, status=order_status).acount()
+
+
+class OrdersBusinessUncompletedCountAsyncView(AsyncReadAPIView):
+    sync_view_class = OrdersBusinessUncompletedCountAPIView
+
+    async def get_data(self, request, pk):
+        """
+        Async variant of `OrdersBusinessUncompletedCountAPIView.get`.
+        """
+        return {"order_count": await acount_business_orders(pk, 'in_progress')}
+
+
+class OrdersBusinessCompletedCountAsyncView(AsyncReadAPIView):
+    sync_view_class = OrdersBusinessCompletedCountAPIView
+
+    async def get_data(self, request, pk):
+        """
+        Async variant of `OrdersBusinessCompletedCountAPIView.get`.
+        """
+        return {"completed_order_count": await acount_business_orders(pk, 'completed')}
@@ -1,14 +1,27 @@
 from rest_framework import serializers
+from coderr.fieldsets import FieldsetSerializerMixin
+from coderr.instrumentation import TimedSerializerMixin
+from coderr.values_serializers import ValuesListSerializer
 from orders.models import Order
 
 
-class OrdersListSerializer(serializers.ModelSerializer):
+class OrdersListSerializer(TimedSerializerMixin, FieldsetSerializerMixin, serializers.ModelSerializer):
   class Meta:
     model = Order
-    exclude = ['offer_detail_id']
+    fields = [
+      'id', 'customer_user', 'business_user', 'status', 'created_at', 'updated_at',
+      'title', 'revisions', 'delivery_time_in_days', 'price', 'features', 'offer_type',
+    ]
 
 
-class OrdersPostSerializer(serializers.ModelSerializer):
+class OrdersListValuesSerializer(ValuesListSerializer):
+  """
+  Read path of the order list, same output as OrdersListSerializer.
+  """
+  serializer_class = OrdersListSerializer
+
+
+class OrdersPostSerializer(TimedSerializerMixin, serializers.ModelSerializer):
   class Meta:
     model = Order
     fields = ['offer_detail_id']
@@ -1,11 +1,14 @@
-from django.urls import path
-from . import views
+from django.urls import path, re_path
+from coderr.async_views import read_split
+from . import views, async_views
 
 
 urlpatterns = [
     path('orders/', views.OrdersListAPIView.as_view()),
+    re_path(r'^orders/export\.(?P<export_format>csv|jsonl)$', views.OrdersExportAPIView.as_view(), name='orders-export'),
     path('orders/<int:pk>/', views.SingleOrderAPIView.as_view()),
-    path('order-count/<int:pk>/', views.OrdersBusinessUncompletedCountAPIView.as_view()),
-    path('completed-order-count/<int:pk>/', views.OrdersBusinessCompletedCountAPIView.as_view()),
+    path('order-count/<int:pk>/', read_split(views.OrdersBusinessUncompletedCountAPIView.as_view(), async_views.OrdersBusinessUncompletedCountAsyncView.as_view())),
+    path('completed-order-count/<int:pk>/', read_split(views.OrdersBusinessCompletedCountAPIView.as_view(), async_views.OrdersBusinessCompletedCountAsyncView.as_view())),
+    path('order-throughput/<int:pk>/', views.OrdersBusinessThroughputAPIView.as_view()),
 
 ]
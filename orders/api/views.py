@@ -1,17 +1,29 @@
 from rest_framework.views import APIView
-from orders.models import Order
-from .serializers import OrdersListSerializer, OrdersPostSerializer, OrderPatchSerializer
+from orders.models import Order, OrderStatusChange
+from .serializers import OrdersListSerializer, OrdersListValuesSerializer, OrdersPostSerializer, OrderPatchSerializer
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.exceptions import PermissionDenied
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User
-from django.db.models import Q
+from datetime import timedelta
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q
+from django.db.models.functions import TruncDate
+from django.utils.timezone import now
+from coderr.exports import ExportViewMixin, filter_choices, filter_created
+from coderr.fieldsets import FieldsetViewMixin, fieldset_columns
+from coderr.throttling import TokenBucketThrottle
+from idempotency.decorators import idempotent
 
 
-class OrdersListAPIView(APIView):
+class OrdersListAPIView(FieldsetViewMixin, APIView):
     permission_classes = [IsAuthenticated]
     pagination_class = None
+    fieldset_serializer_class = OrdersListSerializer
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'order-create'
+    throttle_methods = ['POST']
 
     def get(self, request, format=None):
         """
@@ -24,9 +36,10 @@ class OrdersListAPIView(APIView):
         else:
             orders = Order.objects.none()
 
-        serializer = OrdersListSerializer(orders, many=True)
+        serializer = OrdersListValuesSerializer(orders, fieldset=self.get_fieldset())
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @idempotent
     def post(self, request, format=None):
         """
         Creates a new order for the current user.
@@ -35,6 +48,7 @@ class OrdersListAPIView(APIView):
         request data. If the data is valid, it creates a new order in the database
         and returns the serialized data with an HTTP 201 status code.
         If the data is invalid, it returns the serializer errors with a 400 HTTP status code.
+        Retries with the same Idempotency-Key header get the first response again.
 
         :param request: The HTTP request object.
         :return: A Response object containing the serialized order data with an HTTP 201 status code
@@ -49,8 +63,33 @@ class OrdersListAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class SingleOrderAPIView(APIView):
+class OrdersExportAPIView(ExportViewMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    fieldset_serializer_class = OrdersListSerializer
+    values_serializer_class = OrdersListValuesSerializer
+    export_filename = 'orders'
+
+    def get_export_queryset(self):
+        """
+        Returns the orders of the current business user for the export.
+
+        The orders can be limited with `created_from` and `created_to` (date
+        or datetime, inclusive) and `status` (comma separated).
+
+        :return: The filtered orders, ordered by id.
+        :raises PermissionDenied: If the user has no business profile.
+        """
+        profile = getattr(self.request.user, 'profile', None)
+        if profile is None or profile.type != 'business':
+            raise PermissionDenied({"detail": ["Nur Unternehmen können ihre Aufträge exportieren."]})
+        orders = Order.objects.filter(business_user=self.request.user).order_by('pk')
+        orders = filter_created(orders, self.request.query_params)
+        return filter_choices(orders, self.request.query_params, 'status', Order.STATUS_CHOICES)
+
+
+class SingleOrderAPIView(FieldsetViewMixin, APIView):
     permission_classes = [IsAuthenticatedOrReadOnly]
+    fieldset_serializer_class = OrdersListSerializer
 
     def get(self, request, pk, format=None):
         """
@@ -58,14 +97,19 @@ class SingleOrderAPIView(APIView):
 
         This method fetches the order from the database and serializes the data
         using `OrdersListSerializer`. It then returns the serialized data with
-        an HTTP 200 status code.
+        an HTTP 200 status code. The `fields` and `omit` query parameters limit
+        the loaded columns and the returned fields.
 
         :param request: The HTTP request object.
         :param pk: The primary key of the order to retrieve.
         :return: A Response object containing the serialized order data with an HTTP 200 status code.
         """
-        order = Order.objects.get(pk=pk)
-        serializer = OrdersListSerializer(order)
+        fieldset = self.get_fieldset()
+        orders = Order.objects.all()
+        if fieldset is not None:
+            orders = orders.only(*fieldset_columns(OrdersListSerializer, fieldset))
+        order = orders.get(pk=pk)
+        serializer = OrdersListSerializer(order, context={'fieldset': fieldset})
         return Response(serializer.data)
 
     def patch(self, request, pk, format=None):
@@ -168,3 +212,43 @@ class OrdersBusinessCompletedCountAPIView(APIView):
             return Response({"detail": ["Diesen Business User gibt es nicht."]}, status=status.HTTP_404_NOT_FOUND)
         orders = Order.objects.filter(business_user=business_user, status='completed')
         return Response({"completed_order_count": orders.count()})
+
+
+class OrdersBusinessThroughputAPIView(APIView):
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get(self, request, pk, format=None):
+        """
+        Retrieves the order throughput of a business user over the last `days` days (default 30, at most 365).
+
+        The numbers are computed from the order status history through its
+        (business_user, changed_at) index: the completed orders per day and in
+        total, and the mean time from creating an order to completing it.
+
+        :param request: The HTTP request object.
+        :param pk: The primary key of the business user.
+        :return: A Response object with the throughput with an HTTP 200 status code,
+                a 400 response for an invalid `days` parameter, or a 404 Not Found
+                response if the business user does not exist.
+        """
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            days = 0
+        if not 1 <= days <= 365:
+            return Response({"detail": ["days muss eine ganze Zahl zwischen 1 und 365 sein."]}, status=status.HTTP_400_BAD_REQUEST)
+        if not User.objects.filter(pk=pk).exists():
+            return Response({"detail": ["Diesen Business User gibt es nicht."]}, status=status.HTTP_404_NOT_FOUND)
+        completed = OrderStatusChange.objects.filter(business_user_id=pk, changed_at__gte=now() - timedelta(days=days),
+                                                     to_status='completed')
+        per_day = completed.annotate(date=TruncDate('changed_at')).values('date').annotate(completed=Count('pk')).order_by('date')
+        duration = ExpressionWrapper(F('changed_at') - F('order__created_at'), output_field=DurationField())
+        mean = completed.aggregate(mean=Avg(duration))['mean']
+        per_day = [{"date": row['date'].isoformat(), "completed": row['completed']} for row in per_day]
+        return Response({
+            "business_user": pk,
+            "days": days,
+            "completed": sum(row['completed'] for row in per_day),
+            "completed_per_day": per_day,
+            "mean_time_to_completion_hours": round(mean.total_seconds() / 3600, 2) if mean is not None else None,
+        })
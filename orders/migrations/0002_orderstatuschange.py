@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customer_user', models.IntegerField(default=0)),
+                ('from_status', models.CharField(blank=True, max_length=20)),
+                ('to_status', models.CharField(choices=[('cancelled', 'Cancelled'), ('in_progress', 'In Progress'), ('completed', 'Completed')], max_length=20)),
+                ('changed_at', models.DateTimeField()),
+                ('business_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_status_changes', to=settings.AUTH_USER_MODEL)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='orders.order')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['business_user', 'changed_at'], name='order_status_business_time')],
+            },
+        ),
+    ]
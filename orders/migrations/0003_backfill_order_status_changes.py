@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def backfill(apps, schema_editor):
+    """
+    Creates the history of existing orders: the creation at `created_at` and,
+    for orders no longer in progress, the last change at `updated_at`.
+    """
+    Order = apps.get_model('orders', 'Order')
+    OrderStatusChange = apps.get_model('orders', 'OrderStatusChange')
+    changes = []
+    columns = ('pk', 'business_user_id', 'customer_user', 'status', 'created_at', 'updated_at')
+    for pk, business_user_id, customer_user, status, created_at, updated_at in (
+            Order.objects.values_list(*columns).iterator(chunk_size=2000)):
+        common = {'order_id': pk, 'business_user_id': business_user_id, 'customer_user': customer_user}
+        changes.append(OrderStatusChange(from_status='', to_status='in_progress', changed_at=created_at, **common))
+        if status != 'in_progress':
+            changes.append(OrderStatusChange(from_status='in_progress', to_status=status, changed_at=updated_at, **common))
+        if len(changes) >= 2000:
+            OrderStatusChange.objects.bulk_create(changes)
+            changes = []
+    OrderStatusChange.objects.bulk_create(changes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_orderstatuschange'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
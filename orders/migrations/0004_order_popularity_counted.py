@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_backfill_order_status_changes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='popularity_counted',
+            field=models.BooleanField(default=False),
+        ),
+    ]
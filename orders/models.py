@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.utils.timezone import now
 from django.contrib.auth.models import User 
+from events.models import record_event
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -33,11 +34,23 @@ class Order(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     features = models.JSONField(null=True, blank=True)
     offer_type = models.CharField(max_length=50, blank=True)
+    popularity_counted = models.BooleanField(default=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Remembers the loaded status, so `save` can tell whether it changed.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._saved_status = instance.__dict__.get('status')
+        return instance
 
     def save(self, *args, **kwargs):
         """
         Saves the current instance. Overwrites the business_user with the user of the associated Offer if not set.
         Copies the title, revisions, delivery_time_in_days, price and features from the associated OfferDetail if not set.
+        A new order and every change of a loaded status are appended to the status history and the event outbox
+        in the same transaction.
         """
         if not self.business_user_id and self.offer_detail_id:
             self.business_user = self.offer_detail_id.offer.user
@@ -49,7 +62,23 @@ class Order(models.Model):
             self.price = self.price or self.offer_detail_id.price
             self.features = self.features or self.offer_detail_id.features
             self.offer_type = self.offer_type or self.offer_detail_id.offer_type
-        super().save(*args, **kwargs)
+        previous_status = None if self._state.adding else getattr(self, '_saved_status', None)
+        status_changed = self._state.adding or (previous_status is not None and previous_status != self.status)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if status_changed:
+                OrderStatusChange.objects.create(
+                    order=self, business_user_id=self.business_user_id, customer_user=self.customer_user,
+                    from_status=previous_status or '', to_status=self.status, changed_at=self.updated_at,
+                )
+                record_event(
+                    'order.status_changed' if previous_status else 'order.created',
+                    {'id': self.pk, 'status': self.status, 'from_status': previous_status,
+                     'business_user': self.business_user_id, 'customer_user': self.customer_user,
+                     'updated_at': self.updated_at.isoformat()},
+                    business_user_id=self.business_user_id, customer_user_id=self.customer_user,
+                )
+        self._saved_status = self.status
 
     def update(self, *args, **kwargs):
         """
@@ -59,3 +88,21 @@ class Order(models.Model):
         self.updated_at = now()
         super().save(*args, **kwargs)
 
+
+class OrderStatusChange(models.Model):
+    """
+    Append-only log of the status transitions of orders. The first entry of
+    an order has an empty `from_status` and is written when it is created.
+    Indexed by business user and time for timeline and throughput queries.
+    """
+    order = models.ForeignKey(Order, related_name='status_changes', on_delete=models.CASCADE)
+    business_user = models.ForeignKey(User, related_name='order_status_changes', on_delete=models.CASCADE)
+    customer_user = models.IntegerField(default=0)
+    from_status = models.CharField(max_length=20, blank=True)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['business_user', 'changed_at'], name='order_status_business_time'),
+        ]
@@ -1,3 +1,225 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.test import AsyncClient, AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.utils.timezone import now
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from coderr.throttling import TokenBucketThrottle
+from coderr_auth.models import Profile
+from offers.models import Offer, OfferDetail
+from orders.api import async_views, views
+from orders.api.serializers import OrdersListSerializer, OrdersListValuesSerializer
+from orders.models import Order, OrderStatusChange
+
+
+class OrdersListValuesSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        business = User.objects.create_user(username='business', password='secret')
+        offer = Offer.objects.create(user=business, title='Logo', description='Logo Design')
+        detail = OfferDetail.objects.create(
+            offer=offer, title='Basic', revisions=2, delivery_time_in_days=5,
+            price=Decimal('149.90'), features=['Logo', 'Visitenkarte'], offer_type='basic',
+        )
+        Order.objects.create(offer_detail_id=detail, customer_user=7)
+        Order.objects.create(offer_detail_id=detail, customer_user=8, status='completed', price=Decimal('99.5'),
+                             features={'extra': ['Übergabe', 1.5]}, title='Eigener Titel')
+        order = Order.objects.create(offer_detail_id=detail, customer_user=9)
+        Order.objects.filter(pk=order.pk).update(price=None, revisions=None, features=None, offer_type='')
+
+    def test_matches_model_serializer_field_for_field(self):
+        orders = Order.objects.order_by('pk')
+        expected = OrdersListSerializer(orders, many=True).data
+        actual = OrdersListValuesSerializer(orders).data
+        self.assertEqual(len(actual), 3)
+        for expected_order, actual_order in zip(expected, actual):
+            self.assertEqual(list(actual_order), list(expected_order))
+            for key in expected_order:
+                self.assertEqual(actual_order[key], expected_order[key], key)
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_list_endpoint_uses_values_serializer_output(self):
+        business = User.objects.get(username='business')
+        client = APIClient()
+        client.force_authenticate(business)
+        response = client.get('/coderr/api/orders/')
+        self.assertEqual(response.status_code, 200)
+        expected = OrdersListSerializer(Order.objects.filter(business_user=business), many=True).data
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+    def test_order_keys_are_the_public_fields(self):
+        business = User.objects.get(username='business')
+        client = APIClient()
+        client.force_authenticate(business)
+        keys = [
+            'id', 'customer_user', 'business_user', 'status', 'created_at', 'updated_at',
+            'title', 'revisions', 'delivery_time_in_days', 'price', 'features', 'offer_type',
+        ]
+        Profile.objects.create(user=business, email='business@example.com', type='business')
+        order = Order.objects.filter(business_user=business).first()
+        self.assertEqual(list(client.get('/coderr/api/orders/').json()[0]), keys)
+        self.assertEqual(list(client.get(f'/coderr/api/orders/{order.pk}/').json()), keys)
+        export = client.get('/coderr/api/orders/export.csv')
+        header = next(csv.reader(io.StringIO(b''.join(export.streaming_content).decode())))
+        self.assertEqual(header, keys)
+        response = client.get('/coderr/api/orders/', {'fields': 'id,popularity_counted'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_fieldset_matches_trimmed_model_serializer(self):
+        orders = Order.objects.order_by('pk')
+        fieldset = ('id', 'status', 'price', 'features')
+        expected = OrdersListSerializer(orders, many=True, context={'fieldset': fieldset}).data
+        self.assertEqual(OrdersListValuesSerializer(orders, fieldset=fieldset).data, expected)
+        self.assertEqual(list(expected[0]), list(fieldset))
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class OrdersExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = User.objects.create_user(username='business', password='secret')
+        Profile.objects.create(user=cls.business, email='business@example.com', type='business')
+        offer = Offer.objects.create(user=cls.business, title='Logo', description='Logo Design')
+        detail = OfferDetail.objects.create(offer=offer, title='Basic', revisions=2, delivery_time_in_days=5,
+                                            price=Decimal('149.90'), features=['Logo', 'Visitenkarte'], offer_type='basic')
+        for customer, order_status in ((7, 'in_progress'), (8, 'completed'), (9, 'completed'), (10, 'cancelled')):
+            Order.objects.create(offer_detail_id=detail, customer_user=customer, status=order_status)
+        Order.objects.filter(customer_user=7).update(created_at='2024-01-15T10:00:00Z')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.business)
+
+    def test_jsonl_export_streams_the_list_representation(self):
+        response = self.client.get('/coderr/api/orders/export.jsonl')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        expected = OrdersListValuesSerializer(Order.objects.order_by('pk')).data
+        self.assertEqual([json.loads(line) for line in lines], json.loads(JSONRenderer().render(expected)))
+
+    def test_csv_export_filters_by_status_and_date(self):
+        response = self.client.get('/coderr/api/orders/export.csv',
+                                   {'status': 'completed,in_progress', 'created_from': '2024-06-01', 'fields': 'customer_user,features'},
+                                   HTTP_ACCEPT='text/csv')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows, [['customer_user', 'features'], ['8', '["Logo", "Visitenkarte"]'], ['9', '["Logo", "Visitenkarte"]']])
+        response = self.client.get('/coderr/api/orders/export.csv', {'created_to': '2024-01-15', 'fields': 'customer_user'})
+        self.assertEqual(b''.join(response.streaming_content).decode().split(), ['customer_user', '7'])
+
+    async def test_asgi_export_streams_blocks_through_an_async_iterator(self):
+        token = await Token.objects.acreate(user=self.business)
+        response = await AsyncClient().get('/coderr/api/orders/export.jsonl',
+                                           headers={'Authorization': f'Token {token.key}'})
+        self.assertTrue(response.is_async)
+        blocks = [block async for block in response.streaming_content]
+        self.assertEqual(len(blocks), 2)
+        expected = await sync_to_async(lambda: OrdersListValuesSerializer(Order.objects.order_by('pk')).data)()
+        lines = b''.join(blocks).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], json.loads(JSONRenderer().render(expected)))
+
+    def test_invalid_filters_and_customers_are_rejected(self):
+        self.assertEqual(self.client.get('/coderr/api/orders/export.csv', {'status': 'offen'}).status_code, 400)
+        self.assertEqual(self.client.get('/coderr/api/orders/export.csv', {'created_from': 'gestern'}).status_code, 400)
+        customer = User.objects.create_user(username='customer', password='secret')
+        Profile.objects.create(user=customer, email='customer@example.com', type='customer')
+        self.client.force_authenticate(customer)
+        self.assertEqual(self.client.get('/coderr/api/orders/export.jsonl').status_code, 403)
+
+
+class OrderStatusHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = User.objects.create_user(username='business', password='secret')
+        offer = Offer.objects.create(user=cls.business, title='Logo', description='Logo Design')
+        cls.detail = OfferDetail.objects.create(offer=offer, title='Basic', revisions=2, delivery_time_in_days=5,
+                                                price=Decimal('149.90'), features=['Logo'], offer_type='basic')
+
+    def test_creation_and_status_changes_are_logged(self):
+        order = Order.objects.create(offer_detail_id=self.detail, customer_user=7)
+        client = APIClient()
+        client.force_authenticate(self.business)
+        client.patch(f'/coderr/api/orders/{order.pk}/', {'status': 'completed'}, format='json')
+        client.patch(f'/coderr/api/orders/{order.pk}/', {'status': 'completed'}, format='json')
+        changes = list(OrderStatusChange.objects.order_by('pk').values_list('from_status', 'to_status', 'business_user_id'))
+        self.assertEqual(changes, [('', 'in_progress', self.business.pk), ('in_progress', 'completed', self.business.pk)])
+
+    def test_throughput_is_computed_from_history(self):
+        started = now() - timedelta(days=2)
+        for hours in (10, 30):
+            order = Order.objects.create(offer_detail_id=self.detail, customer_user=7)
+            Order.objects.filter(pk=order.pk).update(created_at=started)
+            OrderStatusChange.objects.create(order=order, business_user=self.business, from_status='in_progress',
+                                             to_status='completed', changed_at=started + timedelta(hours=hours))
+        response = APIClient().get(f'/coderr/api/order-throughput/{self.business.pk}/', {'days': 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['completed'], 2)
+        self.assertEqual(sum(day['completed'] for day in response.json()['completed_per_day']), 2)
+        self.assertEqual(response.json()['mean_time_to_completion_hours'], 20.0)
+        self.assertEqual(APIClient().get(f'/coderr/api/order-throughput/{self.business.pk}/', {'days': 0}).status_code, 400)
+
+
+class OrderCountAsyncParityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = User.objects.create_user(username='business', password='secret')
+        Profile.objects.create(user=cls.business, email='business@example.com', type='business')
+        offer = Offer.objects.create(user=cls.business, title='Logo', description='Logo Design')
+        detail = OfferDetail.objects.create(offer=offer, title='Basic', revisions=2, delivery_time_in_days=5,
+                                            price=Decimal('149.90'), features=['Logo'], offer_type='basic')
+        for customer, order_status in ((7, 'in_progress'), (8, 'in_progress'), (9, 'completed')):
+            Order.objects.create(offer_detail_id=detail, customer_user=customer, status=order_status)
+
+    async def test_count_views_match_the_sync_views(self):
+        pairs = [
+            (views.OrdersBusinessUncompletedCountAPIView, async_views.OrdersBusinessUncompletedCountAsyncView, 'order-count'),
+            (views.OrdersBusinessCompletedCountAPIView, async_views.OrdersBusinessCompletedCountAsyncView, 'completed-order-count'),
+        ]
+        for sync_view, async_view, prefix in pairs:
+            for pk in (self.business.pk, 9999):
+                path = f'/coderr/api/{prefix}/{pk}/'
+                sync_response = await sync_to_async(
+                    lambda: sync_view.as_view()(RequestFactory().get(path), pk=pk).render())()
+                async_response = await async_view.as_view()(AsyncRequestFactory().get(path), pk=pk)
+                self.assertEqual((async_response.status_code, async_response.content),
+                                 (sync_response.status_code, sync_response.content), path)
+
+    async def test_count_views_reject_a_bad_token_like_the_sync_views(self):
+        path = f'/coderr/api/order-count/{self.business.pk}/'
+        headers = {'Authorization': 'Token falsch'}
+        sync_response = await sync_to_async(lambda: views.OrdersBusinessUncompletedCountAPIView.as_view()(
+            RequestFactory().get(path, headers=headers), pk=self.business.pk).render())()
+        async_response = await async_views.OrdersBusinessUncompletedCountAsyncView.as_view()(
+            AsyncRequestFactory().get(path, headers=headers), pk=self.business.pk)
+        self.assertEqual(sync_response.status_code, 401)
+        self.assertEqual((async_response.status_code, async_response.content, async_response['WWW-Authenticate']),
+                         (sync_response.status_code, sync_response.content, sync_response['WWW-Authenticate']))
+
+    @override_settings(THROTTLE_FILE=os.path.join(tempfile.mkdtemp(), 'throttle.db'),
+                       THROTTLE_SCOPES={'order-count': {'rate': '1/min', 'keys': ['ip']}})
+    async def test_count_views_throttle_like_the_sync_views(self):
+        path = f'/coderr/api/completed-order-count/{self.business.pk}/'
+        with mock.patch.multiple(views.OrdersBusinessCompletedCountAPIView, throttle_classes=[TokenBucketThrottle],
+                                 throttle_scope='order-count', create=True):
+            sync_view = views.OrdersBusinessCompletedCountAPIView.as_view()
+            async_view = async_views.OrdersBusinessCompletedCountAsyncView.as_view()
+            sync_responses = [await sync_to_async(lambda: sync_view(
+                RequestFactory().get(path, REMOTE_ADDR='10.0.0.1'), pk=self.business.pk).render())() for _ in range(2)]
+            async_responses = [await async_view(AsyncRequestFactory().get(path, REMOTE_ADDR='10.0.0.2'), pk=self.business.pk)
+                               for _ in range(2)]
+        self.assertEqual([response.status_code for response in sync_responses], [200, 429])
+        self.assertEqual([(response.status_code, response.content) for response in async_responses],
+                         [(response.status_code, response.content) for response in sync_responses])
+        self.assertEqual(async_responses[1]['Retry-After'], sync_responses[1]['Retry-After'])
@@ -1,7 +1,12 @@
+from django.db import transaction
 from rest_framework import serializers
+from coderr.fieldsets import FieldsetSerializerMixin
+from coderr.instrumentation import TimedSerializerMixin
+from coderr.values_serializers import ValuesListSerializer
+from events.models import record_event
 from reviews.models import Review
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(TimedSerializerMixin, FieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Review
         fields = ['id', 'reviewer', 'business_user', 'rating', 'description', 'created_at', 'updated_at']
@@ -28,7 +33,29 @@ class ReviewSerializer(serializers.ModelSerializer):
         """
         Creates a new review with the given validated data and returns the created review.
         The validated data must contain the keys 'business_user', 'rating' and 'description'.
-        It sets the 'reviewer' field to the authenticated user creating the review.
+        It sets the 'reviewer' field to the authenticated user creating the review
+        and records a `review.created` event in the same transaction.
         """
         validated_data['reviewer'] = self.context['request'].user
-        return super().create(validated_data)
+        with transaction.atomic():
+            review = super().create(validated_data)
+            record_event('review.created', {'id': review.pk, 'reviewer': review.reviewer_id,
+                                            'business_user': review.business_user_id, 'rating': review.rating})
+        return review
+
+    def update(self, instance, validated_data):
+        """
+        Updates the review and records a `review.updated` event in the same transaction.
+        """
+        with transaction.atomic():
+            review = super().update(instance, validated_data)
+            record_event('review.updated', {'id': review.pk, 'reviewer': review.reviewer_id,
+                                            'business_user': review.business_user_id, 'rating': review.rating})
+        return review
+
+
+class ReviewListValuesSerializer(ValuesListSerializer):
+    """
+    Read path of the review list, same output as ReviewSerializer with many=True.
+    """
+    serializer_class = ReviewSerializer
@@ -1,8 +1,9 @@
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 
 urlpatterns = [
     path('reviews/', views.ReviewListAPIView.as_view()),
+    re_path(r'^reviews/export\.(?P<export_format>csv|jsonl)$', views.ReviewExportAPIView.as_view(), name='reviews-export'),
     path('reviews/<int:pk>/', views.ReviewDetailsAPIView.as_view()),
 
 ]
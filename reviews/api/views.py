@@ -1,12 +1,19 @@
 from rest_framework import generics, permissions, filters
+from rest_framework.views import APIView
 from rest_framework.exceptions import PermissionDenied
 from reviews.models import Review
-from .serializers import ReviewSerializer
+from .serializers import ReviewSerializer, ReviewListValuesSerializer
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
+from coderr.exports import ExportViewMixin, filter_created, filter_int_range
+from coderr.fieldsets import FieldsetViewMixin, fieldset_columns
+from coderr.throttling import TokenBucketThrottle
+from events.models import record_event
+from idempotency.decorators import idempotent
 
 
-class ReviewListAPIView(generics.ListCreateAPIView):
+class ReviewListAPIView(FieldsetViewMixin, generics.ListCreateAPIView):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
@@ -14,6 +21,9 @@ class ReviewListAPIView(generics.ListCreateAPIView):
     ordering_fields = ['updated_at', 'rating']
     permission_classes = [permissions.AllowAny]
     pagination_class = None
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'review-create'
+    throttle_methods = ['POST']
 
     def get_permissions(self):
         """
@@ -26,6 +36,22 @@ class ReviewListAPIView(generics.ListCreateAPIView):
             return [permissions.IsAuthenticated()]
         return super().get_permissions()
 
+    def list(self, request, *args, **kwargs):
+        """
+        Lists the filtered and ordered reviews from `.values_list()` rows
+        with `ReviewListValuesSerializer` instead of model instances.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(ReviewListValuesSerializer(queryset, fieldset=self.get_fieldset()).data)
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        """
+        Creates a review. Retries with the same Idempotency-Key header get
+        the first response again.
+        """
+        return super().post(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         """
         Checks if the user has a customer profile before creating a review.
@@ -46,11 +72,44 @@ class ReviewListAPIView(generics.ListCreateAPIView):
         serializer.save(reviewer=self.request.user)
 
 
-class ReviewDetailsAPIView(generics.RetrieveUpdateDestroyAPIView):
+class ReviewExportAPIView(ExportViewMixin, APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    fieldset_serializer_class = ReviewSerializer
+    values_serializer_class = ReviewListValuesSerializer
+    export_filename = 'reviews'
+
+    def get_export_queryset(self):
+        """
+        Returns the reviews received by the current business user for the export.
+
+        The reviews can be limited with `created_from` and `created_to` (date
+        or datetime, inclusive) and `min_rating` and `max_rating`.
+
+        :return: The filtered reviews, ordered by id.
+        :raises PermissionDenied: If the user has no business profile.
+        """
+        profile = getattr(self.request.user, 'profile', None)
+        if profile is None or profile.type != 'business':
+            raise PermissionDenied({"detail": ["Nur Unternehmen können ihre Bewertungen exportieren."]})
+        reviews = Review.objects.filter(business_user=self.request.user).order_by('pk')
+        reviews = filter_created(reviews, self.request.query_params)
+        return filter_int_range(reviews, self.request.query_params, 'rating')
+
+
+class ReviewDetailsAPIView(FieldsetViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def get_queryset(self):
+        """
+        Returns the reviews, limited to the selected columns for a sparse fieldset.
+        """
+        fieldset = self.get_fieldset()
+        if fieldset is None:
+            return super().get_queryset()
+        return Review.objects.only(*fieldset_columns(ReviewSerializer, fieldset))
+
     def get_permissions(self):
         """
         Returns the list of permissions that this view requires.
@@ -88,7 +147,8 @@ class ReviewDetailsAPIView(generics.RetrieveUpdateDestroyAPIView):
         only the reviewer of the review or a staff user can delete the review.
         If the user does not have the appropriate permission, a PermissionDenied
         exception is raised. If the user has the appropriate permission, the
-        review is deleted.
+        review is deleted and a `review.deleted` event is recorded in the same
+        transaction.
 
         :param instance: The review instance to be deleted.
         :raises PermissionDenied: If the user does not have the appropriate permission.
@@ -96,7 +156,10 @@ class ReviewDetailsAPIView(generics.RetrieveUpdateDestroyAPIView):
         if instance.reviewer != self.request.user and not self.request.user.is_staff:
             raise PermissionDenied(
                 "Nur der Ersteller oder ein Admin kann eine Bewertung löschen.")
-        instance.delete()
+        with transaction.atomic():
+            record_event('review.deleted', {'id': instance.pk, 'reviewer': instance.reviewer_id,
+                                            'business_user': instance.business_user_id})
+            instance.delete()
 
     def update(self, request, *args, **kwargs):
         """
@@ -1,3 +1,56 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from coderr_auth.models import Profile
+from reviews.api.serializers import ReviewSerializer, ReviewListValuesSerializer
+from reviews.models import Review
+
+
+class ReviewListValuesSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        business = User.objects.create_user(username='business', password='secret')
+        for index in range(3):
+            reviewer = User.objects.create_user(username=f'customer_{index}', password='secret')
+            Review.objects.create(reviewer=reviewer, business_user=business, rating=index + 3,
+                                  description=f'Sehr zufrieden – Nummer {index}')
+
+    def test_matches_model_serializer_field_for_field(self):
+        reviews = Review.objects.order_by('pk')
+        expected = ReviewSerializer(reviews, many=True).data
+        actual = ReviewListValuesSerializer(reviews).data
+        self.assertEqual(len(actual), 3)
+        for expected_review, actual_review in zip(expected, actual):
+            self.assertEqual(list(actual_review), list(expected_review))
+            for key in expected_review:
+                self.assertEqual(actual_review[key], expected_review[key], key)
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_list_endpoint_keeps_filtering_and_ordering(self):
+        response = APIClient().get('/coderr/api/reviews/', {'ordering': '-rating', 'reviewer_id': User.objects.get(username='customer_1').pk})
+        self.assertEqual(response.status_code, 200)
+        expected = ReviewSerializer(Review.objects.filter(reviewer__username='customer_1'), many=True).data
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+        response = APIClient().get('/coderr/api/reviews/', {'ordering': '-rating'})
+        self.assertEqual([review['rating'] for review in response.json()], [5, 4, 3])
+
+
+class ReviewExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.business = User.objects.create_user(username='business', password='secret')
+        Profile.objects.create(user=cls.business, email='business@example.com', type='business')
+        for index in range(3):
+            reviewer = User.objects.create_user(username=f'customer_{index}', password='secret')
+            Review.objects.create(reviewer=reviewer, business_user=cls.business, rating=index + 3,
+                                  description=f'Sehr zufrieden, Nummer {index}')
+
+    def test_export_filters_by_rating_range(self):
+        client = APIClient()
+        client.force_authenticate(self.business)
+        response = client.get('/coderr/api/reviews/export.csv', {'min_rating': 4, 'fields': 'rating,description'})
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines(),
+                         ['rating,description', '4,"Sehr zufrieden, Nummer 1"', '5,"Sehr zufrieden, Nummer 2"'])
+        self.assertEqual(client.get('/coderr/api/reviews/export.jsonl', {'max_rating': 'fünf'}).status_code, 400)